@@ -1,70 +1,160 @@
 import argparse
+import importlib
 import sys
-from rich_argparse import RichHelpFormatter
-from rich.console import Console
-from .utils.status import error
 from .errors import TDSError
-from .utils.banner import print_logo
-from .postgres import setup_postgres, manage_postgres
-from .redis import setup_redis, manage_redis
-from .otel import setup_otel, manage_otel
-from .gcloud import setup_gcloud
-from . import interactive
 
-console = Console()
+# rich, the banner and the status helpers are imported inside main(), after a
+# `manage` command has had its chance to go to the daemon without paying for them.
 
-def main():
-    print_logo()
-    parser = argparse.ArgumentParser(
+ACTIONS = ["start", "stop", "restart", "status"]
+
+# Command tables: service -> (target, help text, ...). Targets are "module:function"
+# strings that are only imported once their subcommand has been selected, so
+# `tds manage redis status` never pays for the otel/gcloud/postgres imports.
+SETUP_COMMANDS = {
+    "postgres": ("termux_dev_setup.postgres:setup_postgres", "Install and configure PostgreSQL", "Specify PostgreSQL version (e.g. 15)"),
+    "redis": ("termux_dev_setup.redis:setup_redis", "Install and configure Redis", "Specify Redis version"),
+    "otel": ("termux_dev_setup.otel:setup_otel", "Install OpenTelemetry Collector", "Specify OpenTelemetry version"),
+    "gcloud": ("termux_dev_setup.gcloud:setup_gcloud", "Install Google Cloud CLI", "Specify GCloud version"),
+}
+
+# Setups whose steps are journaled, so a failed run can be resumed or rolled back.
+JOURNALED_SETUPS = ["postgres", "redis", "otel"]
+
+MANAGE_COMMANDS = {
+    "postgres": ("termux_dev_setup.postgres:manage_postgres", "Manage PostgreSQL"),
+    "redis": ("termux_dev_setup.redis:manage_redis", "Manage Redis"),
+    "otel": ("termux_dev_setup.otel:manage_otel", "Manage OpenTelemetry Collector"),
+}
+
+DAEMON_ACTIONS = ["start", "stop", "status", "run"]
+
+STATUS_SERVICES = ["postgres", "redis", "otel"]
+
+CACHE_ACTIONS = ["list", "prune", "clear"]
+
+def load_command(target: str):
+    """Import a "module:function" target on demand and return the callable."""
+    module_name, func_name = target.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+def setup_service(value: str) -> str:
+    if value not in SETUP_COMMANDS:
+        raise argparse.ArgumentTypeError(f"invalid choice: {value!r} (choose from {', '.join(SETUP_COMMANDS)})")
+    return value
+
+def status_service(value: str) -> str:
+    # Validated here rather than with `choices`, which argparse rejects for an empty nargs="*".
+    if value not in STATUS_SERVICES:
+        raise argparse.ArgumentTypeError(f"invalid choice: {value!r} (choose from {', '.join(STATUS_SERVICES)})")
+    return value
+
+class LazyHelpParser(argparse.ArgumentParser):
+    """ArgumentParser that only imports rich_argparse when help or usage is rendered."""
+
+    def _use_rich_formatter(self):
+        from rich_argparse import RichHelpFormatter
+        self.formatter_class = RichHelpFormatter
+
+    def format_help(self):
+        self._use_rich_formatter()
+        return super().format_help()
+
+    def format_usage(self):
+        self._use_rich_formatter()
+        return super().format_usage()
+
+def build_parser():
+    parser = LazyHelpParser(
+        prog="tds",
         description="Termux Development Environment Setup Tool",
-        formatter_class=RichHelpFormatter
     )
 
     # Add interactive flag to root parser
     parser.add_argument("--interactive", "-i", action="store_true", help="Run interactive setup wizard")
+    parser.add_argument("--no-banner", action="store_true", help="Do not print the logo (or set TDS_NO_BANNER=1)")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print how long each step, command and wait took, and append the raw spans to $TDS_STATE_DIR/timings.jsonl (or set TDS_TIMINGS=1)")
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # --- Setup Command ---
-    setup_parser = subparsers.add_parser("setup", help="Install and configure services", formatter_class=RichHelpFormatter)
+    setup_parser = subparsers.add_parser("setup", help="Install and configure services")
     setup_subparsers = setup_parser.add_subparsers(dest="service", help="Service to setup")
-
-    # Postgres Setup
-    pg_setup = setup_subparsers.add_parser("postgres", help="Install and configure PostgreSQL", formatter_class=RichHelpFormatter)
-    pg_setup.add_argument("--version", help="Specify PostgreSQL version (e.g. 15)")
-
-    # Redis Setup
-    redis_setup = setup_subparsers.add_parser("redis", help="Install and configure Redis", formatter_class=RichHelpFormatter)
-    redis_setup.add_argument("--version", help="Specify Redis version")
-
-    # OpenTelemetry Setup
-    otel_setup = setup_subparsers.add_parser("otel", help="Install OpenTelemetry Collector", formatter_class=RichHelpFormatter)
-    otel_setup.add_argument("--version", help="Specify OpenTelemetry version")
-
-    # GCloud Setup
-    gcloud_setup = setup_subparsers.add_parser("gcloud", help="Install Google Cloud CLI", formatter_class=RichHelpFormatter)
-    gcloud_setup.add_argument("--version", help="Specify GCloud version")
+    for service, (_, help_text, version_help) in SETUP_COMMANDS.items():
+        service_parser = setup_subparsers.add_parser(service, help=help_text)
+        service_parser.add_argument("services", nargs="*", type=setup_service, metavar="service",
+                                    help="More services to set up in the same run, with one batched apt transaction")
+        service_parser.add_argument("--version", help=version_help)
+        if service in JOURNALED_SETUPS:
+            service_parser.add_argument("--resume", action="store_true",
+                                        help="Continue a failed setup, skipping the steps it already finished")
+            service_parser.add_argument("--rollback", action="store_true",
+                                        help="If a step fails, undo the steps this run applied")
 
     # --- Manage Command ---
-    manage_parser = subparsers.add_parser("manage", help="Start/Stop/Status services", formatter_class=RichHelpFormatter)
+    manage_parser = subparsers.add_parser("manage", help="Start/Stop/Status services")
     manage_subparsers = manage_parser.add_subparsers(dest="service", help="Service to manage")
+    for service, (_, help_text) in MANAGE_COMMANDS.items():
+        service_parser = manage_subparsers.add_parser(service, help=help_text)
+        service_parser.add_argument("action", choices=ACTIONS, help="Action to perform")
+
+    # --- Status Command ---
+    status_parser = subparsers.add_parser("status", help="Probe all services concurrently and print one table")
+    status_parser.add_argument("services", nargs="*", type=status_service, metavar="service", help="Services to check (default: all)")
+    status_parser.add_argument("--all", action="store_true", help="Check every managed service")
+    status_parser.add_argument("--timeout", type=float, default=2.0, help="Overall deadline for all probes in seconds (default: 2)")
+
+    # --- Daemon Command ---
+    daemon_parser = subparsers.add_parser("daemon", help="Run the resident tds daemon for fast manage commands")
+    daemon_parser.add_argument("action", choices=DAEMON_ACTIONS, help="Action to perform")
+
+    # --- Cache Command ---
+    cache_parser = subparsers.add_parser("cache", help="Inspect or clean the downloaded artifact cache")
+    cache_parser.add_argument("action", choices=CACHE_ACTIONS, help="Action to perform")
+    cache_parser.add_argument("--max-size", help="Size limit for prune, e.g. 200M (default: TDS_CACHE_MAX_BYTES)")
+
+    return parser, setup_parser, manage_parser
+
+def delegate_to_daemon(argv):
+    """
+    Hand `manage <service> <action>` to a running daemon, skipping banner, argparse and config loading.
+
+    Returns the daemon's exit code, or None when the command must run in-process.
+    """
+    if len(argv) != 3 or argv[0] != "manage" or argv[1] not in MANAGE_COMMANDS or argv[2] not in ACTIONS:
+        return None
+    from .utils import timing
+    if timing.env_enabled():
+        # Spans are only recorded in-process.
+        return None
+    from . import daemon
+    return daemon.try_manage(argv[1], argv[2])
 
-    # Manage Postgres
-    pg_parser = manage_subparsers.add_parser("postgres", help="Manage PostgreSQL", formatter_class=RichHelpFormatter)
-    pg_parser.add_argument("action", choices=["start", "stop", "restart", "status"], help="Action to perform")
-
-    # Manage Redis
-    redis_parser = manage_subparsers.add_parser("redis", help="Manage Redis", formatter_class=RichHelpFormatter)
-    redis_parser.add_argument("action", choices=["start", "stop", "restart", "status"], help="Action to perform")
-
-    # Manage OpenTelemetry
-    otel_parser = manage_subparsers.add_parser("otel", help="Manage OpenTelemetry Collector", formatter_class=RichHelpFormatter)
-    otel_parser.add_argument("action", choices=["start", "stop", "restart", "status"], help="Action to perform")
-
+def main():
+    exit_code = delegate_to_daemon(sys.argv[1:])
+    if exit_code is not None:
+        if exit_code:
+            sys.exit(exit_code)
+        return
+
+    from .utils import banner
+    from .utils.status import console
+
+    # The banner is printed before parsing so it also heads --help output.
+    if "--no-banner" not in sys.argv[1:]:
+        banner.print_logo()
+    parser, setup_parser, manage_parser = build_parser()
     args = parser.parse_args()
 
+    from .utils import timing
+    timings = args.timings or timing.env_enabled()
+    if timings:
+        timing.enable()
+
     try:
         if args.interactive:
+            from . import interactive
             service = interactive.run_wizard()
             if service:
                 interactive.run_service_setup(service)
@@ -73,14 +163,7 @@ def main():
         else:
             main_execution(args, setup_parser, manage_parser, parser)
     except TDSError as e:
-        # Error is already printed if it came from error(), but if it came from elsewhere
-        # we might want to ensure it's displayed. However, our convention is that TDSError
-        # raised by error() has already been printed.
-        # But if we raise TDSError manually, we should print it.
-        # Let's assume error() handles printing. If we just raise TDSError elsewhere, we should print it.
-        # For now, let's rely on error() being the main way to raise fatal errors.
-        # But wait, we just changed error() to raise TDSError.
-        # If we catch it here, we just need to exit.
+        # Errors raised through error() have already been printed; just exit with their code.
         sys.exit(e.exit_code)
     except KeyboardInterrupt:
         console.print("\n[error]✖  Operation cancelled by user.[/error]")
@@ -88,30 +171,38 @@ def main():
     except Exception as e:
         console.print(f"[error]✖  Unexpected error: {e}[/error]")
         sys.exit(1)
+    finally:
+        if timings:
+            timing.report()
 
 def main_execution(args, setup_parser, manage_parser, parser):
     if args.command == "setup":
-        if args.service == "postgres":
-            setup_postgres(version=args.version)
-        elif args.service == "redis":
-            setup_redis(version=args.version)
-        elif args.service == "otel":
-            setup_otel(version=args.version)
-        elif args.service == "gcloud":
-            setup_gcloud(version=args.version)
+        journal_options = {"resume": args.resume, "rollback": args.rollback} if args.service in JOURNALED_SETUPS else {}
+        if args.service in SETUP_COMMANDS and args.services:
+            if args.version or any(journal_options.values()):
+                setup_parser.error("--version, --resume and --rollback can only be used when setting up a single service")
+            load_command("termux_dev_setup.stack:setup_services")([args.service, *args.services])
+        elif args.service in SETUP_COMMANDS:
+            load_command(SETUP_COMMANDS[args.service][0])(version=args.version, **journal_options)
         else:
             setup_parser.print_help()
 
     elif args.command == "manage":
-        if args.service == "postgres":
-            manage_postgres(args.action)
-        elif args.service == "redis":
-            manage_redis(args.action)
-        elif args.service == "otel":
-            manage_otel(args.action)
+        if args.service in MANAGE_COMMANDS:
+            load_command(MANAGE_COMMANDS[args.service][0])(args.action)
         else:
             manage_parser.print_help()
 
+    elif args.command == "status":
+        services = None if args.all or not args.services else args.services
+        load_command("termux_dev_setup.health:status_all")(services, deadline=args.timeout)
+
+    elif args.command == "daemon":
+        load_command("termux_dev_setup.daemon:manage_daemon")(args.action)
+
+    elif args.command == "cache":
+        load_command("termux_dev_setup.utils.artifact_cache:manage_cache")(args.action, max_size=args.max_size)
+
     else:
         parser.print_help()
 
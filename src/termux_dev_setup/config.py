@@ -27,12 +27,14 @@ class PostgresConfig:
     log_file: str = "/var/log/postgresql/postgresql.log"
     pg_user: str = "postgres"
     host: str = "127.0.0.1"
+    socket_dir: str = "/var/run/postgresql"
 
     def __post_init__(self):
         # Allow environment overrides
         self.data_dir = os.environ.get("PG_DATA", self.data_dir)
         self.log_file = os.environ.get("PG_LOG", self.log_file)
         self.pg_user = os.environ.get("PG_USER", self.pg_user)
+        self.socket_dir = os.environ.get("PG_SOCKET_DIR", self.socket_dir)
 
         # Validate
         # Note: PostgresConfig doesn't pull port from env by default in the original code,
@@ -52,6 +54,7 @@ class RedisConfig:
     password: str = ""
     append_only: str = "yes"
     host: str = "127.0.0.1"
+    pid_file: str = "/var/run/redis/redis-server.pid"
 
     def __post_init__(self):
         # Env overrides
@@ -61,6 +64,7 @@ class RedisConfig:
         self.conf_path = os.environ.get("REDIS_CONF", self.conf_path)
         self.data_dir = os.environ.get("REDIS_DATA_DIR", self.data_dir)
         self.append_only = os.environ.get("APPENDONLY", self.append_only)
+        self.pid_file = os.environ.get("REDIS_PID_FILE", self.pid_file)
 
         # Password logic
         env_pass = os.environ.get("REDIS_PASSWORD", "")
@@ -85,6 +89,7 @@ class RedisConfig:
         self.conf_path = validate_non_empty(self.conf_path, "conf_path")
         self.data_dir = validate_non_empty(self.data_dir, "data_dir")
         self.log_file = validate_non_empty(self.log_file, "log_file")
+        self.pid_file = validate_non_empty(self.pid_file, "pid_file")
         self.host = validate_non_empty(self.host, "host")
 
         if self.append_only not in ["yes", "no"]:
@@ -101,6 +106,7 @@ class OtelConfig:
     config_path: str = ""
     otel_bin: str = ""
     log_file: str = ""
+    pid_file: str = ""
 
     def __post_init__(self):
         base_dir = Path(os.environ.get("BASE_DIR", os.path.expanduser("~")))
@@ -111,6 +117,8 @@ class OtelConfig:
             self.otel_bin = str(base_dir / "otelcol-contrib")
         if not self.log_file:
             self.log_file = str(base_dir / "otel.log")
+        if not self.pid_file:
+            self.pid_file = str(base_dir / "otel.pid")
 
         # Env overrides
         self.metrics_port = validate_port(os.environ.get("OTEL_METRICS_PORT", self.metrics_port))
@@ -120,6 +128,7 @@ class OtelConfig:
         self.config_path = os.environ.get("OTEL_CONFIG", self.config_path)
         self.otel_bin = os.environ.get("OTEL_BIN", self.otel_bin)
         self.log_file = os.environ.get("OTEL_LOG", self.log_file)
+        self.pid_file = os.environ.get("OTEL_PID_FILE", self.pid_file)
 
         self.config_path = validate_non_empty(self.config_path, "config_path")
         self.otel_bin = validate_non_empty(self.otel_bin, "otel_bin")
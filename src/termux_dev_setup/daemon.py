@@ -0,0 +1,345 @@
+"""
+Optional resident tds daemon.
+
+`tds daemon start` keeps the PostgreSQL/Redis/OTEL services and their configs
+loaded and answers `manage` requests over a local Unix socket, one JSON line
+per request and reply. The client half of this module only uses the standard
+library so that `tds manage <svc> <action>` can hand off to a running daemon
+before the CLI imports anything heavy; when no daemon is listening, the CLI
+falls back to in-process execution. A request that was delivered but not
+answered is reported as an error instead, so an action is never run twice.
+
+The socket is per user and created mode 0600; a client only talks to a socket
+owned by its own uid, and sends a hash of its config environment rather than
+the values themselves (which include passwords).
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+
+SOCKET_ENV = "TDS_DAEMON_SOCKET"
+NO_DAEMON_ENV = "TDS_NO_DAEMON"
+DEFAULT_SOCKET = f"/tmp/tds_daemon-{os.getuid()}.sock"
+DEFAULT_LOG = f"/tmp/tds_daemon-{os.getuid()}.log"
+
+# Service start/stop can legitimately take a while; status answers in milliseconds.
+REQUEST_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 0.2
+
+# Environment variables that feed the service configs. The daemon only serves a
+# client whose values match the ones it was started with.
+CONFIG_ENV_PREFIXES = ("PG_", "REDIS_", "OTEL_")
+CONFIG_ENV_KEYS = ("APPENDONLY", "BASE_DIR", "DATA_DIR", "HOME", "USER")
+
+MANAGED_SERVICES = ("postgres", "redis", "otel")
+
+
+def socket_path() -> str:
+    return os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)
+
+
+def config_env(environ=None) -> dict:
+    """Subset of the environment that influences service configuration."""
+    environ = os.environ if environ is None else environ
+    return {
+        key: value for key, value in environ.items()
+        if key.startswith(CONFIG_ENV_PREFIXES) or key in CONFIG_ENV_KEYS
+    }
+
+
+def env_fingerprint(env: dict) -> str:
+    """SHA-256 of a config environment: what client and daemon compare, so secrets never cross the socket."""
+    return hashlib.sha256(json.dumps(env, sort_keys=True).encode()).hexdigest()
+
+
+# --- Client ---
+
+class NoReply(Exception):
+    """The request reached the daemon but no (complete) reply came back; it may still be acting on it."""
+
+
+def request(payload: dict, path: str = None, timeout: float = None):
+    """
+    Send one request to the daemon and return its decoded reply.
+
+    Returns None when no daemon is listening (missing socket, refused, stale)
+    or the socket belongs to another user, i.e. when the request was never
+    delivered. Raises NoReply when it was sent
+    but the reply timed out, was cut off or is not valid JSON: the caller must
+    not simply run the request again.
+    """
+    path = path or socket_path()
+    timeout = REQUEST_TIMEOUT if timeout is None else timeout
+    try:
+        owner = os.stat(path).st_uid
+    except OSError:
+        return None
+    if owner != os.geteuid():
+        # Anyone can bind a socket in /tmp; never hand our requests to someone else's.
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+        except OSError:
+            return None
+        try:
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        except OSError as e:
+            raise NoReply(str(e) or type(e).__name__) from e
+
+    if not line.endswith(b"\n"):
+        raise NoReply("connection closed before the reply")
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise NoReply("malformed reply") from e
+
+
+def ping(path: str = None, timeout: float = 1.0):
+    """The daemon's ping reply, or None when it does not answer."""
+    try:
+        return request({"op": "ping"}, path=path, timeout=timeout)
+    except NoReply:
+        return None
+
+
+def try_manage(service: str, action: str):
+    """
+    Run a manage action through the daemon.
+
+    Returns the exit code when the daemon handled the request, or None when the
+    caller should fall back to in-process execution (no daemon, or one that
+    declined the request). A request the daemon received but did not answer
+    is an error (exit 1), never retried in-process, where it could run twice.
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+
+    try:
+        reply = request({"op": "manage", "service": service, "action": action,
+                         "env_sha256": env_fingerprint(config_env())})
+    except NoReply as e:
+        sys.stderr.write(f"tds: the daemon did not answer '{service} {action}' ({e}); "
+                         f"it may still be running it. Check {DEFAULT_LOG}.\n")
+        return 1
+    if not reply or reply.get("status") != "ok":
+        return None
+
+    sys.stdout.write(reply.get("output", ""))
+    sys.stdout.flush()
+    return reply.get("exit_code", 1)
+
+
+# --- Server ---
+
+class TDSDaemon:
+    """Holds the service objects resident and executes manage requests against them."""
+
+    def __init__(self, env: dict = None):
+        import contextlib
+        import threading
+
+        self.env_sha256 = env_fingerprint(config_env() if env is None else env)
+        self.started = time.time()
+        self.handlers = {}
+        # Scopes held open for the daemon's lifetime (e.g. the resident postgres worker).
+        self.sessions = contextlib.ExitStack()
+        # Service objects and the shared console are not thread-safe.
+        self.lock = threading.Lock()
+
+    def get_handler(self, service: str):
+        """Build (once) the manage callable for a service, keeping its objects resident."""
+        if service not in self.handlers:
+            if service == "postgres":
+                from .postgres import PostgresController, manage_postgres
+                from .utils.postgres_utils import postgres_session
+                controller = PostgresController()
+                # pg_ctl calls of later requests reuse one worker instead of switching user each time.
+                self.sessions.enter_context(postgres_session())
+                self.handlers[service] = lambda action: manage_postgres(action, controller=controller)
+            elif service == "redis":
+                from .redis import RedisService, manage_redis
+                redis_service = RedisService()
+                self.handlers[service] = lambda action: manage_redis(action, service=redis_service)
+            elif service == "otel":
+                from .otel import OtelService, manage_otel
+                otel_service = OtelService()
+                self.handlers[service] = lambda action: manage_otel(action, service=otel_service)
+        return self.handlers[service]
+
+    def close(self):
+        self.sessions.close()
+
+    def run_manage(self, service: str, action: str) -> dict:
+        from .errors import TDSError
+        from .utils.status import console
+
+        exit_code = 0
+        with self.lock:
+            handler = self.get_handler(service)
+            with console.capture() as capture:
+                try:
+                    handler(action)
+                except TDSError as e:
+                    exit_code = e.exit_code
+                except Exception as e:
+                    console.print(f"[error]✖  Unexpected error: {e}[/error]")
+                    exit_code = 1
+        return {"status": "ok", "exit_code": exit_code, "output": capture.get()}
+
+    def handle(self, req: dict) -> dict:
+        op = req.get("op")
+        if op == "ping":
+            return {"status": "ok", "pid": os.getpid(), "uptime": time.time() - self.started}
+        if op == "manage":
+            service, action = req.get("service"), req.get("action")
+            if service not in MANAGED_SERVICES or action not in ("start", "stop", "restart", "status"):
+                return {"status": "error", "message": f"Unsupported request: {service} {action}"}
+            if req.get("env_sha256") != self.env_sha256:
+                # Client config differs from the resident one; let it run in-process.
+                return {"status": "env-mismatch"}
+            return self.run_manage(service, action)
+        if op == "shutdown":
+            return {"status": "ok"}
+        return {"status": "error", "message": f"Unknown op: {op}"}
+
+
+def make_server(daemon: TDSDaemon, path: str):
+    """Bind a threaded Unix socket server for `daemon` at `path`."""
+    import socketserver
+    import threading
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                req = json.loads(self.rfile.readline())
+            except ValueError:
+                req = None
+            if not isinstance(req, dict):
+                reply = {"status": "error", "message": "Malformed request"}
+            else:
+                reply = daemon.handle(req)
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            if isinstance(req, dict) and req.get("op") == "shutdown":
+                # shutdown() blocks until serve_forever returns, so it cannot run on a handler thread.
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(path):
+        # Leftover socket from a crashed daemon; serve() holds the process lock, so nobody owns it.
+        os.unlink(path)
+    old_umask = os.umask(0o177)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+    return server
+
+
+def serve(path: str = None):
+    """Run the daemon in the foreground until `tds daemon stop` or SIGTERM."""
+    import signal
+    import threading
+    from .utils.lock import process_lock
+    from .utils.status import info
+
+    path = path or socket_path()
+    with process_lock("daemon"):
+        daemon = TDSDaemon()
+        server = make_server(daemon, path)
+
+        def _terminate(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, _terminate)
+        info(f"tds daemon listening on {path} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            daemon.close()
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def start_daemon(path: str = None, timeout: float = 5.0) -> bool:
+    """Launch a detached daemon process and wait until it answers a ping."""
+    import subprocess
+
+    path = path or socket_path()
+    env = dict(os.environ, **{SOCKET_ENV: path})
+    with open(DEFAULT_LOG, "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "termux_dev_setup.daemon"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            env=env,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ping(path):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def manage_daemon(action: str):
+    """
+    Manage the resident tds daemon (start/stop/status/run).
+    """
+    from .utils.status import console, info, success, error, warning, step
+
+    step(f"Daemon {action.capitalize()}")
+    path = socket_path()
+
+    if action == "run":
+        serve(path)
+        return
+
+    reply = ping(path)
+
+    if action == "start":
+        if reply:
+            success(f"tds daemon is already running (pid {reply.get('pid')}).")
+        elif start_daemon(path):
+            success(f"tds daemon started on {path}.")
+        else:
+            error(f"tds daemon failed to start. Check {DEFAULT_LOG}.")
+
+    elif action == "stop":
+        if not reply:
+            success("tds daemon is not running.")
+            return
+        try:
+            request({"op": "shutdown"}, path=path, timeout=1.0)
+        except NoReply:
+            warning("tds daemon did not confirm the shutdown.")
+        info(f"Stopped tds daemon (pid {reply.get('pid')}).")
+
+    elif action == "status":
+        state = "[bold green]UP[/bold green]" if reply else "[bold red]DOWN[/bold red]"
+        console.print(f"  Status: {state}")
+        console.print(f"  Socket: {path}")
+        if reply:
+            console.print(f"  PID:    {reply.get('pid')}")
+            console.print(f"  Uptime: {reply.get('uptime', 0):.0f}s")
+        if os.environ.get(NO_DAEMON_ENV):
+            warning(f"{NO_DAEMON_ENV} is set; the CLI will not use the daemon.")
+
+
+if __name__ == "__main__":
+    serve()
@@ -12,3 +12,15 @@ class ServiceError(TDSError):
 class ConfigError(TDSError):
     """Raised when configuration is invalid."""
     pass
+
+class DownloadError(TDSError):
+    """Raised when an artifact cannot be downloaded."""
+    def __init__(self, message: str, exit_code: int = 4):
+        super().__init__(message, exit_code)
+
+class ChecksumError(DownloadError):
+    """Raised when a downloaded artifact does not match its expected SHA-256."""
+    def __init__(self, expected: str, actual: str):
+        super().__init__(f"Checksum mismatch! Expected {expected}, got {actual}", exit_code=3)
+        self.expected = expected
+        self.actual = actual
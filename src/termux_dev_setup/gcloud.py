@@ -1,15 +1,22 @@
 from .utils.status import console, info, success, error, warning, step
 from .utils.lock import process_lock
 from .utils.shell import run_command, check_command
+from .utils.command import argv, run_pipeline
+from .utils.apt import apt_update
 import os
 from pathlib import Path
 
-def setup_gcloud(version: str = None):
+KEY_URL = "https://packages.cloud.google.com/apt/doc/apt-key.gpg"
+PREREQUISITES = ["apt-transport-https", "ca-certificates", "gnupg", "curl", "gnupg2", "lsb-release"]
+APT_UPDATE = ["apt-get", "update", "-y"]
+
+def setup_gcloud(version: str = None, packages_installed: bool = False):
     """
     Install and configure Google Cloud CLI for Termux/Proot (Ubuntu).
 
     Args:
         version (str, optional): Specific version to install.
+        packages_installed (bool, optional): The prerequisites are already installed; start at the repository setup.
     """
     step("Google Cloud CLI Setup")
 
@@ -19,22 +26,24 @@ def setup_gcloud(version: str = None):
         return
 
     # 2. Install Prerequisites
-    info("Installing prerequisites...")
-    run_command("apt-get update -y", check=False)
-    try:
-        run_command("apt-get install -y apt-transport-https ca-certificates gnupg curl gnupg2 lsb-release")
-    except Exception:
-        error("Failed to install prerequisites.")
-        return
+    if not packages_installed:
+        info("Installing prerequisites...")
+        apt_update(APT_UPDATE)
+        try:
+            run_command(argv("apt-get", "install", "-y", *PREREQUISITES))
+        except Exception:
+            error("Failed to install prerequisites.")
+            return
 
     # 3. Import Google Cloud Public Key
     info("Importing Google Cloud public key...")
     keyring_path = "/usr/share/keyrings/cloud.google.gpg"
     try:
-        # We combine curl and gpg --dearmor
-        # Note: The original script pipes curl to gpg. We can replicate this or use a temp file.
-        # Pipe logic in python:
-        run_command(f"curl -fsSL https://packages.cloud.google.com/apt/doc/apt-key.gpg | gpg --dearmor -o {keyring_path} --yes", shell=True)
+        # curl | gpg --dearmor, piped in-process; a failed download fails the step.
+        run_pipeline([
+            ["curl", "-fsSL", KEY_URL],
+            ["gpg", "--dearmor", "-o", keyring_path, "--yes"],
+        ])
     except Exception:
         error("Failed to import Google Cloud key.")
         return
@@ -60,9 +69,10 @@ def setup_gcloud(version: str = None):
         pkg_name = f"google-cloud-cli={version}-*"
         info(f"Targeting version: {version}")
 
-    run_command("apt-get update -y", check=False)
+    # Refreshes only if google-cloud-sdk.list is new or changed, or the indexes are stale.
+    apt_update(APT_UPDATE)
     try:
-        run_command(f"apt-get install -y {pkg_name}")
+        run_command(argv("apt-get", "install", "-y", pkg_name))
     except Exception:
         error(f"Failed to install {pkg_name}.")
         return
@@ -70,7 +80,7 @@ def setup_gcloud(version: str = None):
     # 6. Verification & Init
     if check_command("gcloud"):
         success("gcloud CLI installed successfully.")
-        run_command("gcloud --version", check=False)
+        run_command(argv("gcloud", "--version"), check=False)
         
         console.print("")
         info("To initialize, run: gcloud init")
@@ -79,6 +89,13 @@ def setup_gcloud(version: str = None):
     else:
         error("gcloud command not found after installation.")
 
+def apt_packages(version: str = None) -> list:
+    """
+    apt packages that can be batched for `setup_gcloud`: only the prerequisites,
+    since google-cloud-cli comes from a repository added during setup.
+    """
+    return list(PREREQUISITES)
+
 if __name__ == "__main__":
     with process_lock("gcloud_setup"):
         setup_gcloud()
@@ -0,0 +1,159 @@
+"""
+Concurrent health probes for every managed service (`tds status --all`).
+
+All probes run on one asyncio loop under a single overall deadline, so the
+total latency is bounded by the slowest probe rather than the sum of them.
+"""
+
+import asyncio
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .service_status import ServiceStatus
+from .utils import pgwire
+from .utils.resp import encode_command
+
+# Overall deadline (seconds) shared by all probes of one `tds status` run.
+DEFAULT_DEADLINE = 2.0
+
+SERVICES = ("postgres", "redis", "otel")
+
+ProbeFunc = Callable[[], Awaitable[Tuple[ServiceStatus, str]]]
+
+@dataclass
+class ProbeResult:
+    service: str
+    endpoint: str
+    status: ServiceStatus
+    latency: Optional[float] = None
+    detail: str = ""
+
+async def probe_tcp(host: str, port: int) -> Tuple[ServiceStatus, str]:
+    """Service is considered up when its port accepts a TCP connection."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return ServiceStatus.STOPPED, "connection refused"
+    writer.close()
+    await writer.wait_closed()
+    return ServiceStatus.RUNNING, "port open"
+
+async def probe_redis(host: str, port: int, password: str = "") -> Tuple[ServiceStatus, str]:
+    """PING over RESP (pipelined after AUTH when a password is configured)."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return ServiceStatus.STOPPED, "connection refused"
+    try:
+        if password:
+            writer.write(encode_command("AUTH", password))
+        writer.write(encode_command("PING"))
+        await writer.drain()
+        if password:
+            auth = await reader.readline()
+            if auth.startswith(b"-"):
+                return ServiceStatus.FAILED, auth[1:].strip().decode(errors="replace")
+        reply = await reader.readline()
+    finally:
+        writer.close()
+
+    if reply.startswith(b"+PONG"):
+        return ServiceStatus.RUNNING, "PONG"
+    if reply.startswith(b"-LOADING"):
+        return ServiceStatus.STARTING, "loading dataset"
+    if reply.startswith(b"-"):
+        return ServiceStatus.FAILED, reply[1:].strip().decode(errors="replace")
+    return ServiceStatus.UNKNOWN, "unexpected reply"
+
+async def probe_postgres(host: str, port: int, socket_dir: str = "", user: str = "postgres") -> Tuple[ServiceStatus, str]:
+    """Startup handshake (Unix socket preferred) distinguishing ready from starting/recovering."""
+    reader = writer = None
+    path = pgwire.socket_path(socket_dir, port) if socket_dir else ""
+    if path and os.path.exists(path):
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            pass
+    if writer is None:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            return ServiceStatus.STOPPED, "connection refused"
+    try:
+        writer.write(pgwire.startup_message(user))
+        await writer.drain()
+        header = await reader.readexactly(5)
+        length = struct.unpack("!i", header[1:])[0]
+        payload = await reader.readexactly(min(max(length - 4, 0), 8192))
+    except (OSError, asyncio.IncompleteReadError) as e:
+        return ServiceStatus.UNKNOWN, f"no reply: {e}"
+    finally:
+        writer.close()
+    return pgwire.classify_reply(header[:1], payload)
+
+def build_probes(services=None) -> Dict[str, Tuple[str, ProbeFunc]]:
+    """Map each requested service to (endpoint, probe coroutine factory) from its config."""
+    from .config import PostgresConfig, RedisConfig, OtelConfig
+
+    services = services or SERVICES
+    probes = {}
+    if "postgres" in services:
+        pg = PostgresConfig()
+        probes["postgres"] = (f"{pg.host}:{pg.port}", lambda: probe_postgres(pg.host, pg.port, pg.socket_dir, pg.pg_user))
+    if "redis" in services:
+        rd = RedisConfig()
+        probes["redis"] = (f"{rd.host}:{rd.port}", lambda: probe_redis(rd.host, rd.port, rd.password))
+    if "otel" in services:
+        ot = OtelConfig()
+        probes["otel"] = (f"127.0.0.1:{ot.metrics_port}", lambda: probe_tcp("127.0.0.1", ot.metrics_port))
+    return probes
+
+async def _timed(service: str, endpoint: str, probe: ProbeFunc) -> ProbeResult:
+    started = time.perf_counter()
+    try:
+        status, detail = await probe()
+    except Exception as e:
+        status, detail = ServiceStatus.UNKNOWN, f"probe failed: {e}"
+    return ProbeResult(service, endpoint, status, time.perf_counter() - started, detail)
+
+async def gather_status(probes: Dict[str, Tuple[str, ProbeFunc]], deadline: float = DEFAULT_DEADLINE) -> List[ProbeResult]:
+    """Run all probes concurrently; any still pending at the deadline is reported as TIMEOUT."""
+    tasks = {
+        service: asyncio.ensure_future(_timed(service, endpoint, probe))
+        for service, (endpoint, probe) in probes.items()
+    }
+    if tasks:
+        await asyncio.wait(list(tasks.values()), timeout=deadline)
+
+    results = []
+    for service, task in tasks.items():
+        if task.done():
+            results.append(task.result())
+        else:
+            task.cancel()
+            results.append(ProbeResult(service, probes[service][0], ServiceStatus.TIMEOUT, None, f"no answer within {deadline:g}s"))
+    return results
+
+def check_services(services=None, deadline: float = DEFAULT_DEADLINE) -> List[ProbeResult]:
+    """Probe the given services (default: all) and return their results in request order."""
+    return asyncio.run(gather_status(build_probes(services), deadline))
+
+def status_all(services=None, deadline: float = DEFAULT_DEADLINE) -> List[ProbeResult]:
+    """
+    Print one status table for the requested services (default: all).
+
+    Args:
+        services (list, optional): Subset of "postgres", "redis", "otel".
+        deadline (float, optional): Overall time budget for all probes, in seconds.
+    """
+    from .views import StatusView
+
+    view = StatusView()
+    view.print_step("Service Status")
+    started = time.perf_counter()
+    results = check_services(services, deadline)
+    view.print_table(results, time.perf_counter() - started)
+    return results
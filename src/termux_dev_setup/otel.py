@@ -1,15 +1,22 @@
 from .utils.status import console, info, success, error, warning, step
 from .utils.lock import process_lock
 from .utils.shell import run_command, check_command
+from .utils.command import argv
+from .utils.apt import apt_update
+from .utils.wait import wait_until
+from .utils import process, timing
+from .utils.download import download_segmented
+from .utils.artifact_cache import ArtifactCache
+from .utils.archive import extract_member
+from .utils.tasks import TaskGraph
+from .utils.fingerprint import file_digest, file_signature
+from .utils.journal import Journal, remove_if_new, snapshot_file
+from .errors import ChecksumError, DownloadError
 from .config import OtelConfig
 import os
-import time
+import signal
 import platform
-import tarfile
-import hashlib
 from pathlib import Path
-import urllib.request
-import shutil
 import socket
 
 def is_port_open(port: int, host: str = "127.0.0.1", timeout: float = 0.5) -> bool:
@@ -20,9 +27,16 @@ def is_port_open(port: int, host: str = "127.0.0.1", timeout: float = 0.5) -> bo
         return False
 
 class OtelService:
+    START_TIMEOUT = 10
+    STOP_TIMEOUT = 10
+
     def __init__(self, config: OtelConfig = None):
         self.config = config or OtelConfig()
 
+    def pid(self):
+        """PID of the collector recorded at start, if that process is still alive."""
+        return process.running_pid(self.config.pid_file, Path(self.config.otel_bin).name)
+
     def is_running(self) -> bool:
         # Check metrics port as a proxy for running status
         return is_port_open(self.config.metrics_port)
@@ -45,46 +59,45 @@ class OtelService:
 
         info(f"Starting OpenTelemetry Collector...")
 
-        # Run in background
-        cmd = f"nohup '{otel_bin}' --config '{config_path}' > '{self.config.log_file}' 2>&1 &"
-
         try:
-            run_command(cmd, shell=True)
-
-            # Wait for readiness
-            for _ in range(10):
-                if self.is_running():
-                    success("OpenTelemetry Collector started successfully.")
-                    return
-                time.sleep(1)
-            error("OpenTelemetry Collector failed to start (timeout). Check logs.")
+            # Run in background, detached from this session, with its PID recorded
+            pid = process.spawn_detached([str(otel_bin), "--config", str(config_path)], self.config.log_file, self.config.pid_file)
+
+            # The collector's output goes to the log file, so writes there are worth a re-check;
+            # a collector that exits early (e.g. bad config) ends the wait too.
+            wait_until(lambda: self.is_running() or not process.is_alive(pid), self.START_TIMEOUT, watch_path=self.config.log_file, pid=pid, label="otel ready")
+            if self.is_running():
+                success(f"OpenTelemetry Collector started successfully (pid {pid}).")
+            elif not process.is_alive(pid):
+                process.remove_pid(self.config.pid_file)
+                error(f"OpenTelemetry Collector exited during startup. Check {self.config.log_file}.")
+            else:
+                error("OpenTelemetry Collector failed to start (timeout). Check logs.")
         except Exception as e:
             error(f"Failed to start OTEL: {e}")
 
     def stop(self):
-        if not self.is_running():
-            success("OpenTelemetry Collector stopped.")
+        pid = self.pid()
+        if not pid:
+            if self.is_running():
+                warning(f"No live PID in {self.config.pid_file}; the collector on port {self.config.metrics_port} was not started by tds.")
+            else:
+                success("OpenTelemetry Collector stopped.")
             return
 
-        info("Stopping OpenTelemetry Collector...")
-
-        # Kill by name since we know the binary name
-        # A more robust way would be storing PID, but pkill is simple for now
-        # assuming unique binary name 'otelcol-contrib' in this environment
-        bin_name = Path(self.config.otel_bin).name
+        info(f"Stopping OpenTelemetry Collector (pid {pid})...")
 
         try:
-            run_command(f"pkill -f {bin_name}", check=False)
-
-            for _ in range(10):
-                if not self.is_running():
-                    success("OpenTelemetry Collector stopped.")
-                    return
-                time.sleep(1)
+            process.send_signal(pid, signal.SIGTERM)
+            if wait_until(lambda: not process.is_alive(pid), self.STOP_TIMEOUT, pid=pid, label="otel stopped"):
+                process.remove_pid(self.config.pid_file)
+                success("OpenTelemetry Collector stopped.")
+                return
 
             # Force kill if needed
-            run_command(f"pkill -9 -f {bin_name}", check=False)
-            if not self.is_running():
+            process.send_signal(pid, signal.SIGKILL)
+            if wait_until(lambda: not process.is_alive(pid), 1, pid=pid, label="otel killed"):
+                process.remove_pid(self.config.pid_file)
                 success("OpenTelemetry Collector stopped (force kill).")
             else:
                  warning("Failed to stop OpenTelemetry Collector.")
@@ -93,8 +106,8 @@ class OtelService:
             error(f"Error stopping OTEL: {e}")
 
     def restart(self):
+        # stop() waits until the process has exited, so start() can follow immediately.
         self.stop()
-        time.sleep(1)
         self.start()
 
     def status(self):
@@ -102,12 +115,17 @@ class OtelService:
         state = "[bold green]UP[/bold green]" if up else "[bold red]DOWN[/bold red]"
 
         console.print(f"  Status: {state}")
+        pid = self.pid()
+        if pid:
+            console.print(f"  PID:    {pid}")
         console.print(f"  Binary: {self.config.otel_bin}")
         console.print(f"  Config: {self.config.config_path}")
         console.print(f"  Log:    {self.config.log_file}")
         console.print(f"  Ports:  Metrics={self.config.metrics_port}, gRPC={self.config.grpc_port}, HTTP={self.config.http_port}")
 
 class OtelInstaller:
+    APT_PACKAGES = ("wget", "curl", "tar", "ca-certificates", "coreutils")
+
     def __init__(self, config: OtelConfig = None, version: str = None):
         self.config = config or OtelConfig()
         # Derive some values used in installation
@@ -130,9 +148,9 @@ class OtelInstaller:
 
     def install_dependencies(self):
         info("Updating apt and installing dependencies...")
-        run_command("apt update", check=False)
+        apt_update()
         try:
-            run_command("apt install -y wget curl tar ca-certificates coreutils")
+            run_command(argv("apt", "install", "-y", *self.APT_PACKAGES))
         except Exception:
             error("Failed to install dependencies.")
             return False
@@ -164,49 +182,51 @@ class OtelInstaller:
         otel_filename = f"otelcol-contrib_{self.otel_version}_{otel_arch}.tar.gz"
         otel_url = f"https://github.com/open-telemetry/opentelemetry-collector-releases/releases/download/v{self.otel_version}/{otel_filename}"
         
-        info(f"Downloading {otel_url}...")
-        
         import tempfile
         with tempfile.TemporaryDirectory() as tmpd:
-            tmp_path = Path(tmpd) / otel_filename
-            try:
-                urllib.request.urlretrieve(otel_url, tmp_path)
-            except Exception as e:
-                error(f"Download failed: {e}", exit_code=4)
-                return False
-            
-            # Checksum Verification
-            if self.otel_sha256:
-                info("Verifying SHA256 checksum...")
-                with open(tmp_path, "rb") as f:
-                    digest = hashlib.sha256(f.read()).hexdigest()
-                if digest != self.otel_sha256:
-                    error(f"Checksum mismatch! Expected {self.otel_sha256}, got {digest}", exit_code=3)
+            cache = ArtifactCache()
+            tmp_path = cache.lookup("otelcol-contrib", self.otel_version, otel_arch, self.otel_sha256 or None)
+            if tmp_path:
+                info(f"Using cached {otel_filename}")
+            else:
+                info(f"Downloading {otel_url}...")
+                try:
+                    tmp_path = cache.download_path(otel_filename)
+                except OSError:
+                    tmp_path = Path(tmpd) / otel_filename
+                # Hashed chunk by chunk while streaming; a dropped connection resumes from the .part file.
+                try:
+                    digest = download_segmented(otel_url, tmp_path, expected_sha256=self.otel_sha256 or None)
+                except ChecksumError as e:
+                    error(e.message, exit_code=e.exit_code)
+                    return False
+                except DownloadError as e:
+                    error(f"Download failed: {e}", exit_code=e.exit_code)
                     return False
-                success("Checksum OK.")
-            
+
+                if self.otel_sha256:
+                    success("Checksum OK.")
+                try:
+                    cached = cache.store("otelcol-contrib", self.otel_version, otel_arch, tmp_path, digest)
+                except OSError as e:
+                    warning(f"Could not cache {otel_filename}: {e}")
+                else:
+                    tmp_path.unlink(missing_ok=True)
+                    tmp_path = cached
+
+            # Stream through the tarball once and write only the binary, renamed into place.
             info("Extracting archive...")
+            target_bin_name = "otelcol-contrib"
             try:
-                with tarfile.open(tmp_path, "r:gz") as tar:
-                    tar.extractall(path=tmpd)
+                found = extract_member(tmp_path, target_bin_name, otel_bin)
             except Exception as e:
                 error(f"Extraction failed: {e}", exit_code=5)
                 return False
 
-            # Find binary
-            found = None
-            target_bin_name = "otelcol-contrib"
-            for root, dirs, files in os.walk(tmpd):
-                if target_bin_name in files:
-                    found = Path(root) / target_bin_name
-                    break
-            
             if not found:
                  error(f"Could not locate {target_bin_name} inside archive.")
                  return False
 
-            shutil.move(str(found), str(otel_bin))
-            otel_bin.chmod(0o755)
             success(f"Installed collector binary -> {otel_bin}")
             return True
 
@@ -268,10 +288,16 @@ service:
             error(f"Failed to write config: {e}")
             return False
 
+    def config_fingerprint(self) -> dict:
+        return {"config": vars(self.config), "conf": file_digest(self.config.config_path)}
+
+    def validate_fingerprint(self) -> dict:
+        return {"bin": file_signature(self.config.otel_bin), "conf": file_digest(self.config.config_path)}
+
     def validate_config(self) -> bool:
         info("Validating config...")
         try:
-            run_command(f"'{self.config.otel_bin}' --config '{self.config.config_path}' validate")
+            run_command(argv(self.config.otel_bin, "--config", self.config.config_path, "validate"))
             success("Config validated OK")
             return True
         except Exception:
@@ -288,28 +314,35 @@ service:
         console.print("  To start, run: tds manage otel start")
 
 
-def manage_otel(action: str):
+def manage_otel(action: str, service: OtelService = None):
     """
     Manage OpenTelemetry Collector service.
+
+    Args:
+        service (OtelService, optional): Reuse an existing service (e.g. the daemon's resident one).
     """
     step(f"OpenTelemetry {action.capitalize()}")
-    service = OtelService()
-
-    if action == "start":
-        service.start()
-    elif action == "stop":
-        service.stop()
-    elif action == "restart":
-        service.restart()
-    elif action == "status":
-        service.status()
-
-def setup_otel(version: str = None):
+    service = service or OtelService()
+
+    with timing.span(f"otel {action}", kind=timing.MANAGE):
+        if action == "start":
+            service.start()
+        elif action == "stop":
+            service.stop()
+        elif action == "restart":
+            service.restart()
+        elif action == "status":
+            service.status()
+
+def setup_otel(version: str = None, packages_installed: bool = False, resume: bool = False, rollback: bool = False):
     """
     Install and configure OpenTelemetry Collector for Termux/Proot (Ubuntu).
 
     Args:
         version (str, optional): Specific version to install.
+        packages_installed (bool, optional): The apt packages are already installed; only run post-install steps.
+        resume (bool, optional): Skip the steps a previous, failed run journaled as finished.
+        rollback (bool, optional): If a step fails, undo the steps this run applied.
     """
     step("OpenTelemetry Collector Setup")
     
@@ -319,24 +352,26 @@ def setup_otel(version: str = None):
     if not installer.check_prerequisites():
         return
 
-    # 2. Install Dependencies
-    if not installer.install_dependencies():
-        return
-
-    # 3. Install Binary
-    if not installer.install_binary():
-        return
-
-    # 4. Generate Config
-    if not installer.generate_config():
-        return
-
-    # 5. Validate Config
-    if not installer.validate_config():
-        return
+    # 2-6. The HTTPS download needs ca-certificates from the dependency install;
+    # the config does not, so it overlaps both.
+    graph = TaskGraph("otel", journal=Journal("otel"))
+    if not packages_installed:
+        graph.add("dependencies", installer.install_dependencies, resources=("apt", "network"), title="Install dependencies")
+    graph.add("binary", installer.install_binary, deps=tuple(graph.tasks), resources=("network", "disk"),
+              title="Install collector binary", undo=remove_if_new(installer.config.otel_bin))
+    graph.add("config", installer.generate_config, resources=("disk",), title="Generate config",
+              fingerprint=installer.config_fingerprint, undo=snapshot_file(installer.config.config_path))
+    graph.add("validate", installer.validate_config, deps=("binary", "config"), title="Validate config",
+              fingerprint=installer.validate_fingerprint)
+    graph.add("finalize", installer.finalize, deps=tuple(graph.tasks), title="Finalize")
+    try:
+        graph.run(resume=resume, rollback=rollback)
+    finally:
+        graph.report()
 
-    # 6. Finalize
-    installer.finalize()
+def apt_packages(version: str = None) -> list:
+    """apt packages `setup_otel` needs, for batching into one transaction."""
+    return list(OtelInstaller.APT_PACKAGES)
 
 if __name__ == "__main__":
     with process_lock("otel_setup"):
@@ -1,39 +1,65 @@
 from .utils.lock import process_lock
 from .utils.shell import run_command, check_command
+from .utils.command import argv
+from .utils.lookup import user_exists
+from .utils.apt import apt_update
 from .config import PostgresConfig
 from .views import PostgresView
-from .utils.network import is_port_open
-from .utils.postgres_utils import get_pg_bin, run_as_postgres
+from .utils.pgwire import probe as probe_server
+from .utils.postgres_utils import get_pg_bin, postgres_session, run_as_postgres, read_postmaster_pid
+from .utils.wait import wait_until
+from .utils import timing
+from .utils.tasks import TaskGraph
+from .utils.fingerprint import owner_signature
+from .utils.journal import Journal
+from .utils.fs import WALK_WORKERS, ensure_dir, lookup_owner
 from .service_status import ServiceStatus, ServiceResult
 import os
-import time
+import shutil
 from pathlib import Path
 
 class PostgresService:
+    START_TIMEOUT = 15
+    STOP_TIMEOUT = 10
+
     def __init__(self, config: PostgresConfig = None):
         self.config = config or PostgresConfig()
         self.pg_bin = get_pg_bin()
 
+    def probe(self):
+        """Returns (ServiceStatus, detail) from a startup-handshake probe of the server."""
+        return probe_server(self.config.host, self.config.port, self.config.socket_dir, self.config.pg_user)
+
     def is_running(self) -> bool:
-        return is_port_open(self.config.host, self.config.port)
+        # Starting, recovering and stopping servers still hold the port and data directory.
+        return self.probe()[0] != ServiceStatus.STOPPED
+
+    def is_ready(self) -> bool:
+        return self.probe()[0] == ServiceStatus.RUNNING
 
     def start(self) -> ServiceResult:
         if not self.pg_bin:
             return ServiceResult(ServiceStatus.MISSING_BINARIES, "PostgreSQL binaries not found. Is it installed?")
 
-        if self.is_running():
-            return ServiceResult(ServiceStatus.ALREADY_RUNNING, "PostgreSQL is already running (port open).")
-
-        pg_ctl = self.pg_bin / "pg_ctl"
-        cmd = f"'{pg_ctl}' -D '{self.config.data_dir}' -l '{self.config.log_file}' start"
+        status, detail = self.probe()
+        if status == ServiceStatus.RUNNING:
+            return ServiceResult(ServiceStatus.ALREADY_RUNNING, "PostgreSQL is already running (accepting connections).")
 
         try:
-            run_as_postgres(cmd)
-            # Wait for readiness
-            for _ in range(15):
-                if self.is_running():
-                    return ServiceResult(ServiceStatus.RUNNING, "PostgreSQL started successfully.")
-                time.sleep(1)
+            if status == ServiceStatus.STOPPED:
+                run_as_postgres(argv(self.pg_bin / "pg_ctl", "-D", self.config.data_dir, "-l", self.config.log_file, "start"))
+            # Wait until the server accepts connections, not merely until the port opens.
+            # No log watch here: while the server starts up, each probe is itself
+            # logged ("the database system is starting up") and would wake the wait.
+            def ready():
+                nonlocal status, detail
+                status, detail = self.probe()
+                return status == ServiceStatus.RUNNING
+
+            if wait_until(ready, self.START_TIMEOUT, label="postgres ready"):
+                return ServiceResult(ServiceStatus.RUNNING, "PostgreSQL started successfully.")
+            if status in (ServiceStatus.STARTING, ServiceStatus.RECOVERING):
+                return ServiceResult(ServiceStatus.TIMEOUT, f"PostgreSQL is not ready yet ({detail}). Check logs.")
             return ServiceResult(ServiceStatus.TIMEOUT, "PostgreSQL failed to start (timeout). Check logs.")
         except Exception as e:
             return ServiceResult(ServiceStatus.FAILED, f"Failed to start PostgreSQL: {e}")
@@ -45,23 +71,20 @@ class PostgresService:
         if not self.is_running():
             return ServiceResult(ServiceStatus.ALREADY_STOPPED, "PostgreSQL is already stopped.")
 
-        pg_ctl = self.pg_bin / "pg_ctl"
-        cmd = f"'{pg_ctl}' -D '{self.config.data_dir}' stop"
+        cmd = argv(self.pg_bin / "pg_ctl", "-D", self.config.data_dir, "stop")
+        postmaster_pid = read_postmaster_pid(self.config.data_dir)
         try:
             run_as_postgres(cmd)
-            for _ in range(10):
-                if not self.is_running():
-                    return ServiceResult(ServiceStatus.STOPPED, "PostgreSQL stopped.")
-                time.sleep(1)
+            if wait_until(lambda: not self.is_running(), self.STOP_TIMEOUT, pid=postmaster_pid, label="postgres stopped"):
+                return ServiceResult(ServiceStatus.STOPPED, "PostgreSQL stopped.")
             return ServiceResult(ServiceStatus.TIMEOUT, "Graceful stop failed or timed out.")
         except Exception:
              return ServiceResult(ServiceStatus.FAILED, "pg_ctl stop failed.")
 
     def restart(self):
-        stop_res = self.stop()
-        # If stop failed severely, maybe don't start? But usually restart tries best effort.
-        # Original logic was just stop() then sleep() then start().
-        time.sleep(1)
+        # stop() only returns once the server is gone (or gave up), so start() can follow at once.
+        # If stop failed severely, start() still tries best effort.
+        self.stop()
         return self.start()
 
     def status(self):
@@ -77,6 +100,15 @@ class PostgresInstaller:
         if "DATA_DIR" in os.environ:
             self.config.data_dir = os.environ["DATA_DIR"]
 
+    def apt_packages(self) -> list:
+        """Packages `install_packages` asks apt for."""
+        pkg_name = f"postgresql-{self.version}" if self.version else "postgresql"
+        # If version is not specified, we add contrib. If version is specified,
+        # we rely on dependencies or user can manually install extras if needed,
+        # or we can try to guess.
+        extras = [] if self.version else ["postgresql-contrib"]
+        return [pkg_name, *extras, "util-linux"]
+
     def install_packages(self) -> bool:
         if not check_command("apt"):
             self.view.print_error("apt not found. Ensure you are inside an Ubuntu/Debian proot-distro.")
@@ -84,22 +116,12 @@ class PostgresInstaller:
 
         self.view.print_info("Checking/Installing PostgreSQL packages...")
 
-        pkg_name = "postgresql"
-        if self.version:
-            pkg_name = f"postgresql-{self.version}"
+        packages = self.apt_packages()
+        pkg_name = packages[0]
 
-        run_command("apt update", check=False)
+        apt_update()
         try:
-            cmd = f"apt install -y {pkg_name}"
-            # If version is not specified, we add contrib. If version is specified,
-            # we rely on dependencies or user can manually install extras if needed,
-            # or we can try to guess.
-            if not self.version:
-                cmd += " postgresql-contrib"
-
-            cmd += " util-linux"
-
-            run_command(cmd)
+            run_command(argv("apt", "install", "-y", *packages))
             return True
         except Exception:
             self.view.print_error(f"Failed to install {pkg_name} packages via apt.")
@@ -107,27 +129,58 @@ class PostgresInstaller:
 
     def ensure_user(self):
         self.view.print_info("Ensuring 'postgres' user exists...")
-        if not check_command("id postgres"):
+        if not user_exists("postgres"):
             if check_command("adduser"):
-                run_command("adduser --system --group --home /var/lib/postgresql --shell /bin/bash --no-create-home postgres", check=False)
+                run_command(argv("adduser", "--system", "--group", "--home", "/var/lib/postgresql", "--shell", "/bin/bash",
+                                 "--no-create-home", "postgres"), check=False)
             elif check_command("useradd"):
-                run_command("useradd -r -d /var/lib/postgresql -s /bin/bash -U postgres", check=False)
+                run_command(argv("useradd", "-r", "-d", "/var/lib/postgresql", "-s", "/bin/bash", "-U", "postgres"), check=False)
             else:
                 self.view.print_warning("Could not create postgres user. Proceeding if user exists.")
 
+    def init_db_fingerprint(self, pg_bin: Path) -> dict:
+        version_file = Path(self.config.data_dir) / "PG_VERSION"
+        return {
+            "pg_bin": str(pg_bin),
+            "data_dir": owner_signature(self.config.data_dir),
+            "log_dir": owner_signature(os.path.dirname(self.config.log_file)),
+            "pg_version": version_file.read_text().strip() if version_file.exists() else None,
+        }
+
+    def has_cluster(self) -> bool:
+        return (Path(self.config.data_dir) / "PG_VERSION").exists()
+
+    def remove_cluster(self):
+        """Undo a fresh `initdb`: empty the data directory again."""
+        data_dir = Path(self.config.data_dir)
+        self.view.print_info(f"Removing the new cluster at {data_dir}...")
+        for child in data_dir.iterdir():
+            if child.is_dir() and not child.is_symlink():
+                shutil.rmtree(child)
+            else:
+                child.unlink()
+
     def init_db(self, pg_bin: Path) -> bool:
         initdb_path = pg_bin / "initdb"
-        run_command(f"mkdir -p {self.config.data_dir}")
-        run_command(f"mkdir -p {os.path.dirname(self.config.log_file)}")
-        run_command(f"chown -R postgres:postgres {self.config.data_dir}")
-        run_command(f"chown -R postgres:postgres {os.path.dirname(self.config.log_file)}")
+        owner = lookup_owner("postgres")
+        if owner is None:
+            self.view.print_error("User 'postgres' not found; cannot hand it the data directory.")
+            return False
+        try:
+            changed = ensure_dir(self.config.data_dir, owner, recursive=True, workers=WALK_WORKERS)
+            changed += ensure_dir(os.path.dirname(self.config.log_file), owner, recursive=True)
+        except OSError as e:
+            self.view.print_error(f"Failed to prepare the data directory: {e}")
+            return False
+        if changed:
+            self.view.print_info(f"Data and log directories ready ({changed} entries created or fixed).")
 
-        if (Path(self.config.data_dir) / "PG_VERSION").exists():
+        if self.has_cluster():
             self.view.print_info(f"Database already initialized at {self.config.data_dir}")
             return True
 
         self.view.print_info(f"Initializing database at {self.config.data_dir}...")
-        cmd = f"'{initdb_path}' -D '{self.config.data_dir}'"
+        cmd = argv(initdb_path, "-D", self.config.data_dir)
         try:
              run_as_postgres(cmd)
              self.view.print_success("initdb finished.")
@@ -143,11 +196,8 @@ class PostgresInstaller:
 
         self.view.print_info(f"Creating DB user '{pg_user}' and database '{pg_db}'...")
 
-        create_role_cmd = f"'{pg_bin}/createuser' -s {pg_user}"
-        run_as_postgres(create_role_cmd, check=False)
-
-        create_db_cmd = f"'{pg_bin}/createdb' -O {pg_user} {pg_db}"
-        run_as_postgres(create_db_cmd, check=False)
+        run_as_postgres(argv(pg_bin / "createuser", "-s", pg_user), check=False)
+        run_as_postgres(argv(pg_bin / "createdb", "-O", pg_user, pg_db), check=False)
 
         return pg_user, pg_db
 
@@ -198,8 +248,6 @@ class PostgresController:
             else:
                  self.view.print_warning(stop_res.message)
 
-            time.sleep(1)
-
             self.view.print_info(f"Starting PostgreSQL from {self.service.config.data_dir}...")
             start_res = self.service.start()
             if start_res.status == ServiceStatus.RUNNING:
@@ -210,70 +258,88 @@ class PostgresController:
                  self.view.print_error(start_res.message)
 
         elif action == "status":
-            self.view.print_status(self.service.is_running(), self.service.config)
+            status, detail = self.service.probe()
+            self.view.print_status(status, self.service.config, detail)
 
-    def setup(self):
+    def setup(self, packages_installed: bool = False, resume: bool = False, rollback: bool = False):
         self.view.print_step("PostgreSQL Setup")
 
-        # 1. Install
-        if not self.installer.install_packages():
-            return
-
-        # 2. Locate Binaries
-        # Re-initialize service/pg_bin detection since it might have been installed just now
-        self.service.pg_bin = get_pg_bin()
-        pg_bin = self.service.pg_bin
-
-        if not pg_bin:
-             self.view.print_error("Failed to detect PostgreSQL installation after apt install.")
-             return
-
-        pg_ver_dir = pg_bin.parent
-        self.view.print_info(f"Detected PostgreSQL version: {pg_ver_dir.name}")
-
-        # 3. Setup User
-        self.installer.ensure_user()
+        def locate_binaries():
+            # Re-initialize service/pg_bin detection since it might have been installed just now
+            self.service.pg_bin = get_pg_bin()
+            if not self.service.pg_bin:
+                self.view.print_error("Failed to detect PostgreSQL installation after apt install.")
+                return False
+            self.view.print_info(f"Detected PostgreSQL version: {self.service.pg_bin.parent.name}")
+            return True
 
-        # 4. Init DB
-        if not self.installer.init_db(pg_bin):
+        def start():
+            # Pass state via env vars for now as manage() uses Service which reads config which reads env
+            os.environ["PG_DATA"] = self.installer.config.data_dir
+            os.environ["PG_LOG"] = self.installer.config.log_file
+            # PostgresConfig loads from env at init, so re-load it before manage() uses self.service.
+            self.service.config = PostgresConfig()
+            self.manage("start")
+
+        # 1. Install (skipped when a multi-service setup already ran one batched apt transaction)
+        # 2. Locate Binaries, 3. Setup User, 4. Init DB, 5. Start Service, 6. Create DB User
+        # Undo only what this run creates: never an existing cluster or a server that was already up.
+        had_cluster = self.installer.has_cluster()
+        was_running = self.service.is_running()
+        graph = TaskGraph("postgres", journal=Journal("postgres"))
+        if not packages_installed:
+            graph.add("install", self.installer.install_packages, resources=("apt", "network"), title="Install packages")
+        graph.add("binaries", locate_binaries, deps=tuple(graph.tasks), title="Locate binaries")
+        graph.add("user", self.installer.ensure_user, deps=("binaries",), title="Create postgres user")
+        # Skipped on reruns (no `chown -R` over the cluster) while the data directory is as left.
+        graph.add("initdb", lambda: self.installer.init_db(self.service.pg_bin), deps=("user",), resources=("disk",),
+                  title="Initialise cluster", fingerprint=lambda: self.installer.init_db_fingerprint(self.service.pg_bin),
+                  undo=None if had_cluster else self.installer.remove_cluster)
+        graph.add("start", start, deps=("initdb",), title="Start PostgreSQL",
+                  undo=None if was_running else lambda: self.manage("stop"))
+        graph.add("db-user", lambda: self.installer.setup_db_user(self.service.pg_bin), deps=("start",), title="Create database user")
+        try:
+            # initdb, pg_ctl, createuser and createdb share one worker running as postgres.
+            with postgres_session():
+                graph.run(resume=resume, rollback=rollback)
+        finally:
+            graph.report()
+        if not graph.ok:
             return
 
-        # 5. Start Service
-        # Pass state via env vars for now as manage() uses Service which reads config which reads env
-        # A cleaner way would be to pass config to manage(), but manage() currently instantiates its own service.
-        # Since we are inside the controller, we can just call manage directly on self.
-        os.environ["PG_DATA"] = self.installer.config.data_dir
-        os.environ["PG_LOG"] = self.installer.config.log_file
-
-        # We need to update the service config because manage() uses self.service
-        # But PostgresConfig loads from env at init.
-        # We can re-init the service or update config manually.
-        self.service.config = PostgresConfig() # Re-load config with new env vars
-        self.manage("start")
-
-        # 6. Create DB User
-        pg_user, pg_db = self.installer.setup_db_user(pg_bin)
-
         self.view.print_step("Summary")
-        self.view.print_status(True, self.installer.config)
+        self.view.print_status(ServiceStatus.RUNNING, self.installer.config)
 
 
-def manage_postgres(action: str):
+def manage_postgres(action: str, controller: PostgresController = None):
     """
     Manage PostgreSQL service (start/stop/status/restart).
+
+    Args:
+        controller (PostgresController, optional): Reuse an existing controller (e.g. the daemon's resident one).
     """
-    controller = PostgresController()
-    controller.manage(action)
+    controller = controller or PostgresController()
+    # No worker session here: for one pg_ctl call it would only add an interpreter
+    # start. Setups and the daemon hold one; a single action uses plain runuser.
+    with timing.span(f"postgres {action}", kind=timing.MANAGE):
+        controller.manage(action)
 
-def setup_postgres(version: str = None):
+def setup_postgres(version: str = None, packages_installed: bool = False, resume: bool = False, rollback: bool = False):
     """
     Install and configure PostgreSQL for Termux/Proot (Ubuntu).
 
     Args:
         version (str, optional): Specific version to install (e.g., '15').
+        packages_installed (bool, optional): The apt packages are already installed; only run post-install steps.
+        resume (bool, optional): Skip the steps a previous, failed run journaled as finished.
+        rollback (bool, optional): If a step fails, undo the steps this run applied.
     """
     controller = PostgresController(version=version)
-    controller.setup()
+    controller.setup(packages_installed, resume=resume, rollback=rollback)
+
+def apt_packages(version: str = None) -> list:
+    """apt packages `setup_postgres` needs, for batching into one transaction."""
+    return PostgresInstaller(version=version).apt_packages()
     
 if __name__ == "__main__":
     with process_lock("postgres_setup"):
@@ -1,9 +1,19 @@
 from .utils.status import console, info, success, error, warning, step
 from .utils.lock import process_lock
 from .utils.shell import run_command, check_command
+from .utils.command import argv, as_user
+from .utils.lookup import user_exists
+from .utils.apt import apt_update
+from .utils import process, resp, timing
+from .utils.wait import wait_until
+from .utils.tasks import TaskGraph
+from .utils.fingerprint import file_digest, owner_signature
+from .utils.journal import Journal, remove_if_new, snapshot_file
+from .utils.fs import WALK_WORKERS, ensure_dir, lookup_owner
 from .config import RedisConfig
 import os
-import time
+import shutil
+import signal
 import socket
 from pathlib import Path
 
@@ -15,11 +25,22 @@ def is_port_open(host="127.0.0.1", port=6379, timeout=0.5) -> bool:
         return False
 
 class RedisService:
+    START_TIMEOUT = 15
+    STOP_TIMEOUT = 10
+
     def __init__(self, config: RedisConfig = None):
         self.config = config or RedisConfig()
 
+    def pid(self):
+        """PID of the redis-server recorded in its pidfile, if that process is still alive."""
+        return process.running_pid(self.config.pid_file, "redis-server")
+
     def is_running(self) -> bool:
-        return is_port_open(self.config.host, self.config.port)
+        # The port check also covers servers started without (or before) a pidfile.
+        return self.pid() is not None or is_port_open(self.config.host, self.config.port)
+
+    def ping(self) -> bool:
+        return resp.ping(self.config.host, self.config.port, self.config.password)
 
     def start(self):
         if self.is_running():
@@ -33,31 +54,14 @@ class RedisService:
 
         info(f"Starting Redis using {conf_path}...")
         
-        # Run as redis user
-        cmd = f"nohup redis-server '{conf_path}' >/dev/null 2>&1 &"
-        start_cmd = ""
-        if check_command("runuser"):
-            start_cmd = f"runuser -u redis -- bash -c \"{cmd}\""
-        else:
-            start_cmd = f"su - redis -c \"{cmd}\""
-        
         try:
-            run_command(start_cmd, shell=True)
+            # Run as the redis user, detached from this session; redis-server writes its own pidfile and log.
+            process.spawn_detached(as_user("redis", argv("redis-server", conf_path)))
             
-            # Wait for readiness
-            cli_base = f"redis-cli -p {self.config.port}"
-            if self.config.password:
-                cli_base += f" -a {self.config.password}"
-
-            for _ in range(15):
-                try:
-                    res = run_command(f"{cli_base} ping", shell=True, check=False, capture_output=True)
-                    if res.returncode == 0 and "PONG" in res.stdout:
-                         success("Redis started successfully.")
-                         return
-                except Exception:
-                    pass
-                time.sleep(1)
+            # Readiness is polled in-process over RESP, so frequent early attempts are cheap.
+            if wait_until(self.ping, self.START_TIMEOUT, watch_path=self.config.log_file, label="redis ready"):
+                success("Redis started successfully.")
+                return
             error("Redis failed to start (timeout).")
         except Exception as e:
             error(f"Failed to start Redis: {e}")
@@ -69,29 +73,29 @@ class RedisService:
 
         info("Stopping Redis...")
 
-        cli_base = f"redis-cli -p {self.config.port}"
-        if self.config.password:
-            cli_base += f" -a {self.config.password}"
-
         try:
-            res = run_command(f"{cli_base} shutdown", shell=True, check=False, capture_output=True)
-            if res.returncode != 0:
-                warning(f"Shutdown failed: {res.stderr}")
-                warning("Attempting force kill...")
-                run_command("pkill redis-server", check=False)
-            
-            for _ in range(10):
-                if not self.is_running():
-                    success("Redis stopped.")
-                    return
-                time.sleep(1)
+            pid = self.pid()
+            try:
+                resp.shutdown(self.config.host, self.config.port, self.config.password)
+            except (OSError, resp.RespError) as e:
+                warning(f"Shutdown failed: {e}")
+                if pid:
+                    # redis-server treats SIGTERM as SHUTDOWN (saving per its config).
+                    warning(f"Sending SIGTERM to redis-server (pid {pid})...")
+                    process.send_signal(pid, signal.SIGTERM)
+                else:
+                    warning(f"No live PID in {self.config.pid_file}; cannot signal Redis.")
+
+            if wait_until(lambda: not self.is_running(), self.STOP_TIMEOUT, watch_path=self.config.log_file, pid=pid, label="redis stopped"):
+                success("Redis stopped.")
+                return
             warning("Graceful stop failed.")
         except Exception as e:
             error(f"Error stopping Redis: {e}")
 
     def restart(self):
+        # stop() waits until the port is released, so start() can follow immediately.
         self.stop()
-        time.sleep(1)
         self.start()
 
     def status(self):
@@ -101,22 +105,24 @@ class RedisService:
         console.print(f"  Status: {state}")
         console.print(f"  Config: {self.config.conf_path}")
         console.print(f"  Port: {self.config.port}")
+        pid = self.pid()
+        if pid:
+            console.print(f"  PID: {pid}")
         
         if up:
             # Verify Auth
-            cli_base = f"redis-cli -p {self.config.port}"
-            if self.config.password:
-                cli_base += f" -a {self.config.password}"
-
             try:
-                res = run_command(f"{cli_base} ping", shell=True, check=False, capture_output=True)
-                if "PONG" in res.stdout:
-                    console.print("  Health: [green]Healthy (PONG)[/green]")
-                else:
-                     console.print("  Health: [yellow]Unresponsive[/yellow]")
+                with resp.RespClient(self.config.host, self.config.port, self.config.password) as client:
+                    healthy = client.command("PING") == "PONG"
+                    details = resp.parse_info(client.command("INFO", "server") or "")
+                console.print("  Health: [green]Healthy (PONG)[/green]" if healthy else "  Health: [yellow]Unresponsive[/yellow]")
+                if details.get("redis_version"):
+                    console.print(f"  Version: {details['redis_version']} (uptime {details.get('uptime_in_seconds', '?')}s)")
+            except resp.RespError as e:
+                console.print(f"  Health: [yellow]Unresponsive ({e})[/yellow]")
             except Exception:
                 console.print("  Health: [red]Check Failed[/red]")
-            
+
             conn_str = f"redis://:{self.config.password}@" if self.config.password else "redis://"
             conn_str += f"127.0.0.1:{self.config.port}/0"
             console.print(f"  URL: {conn_str}")
@@ -126,6 +132,10 @@ class RedisInstaller:
         self.config = config or RedisConfig()
         self.version = version
 
+    def apt_packages(self) -> list:
+        """Packages `install_packages` asks apt for (none when redis-server is already present)."""
+        return [] if check_command("redis-server") else ["redis-server"]
+
     def install_packages(self) -> bool:
         pkg_name = "redis-server"
         if self.version:
@@ -140,9 +150,9 @@ class RedisInstaller:
 
         if not check_command("redis-server"):
             info("redis-server not found. Installing via apt...")
-            run_command("apt update", check=False)
+            apt_update()
             try:
-                run_command("apt install -y redis-server")
+                run_command(argv("apt", "install", "-y", pkg_name))
                 return True
             except Exception:
                 error("Failed to install redis-server via apt.")
@@ -153,29 +163,50 @@ class RedisInstaller:
 
     def ensure_user(self):
         info("Ensuring 'redis' user exists...")
-        if not check_command("id redis"):
+        if not user_exists("redis"):
              if check_command("adduser"):
-                 run_command(f"adduser --system --group --home '{self.config.data_dir}' redis", check=False)
+                 run_command(argv("adduser", "--system", "--group", "--home", self.config.data_dir, "redis"), check=False)
              else:
                  warning("Could not create redis user (adduser not found).")
 
     def setup_directories(self):
         info(f"Setting up data directory: {self.config.data_dir}")
-        run_command(f"mkdir -p '{self.config.data_dir}'")
-        run_command(f"chown -R redis:redis '{self.config.data_dir}'", check=False)
-        run_command(f"chmod 700 '{self.config.data_dir}'")
+        owner = lookup_owner("redis")
+        if owner is None:
+            warning("User 'redis' not found; leaving directory ownership unchanged.")
+
+        # redis-server runs as the redis user and must be able to write its pidfile.
+        # Only a directory created here is handed over (never e.g. /var/run itself).
+        pid_parent = Path(self.config.pid_file).parent
+        pid_owner = owner if not pid_parent.exists() else None
+
+        try:
+            changed = ensure_dir(self.config.data_dir, owner, mode=0o700, recursive=True, workers=WALK_WORKERS)
+            changed += ensure_dir(Path(self.config.conf_path).parent)
+            changed += ensure_dir(Path(self.config.log_file).parent, owner, recursive=True)
+            changed += ensure_dir(pid_parent, pid_owner)
+        except OSError as e:
+            error(f"Failed to prepare Redis directories: {e}")
+            return
+        info(f"Directories ready ({changed} entries created or fixed).")
+
+    def _directories(self) -> list:
+        conf = self.config
+        return [conf.data_dir, str(Path(conf.conf_path).parent), str(Path(conf.log_file).parent), str(Path(conf.pid_file).parent)]
+
+    def directories_fingerprint(self) -> dict:
+        return {path: owner_signature(path) for path in self._directories()}
 
-        conf_parent = Path(self.config.conf_path).parent
-        run_command(f"mkdir -p '{conf_parent}'")
+    def config_fingerprint(self) -> dict:
+        return {"config": vars(self.config), "conf": file_digest(self.config.conf_path)}
 
-        log_parent = Path(self.config.log_file).parent
-        run_command(f"mkdir -p {log_parent}")
-        run_command(f"chown -R redis:redis {log_parent}", check=False)
+    def start_fingerprint(self) -> dict:
+        return {"conf": file_digest(self.config.conf_path), "running": RedisService(self.config).is_running()}
 
     def generate_config(self) -> bool:
         conf_path = Path(self.config.conf_path)
         if conf_path.exists() and not Path(f"{conf_path}.orig").exists():
-            run_command(f"cp '{conf_path}' '{conf_path}.orig'")
+            shutil.copy2(conf_path, f"{conf_path}.orig")
 
         info(f"Generating Redis config at {conf_path}...")
 
@@ -188,7 +219,7 @@ timeout 0
 tcp-keepalive 300
 daemonize no
 supervised no
-pidfile /var/run/redis.pid
+pidfile {self.config.pid_file}
 loglevel notice
 logfile {self.config.log_file}
 databases 16
@@ -213,55 +244,69 @@ appendfilename "appendonly.aof"
             error(f"Failed to write config file: {e}")
             return False
 
-def manage_redis(action: str):
+def manage_redis(action: str, service: RedisService = None):
     """
     Manage Redis service (start/stop/status/restart).
+
+    Args:
+        service (RedisService, optional): Reuse an existing service (e.g. the daemon's resident one).
     """
     step(f"Redis {action.capitalize()}")
 
-    service = RedisService()
+    service = service or RedisService()
 
-    if action == "start":
-        service.start()
-    elif action == "stop":
-        service.stop()
-    elif action == "restart":
-        service.restart()
-    elif action == "status":
-        service.status()
+    with timing.span(f"redis {action}", kind=timing.MANAGE):
+        if action == "start":
+            service.start()
+        elif action == "stop":
+            service.stop()
+        elif action == "restart":
+            service.restart()
+        elif action == "status":
+            service.status()
 
-def setup_redis(version: str = None):
+def setup_redis(version: str = None, packages_installed: bool = False, resume: bool = False, rollback: bool = False):
     """
     Install and configure Redis for Termux/Proot (Ubuntu).
 
     Args:
         version (str, optional): Specific version to install.
+        packages_installed (bool, optional): The apt packages are already installed; only run post-install steps.
+        resume (bool, optional): Skip the steps a previous, failed run journaled as finished.
+        rollback (bool, optional): If a step fails, undo the steps this run applied.
     """
     step("Redis Setup")
 
     installer = RedisInstaller(version=version)
 
-    # 1. Install
-    if not installer.install_packages():
-        return
-
-    # 2. Create User
-    installer.ensure_user()
-
-    # 3. Directories
-    installer.setup_directories()
-
-    # 4. Config
-    if not installer.generate_config():
-        return
-
-    # 5. Start
-    # Ensure env vars match config for the start command
-    os.environ["REDIS_PORT"] = str(installer.config.port)
-    os.environ["REDIS_CONF"] = installer.config.conf_path
-    os.environ["REDIS_PASSWORD"] = installer.config.password
+    def start():
+        # Ensure env vars match config for the start command
+        os.environ["REDIS_PORT"] = str(installer.config.port)
+        os.environ["REDIS_CONF"] = installer.config.conf_path
+        os.environ["REDIS_PASSWORD"] = installer.config.password
+        manage_redis("start")
+
+    # Each step needs the previous one (the user owns the directories the config goes in).
+    was_running = RedisService(installer.config).is_running()
+    graph = TaskGraph("redis", journal=Journal("redis"))
+    if not packages_installed:
+        graph.add("install", installer.install_packages, resources=("apt", "network"), title="Install packages")
+    graph.add("user", installer.ensure_user, deps=tuple(graph.tasks), title="Create redis user")
+    # Fingerprinted steps are skipped on reruns while nothing they depend on changed.
+    graph.add("directories", installer.setup_directories, deps=("user",), resources=("disk",), title="Set up directories",
+              fingerprint=installer.directories_fingerprint, undo=remove_if_new(installer.config.data_dir))
+    graph.add("config", installer.generate_config, deps=("directories",), resources=("disk",), title="Generate config",
+              fingerprint=installer.config_fingerprint, undo=snapshot_file(installer.config.conf_path))
+    graph.add("start", start, deps=("config",), title="Start Redis", fingerprint=installer.start_fingerprint,
+              undo=None if was_running else lambda: manage_redis("stop"))
+    try:
+        graph.run(resume=resume, rollback=rollback)
+    finally:
+        graph.report()
 
-    manage_redis("start")
+def apt_packages(version: str = None) -> list:
+    """apt packages `setup_redis` needs, for batching into one transaction."""
+    return RedisInstaller(version=version).apt_packages()
 
 if __name__ == "__main__":
     with process_lock("redis_setup"):
@@ -6,6 +6,7 @@ class ServiceStatus(Enum):
     STOPPED = auto()
     STARTING = auto()
     STOPPING = auto()
+    RECOVERING = auto()
     FAILED = auto()
     UNKNOWN = auto()
     ALREADY_RUNNING = auto()
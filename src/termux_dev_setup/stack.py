@@ -0,0 +1,66 @@
+"""
+Multi-service setup (`tds setup postgres redis otel`).
+
+The apt packages of every requested service are collected first and installed
+in one `apt install` transaction, so package indexes are loaded and dpkg
+triggers run once instead of once per service. Each service's post-install
+steps (users, directories, config, start) then run in the order given.
+"""
+
+import importlib
+from typing import List
+
+from .errors import TDSError
+from .utils.apt import apt_install, apt_update
+from .utils.shell import check_command
+from .utils.status import error, info, step
+
+# service -> module providing `apt_packages(version)` and `setup_<service>(version, packages_installed)`
+SETUP_MODULES = {
+    "postgres": "termux_dev_setup.postgres",
+    "redis": "termux_dev_setup.redis",
+    "otel": "termux_dev_setup.otel",
+    "gcloud": "termux_dev_setup.gcloud",
+}
+
+
+def collect_packages(modules: dict) -> List[str]:
+    """Union of the services' apt packages, in first-seen order."""
+    packages = []
+    for module in modules.values():
+        for package in module.apt_packages():
+            if package not in packages:
+                packages.append(package)
+    return packages
+
+
+def setup_services(services: List[str]):
+    """
+    Set up several services with one batched apt transaction.
+
+    Args:
+        services (list): Services from SETUP_MODULES, in the order their post-install steps run.
+    """
+    services = list(dict.fromkeys(services))
+    step(f"Setup: {', '.join(services)}")
+
+    if not check_command("apt"):
+        error("apt not found. Ensure you are inside an Ubuntu/Debian proot-distro.")
+        return
+
+    modules = {service: importlib.import_module(SETUP_MODULES[service]) for service in services}
+    packages = collect_packages(modules)
+    if packages:
+        info(f"Installing {len(packages)} packages for {len(services)} services in one transaction...")
+        apt_update()
+        apt_install(packages)
+
+    failed = []
+    for service, module in modules.items():
+        try:
+            getattr(module, f"setup_{service}")(packages_installed=True)
+        except TDSError:
+            # Already reported; carry on with the remaining services.
+            failed.append(service)
+    if failed:
+        error(f"Setup failed for: {', '.join(failed)}", exit_code=1)
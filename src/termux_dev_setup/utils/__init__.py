@@ -1,4 +1,24 @@
-from .status import console, info, success, error, warning, step
-from .lock import process_lock
-from .banner import print_logo
-from .syntax_themes import get_syntax_theme
\ No newline at end of file
+import importlib
+
+# Re-exports are resolved lazily (PEP 562) so that importing a single helper
+# such as `utils.status` does not drag in pygments via `syntax_themes`.
+_EXPORTS = {
+    "console": ".status",
+    "info": ".status",
+    "success": ".status",
+    "error": ".status",
+    "warning": ".status",
+    "step": ".status",
+    "process_lock": ".lock",
+    "print_logo": ".banner",
+    "get_syntax_theme": ".syntax_themes",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,135 @@
+"""
+Shared apt layer: refresh the package indexes only when they may be stale.
+
+Every installer used to run `apt update` unconditionally, which costs tens of
+seconds on a phone. `apt_update` records when the indexes were last refreshed
+together with a fingerprint of every sources.list entry, and skips the
+refresh while the indexes are younger than TDS_APT_MAX_AGE and no source was
+added, removed or edited (gcloud writing `google-cloud-sdk.list` forces one).
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .command import display
+from .paths import cache_dir
+from .shell import run_command
+from .status import info
+
+SOURCES_LIST = Path("/etc/apt/sources.list")
+SOURCES_DIR = Path("/etc/apt/sources.list.d")
+LISTS_DIR = Path("/var/lib/apt/lists")
+
+MAX_AGE_ENV = "TDS_APT_MAX_AGE"
+DEFAULT_MAX_AGE = 3600
+
+
+def max_age_from_env() -> float:
+    """Seconds after which the indexes are refreshed even if no source changed."""
+    try:
+        return float(os.environ.get(MAX_AGE_ENV, DEFAULT_MAX_AGE))
+    except ValueError:
+        return DEFAULT_MAX_AGE
+
+
+def state_path() -> Path:
+    return cache_dir("apt-state.json")
+
+
+def source_fingerprints() -> Dict[str, str]:
+    """SHA-256 of sources.list and every `.list`/`.sources` file in sources.list.d."""
+    paths = [SOURCES_LIST]
+    try:
+        paths += sorted(p for p in SOURCES_DIR.iterdir() if p.suffix in (".list", ".sources"))
+    except OSError:
+        pass
+    fingerprints = {}
+    for path in paths:
+        try:
+            fingerprints[str(path)] = hashlib.sha256(path.read_bytes()).hexdigest()
+        except OSError:
+            continue
+    return fingerprints
+
+
+def load_state() -> dict:
+    try:
+        return json.loads(state_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(sources: Dict[str, str]):
+    path = state_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"updated": time.time(), "sources": sources}, indent=1))
+    os.replace(tmp_path, path)
+
+
+def changed_sources(recorded: Dict[str, str], current: Dict[str, str]) -> List[str]:
+    """File names of sources added, removed or edited since `recorded`."""
+    return sorted(
+        os.path.basename(path)
+        for path in set(recorded) | set(current)
+        if recorded.get(path) != current.get(path)
+    )
+
+
+def lists_present() -> bool:
+    """False on a fresh image whose /var/lib/apt/lists was emptied."""
+    try:
+        return any(LISTS_DIR.glob("*Packages*"))
+    except OSError:
+        return False
+
+
+def needs_update(max_age: Optional[float] = None) -> Tuple[bool, str]:
+    """Whether `apt update` should run, and why (or why not)."""
+    max_age = max_age_from_env() if max_age is None else max_age
+    state = load_state()
+    if not lists_present():
+        return True, "no package indexes yet"
+    if "sources" not in state:
+        return True, "no record of a previous refresh"
+    changed = changed_sources(state["sources"], source_fingerprints())
+    if changed:
+        return True, f"sources changed: {', '.join(changed)}"
+    age = time.time() - state.get("updated", 0)
+    if age > max_age:
+        return True, f"indexes are {age / 60:.0f} min old"
+    return False, f"indexes refreshed {age / 60:.0f} min ago"
+
+
+def apt_update(command: Sequence[str] = ("apt", "update"), force: bool = False) -> bool:
+    """
+    Run the argv `command` unless the indexes are fresh; returns True when it ran.
+
+    Failures are tolerated (like `check=False` before) but not recorded, so
+    the next call tries again.
+    """
+    if not force:
+        stale, reason = needs_update()
+        if not stale:
+            info(f"Skipping '{display(command)}' ({reason}).")
+            return False
+    sources = source_fingerprints()
+    result = run_command(list(command), check=False)
+    if result is not None and result.returncode == 0:
+        save_state(sources)
+    return True
+
+
+def apt_install(packages, command: Sequence[str] = ("apt", "install", "-y")):
+    """
+    Install `packages` in a single apt transaction, so the indexes are loaded
+    and dpkg triggers run once. Raises TDSError (via run_command) on failure.
+
+    The output is streamed to a log file with a live tail, not the terminal
+    (see utils/capture.py); a failure reports its last lines.
+    """
+    run_command([*command, *packages], stream=True)
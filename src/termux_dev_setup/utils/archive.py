@@ -0,0 +1,42 @@
+"""
+Single-member extraction from compressed tarballs.
+
+The archive is read as a forward-only stream (`r|*`), so it is decompressed
+once, nothing but the wanted member touches the disk, and no directory walk
+is needed to find it afterwards. The member is written to a temporary file
+beside its destination and renamed over it, so the destination is never seen
+half-written and a running binary can be replaced in place.
+"""
+
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+def extract_member(archive, name: str, dest, mode: int = 0o755) -> bool:
+    """
+    Extract the regular file whose basename is `name` from `archive` to `dest`.
+
+    Returns False when the archive has no such member. Raises tarfile.TarError
+    or OSError when the archive is corrupt or `dest` cannot be written.
+    """
+    dest = Path(dest)
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            if not member.isfile() or os.path.basename(member.name) != name:
+                continue
+            fd, tmp_name = tempfile.mkstemp(prefix=f".{dest.name}.", dir=dest.parent)
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(tar.extractfile(member), out, COPY_CHUNK_SIZE)
+                os.chmod(tmp_name, mode)
+                os.replace(tmp_name, dest)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+            return True
+    return False
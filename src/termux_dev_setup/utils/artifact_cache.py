@@ -0,0 +1,274 @@
+"""
+Content-addressed local cache for downloaded artifacts (collector tarballs).
+
+Files are stored once per SHA-256 under `<cache>/artifacts/` and indexed by
+(name, version, arch) in `index.json`, so reinstalls, fresh BASE_DIRs and
+offline setups reuse the archive instead of downloading it again. The total
+size is bounded by TDS_CACHE_MAX_BYTES; least recently used entries go first.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from .paths import cache_dir
+
+MAX_BYTES_ENV = "TDS_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+INDEX_VERSION = 1
+
+_SIZE_SUFFIXES = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(value) -> int:
+    """Parse a byte count such as 1048576, "512M" or "2G"."""
+    text = str(value).strip().upper().rstrip("B")
+    if text and text[-1] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def max_bytes_from_env() -> int:
+    try:
+        return parse_size(os.environ[MAX_BYTES_ENV])
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+@dataclass
+class CacheEntry:
+    name: str
+    version: str
+    arch: str
+    sha256: str
+    filename: str
+    size: int
+    created: float
+    last_used: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}/{self.version}/{self.arch}"
+
+
+class ArtifactCache:
+    def __init__(self, root=None, max_bytes: int = None):
+        self.root = Path(root) if root else cache_dir("artifacts")
+        self.max_bytes = max_bytes_from_env() if max_bytes is None else max_bytes
+        self.index_path = self.root / "index.json"
+
+    # --- Index ---
+
+    @contextmanager
+    def _locked(self):
+        """Serialise index updates between concurrent tds processes."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        entries = {}
+        for raw in data.get("entries", []):
+            try:
+                entry = CacheEntry(**raw)
+            except TypeError:
+                continue
+            entries[entry.key] = entry
+        return entries
+
+    def _save(self, entries: dict):
+        payload = {"version": INDEX_VERSION, "entries": [asdict(e) for e in entries.values()]}
+        tmp_path = self.index_path.with_name(f"index.json.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(payload, indent=1))
+        os.replace(tmp_path, self.index_path)
+
+    def path_for(self, entry: CacheEntry) -> Path:
+        return self.root / f"{entry.sha256}-{entry.filename}"
+
+    def download_path(self, filename: str) -> Path:
+        """
+        Where to download `filename` before it is stored. The directory
+        outlives the process, so an interrupted download's `.part` file is
+        resumed by the next run instead of starting over.
+        """
+        path = self.root / "partial" / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _valid(self, entry: CacheEntry) -> bool:
+        try:
+            return self.path_for(entry).stat().st_size == entry.size
+        except OSError:
+            return False
+
+    # --- Public API ---
+
+    def entries(self) -> List[CacheEntry]:
+        """Cached entries, most recently used first."""
+        return sorted(self._load().values(), key=lambda e: e.last_used, reverse=True)
+
+    def total_size(self) -> int:
+        return sum(e.size for e in self._load().values())
+
+    def lookup(self, name: str, version: str, arch: str, sha256: Optional[str] = None) -> Optional[Path]:
+        """
+        Path of the cached artifact, or None on a miss.
+
+        With `sha256`, only an entry with that digest counts as a hit. A hit
+        refreshes the entry's LRU timestamp.
+        """
+        if not self.index_path.exists():
+            return None
+        with self._locked():
+            entries = self._load()
+            entry = entries.get(f"{name}/{version}/{arch}")
+            if entry is None or (sha256 and entry.sha256 != sha256.lower()) or not self._valid(entry):
+                return None
+            entry.last_used = time.time()
+            self._save(entries)
+            return self.path_for(entry)
+
+    def store(self, name: str, version: str, arch: str, src, sha256: str) -> Path:
+        """
+        Add `src` (already verified to hash to `sha256`) to the cache and return its cached path.
+
+        The file is hard-linked when possible, copied otherwise. Older entries
+        are evicted afterwards to stay within max_bytes.
+        """
+        src = Path(src)
+        now = time.time()
+        entry = CacheEntry(name, version, arch, sha256.lower(), src.name, src.stat().st_size, now, now)
+        with self._locked():
+            target = self.path_for(entry)
+            if not self._valid(entry):
+                tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                try:
+                    os.link(src, tmp_path)
+                except OSError:
+                    shutil.copyfile(src, tmp_path)
+                os.replace(tmp_path, target)
+
+            entries = self._load()
+            entries[entry.key] = entry
+            self._evict(entries, self.max_bytes, keep=entry.key)
+            self._save(entries)
+        return target
+
+    def prune(self, max_bytes: int = None) -> List[CacheEntry]:
+        """Drop broken entries, stray files and LRU entries beyond `max_bytes`; returns what was removed."""
+        if not self.root.exists():
+            return []
+        with self._locked():
+            entries = self._load()
+            removed = [e for e in entries.values() if not self._valid(e)]
+            for entry in removed:
+                del entries[entry.key]
+            removed += self._evict(entries, self.max_bytes if max_bytes is None else max_bytes)
+            self._save(entries)
+            self._remove_strays(entries)
+        return removed
+
+    def clear(self) -> int:
+        """Remove every cached artifact; returns the number of entries dropped."""
+        if not self.root.exists():
+            return 0
+        with self._locked():
+            count = len(self._load())
+            self._save({})
+            self._remove_strays({})
+            shutil.rmtree(self.root / "partial", ignore_errors=True)
+        return count
+
+    # --- Helpers ---
+
+    def _evict(self, entries: dict, max_bytes: int, keep: str = None) -> List[CacheEntry]:
+        removed = []
+        total = sum(e.size for e in entries.values())
+        for entry in sorted(entries.values(), key=lambda e: e.last_used):
+            if total <= max_bytes:
+                break
+            if entry.key == keep:
+                continue
+            del entries[entry.key]
+            total -= entry.size
+            removed.append(entry)
+        self._remove_strays(entries)
+        return removed
+
+    def _remove_strays(self, entries: dict):
+        """Delete artifact files no index entry refers to (evicted, or left by a crash)."""
+        referenced = {self.path_for(e).name for e in entries.values()}
+        for path in self.root.iterdir():
+            if path.name in referenced or path.name in ("index.json", ".lock") or path.is_dir():
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def manage_cache(action: str, max_size: str = None):
+    """
+    Inspect or shrink the local artifact cache (list/prune/clear).
+
+    Args:
+        max_size (str, optional): Size limit for `prune` (e.g. "200M"); defaults to TDS_CACHE_MAX_BYTES.
+    """
+    from .status import console, info, success, error, step
+
+    step(f"Artifact Cache {action.capitalize()}")
+    cache = ArtifactCache()
+
+    if action == "list":
+        entries = cache.entries()
+        if not entries:
+            info(f"Cache is empty ({cache.root}).")
+            return
+        from rich.table import Table
+
+        table = Table(show_header=True, header_style="bold")
+        table.add_column("Artifact")
+        table.add_column("Version")
+        table.add_column("Arch")
+        table.add_column("Size", justify="right")
+        table.add_column("Last used")
+        table.add_column("SHA-256", style="dim")
+        for entry in entries:
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.last_used))
+            table.add_row(entry.name, entry.version, entry.arch, format_size(entry.size), last_used, entry.sha256[:12])
+        console.print(table)
+        console.print(f"  [dim]{len(entries)} artifact(s), {format_size(cache.total_size())} of {format_size(cache.max_bytes)} in {cache.root}[/dim]")
+
+    elif action == "prune":
+        try:
+            limit = parse_size(max_size) if max_size else None
+        except ValueError:
+            error(f"Invalid size '{max_size}' (use bytes or a K/M/G suffix, e.g. 200M).", exit_code=2)
+        removed = cache.prune(limit)
+        for entry in removed:
+            info(f"Removed {entry.filename} ({format_size(entry.size)})")
+        success(f"Pruned {len(removed)} artifact(s); {format_size(cache.total_size())} remain.")
+
+    elif action == "clear":
+        success(f"Removed {cache.clear()} artifact(s) from {cache.root}.")
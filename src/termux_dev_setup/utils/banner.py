@@ -1,26 +1,28 @@
 # src/termux_dev_setup/utils/banner.py
 
 from rich.console import Console
-from rich.text import Text
 import math
 import random
 import os
+import sys
+from pathlib import Path
+from .paths import cache_dir
 
 console = Console()
 
-def print_logo():
-    import os
-    import random
-    import sys
-    import colorsys
-    import math
-    from rich.console import Console
-    from rich.text import Text
+# Bump when the renderer output changes so stale cache files are ignored.
+CACHE_VERSION = 1
+
+# The default palette is procedural but drawn from this many seeds, so each
+# variant is rendered once and then served from the cache like a fixed palette.
+PROCEDURAL_VARIANTS = 64
 
-    console = Console()
+# Set to any non-empty value (or pass --no-banner) to suppress the logo.
+NO_BANNER_ENV = "TDS_NO_BANNER"
 
-    # --- logo (unchanged) ---
-    logo = r"""     
+SUBTITLE = "🔧 Termux Development Environment Setup Tool"
+
+LOGO = r"""     
 ░     
  ███████████ ██████████    █████████ 
 ░█░░░███░░░█░░███░░░░███  ███░░░░░███
@@ -35,140 +37,151 @@ def print_logo():
                                      
 """.strip().split("\n")
 
-    # helper math functions (unchanged)
-    def lerp(a, b, t):
-        return a + (b - a) * t
-
-    def blend(c1, c2, t):
-        # Gemini gamma + wave shaping (unchanged)
-        t = t ** 1.47
-        t = 0.82 * t + 0.08 * math.sin(3.2 * t)
-        r = int(lerp(c1[0], c2[0], t))
-        g = int(lerp(c1[1], c2[1], t))
-        b = int(lerp(c1[2], c2[2], t))
-        return f"#{r:02x}{g:02x}{b:02x}"
-
-    # --- fixed palettes fallback (keeps your original palettes available) ---
-    fixed_palettes = [
-        [
-            (0x2E, 0x7B, 0xEA),
-            (0x6C, 0x5B, 0xD8),
-            (0xB6, 0x6D, 0xB9),
-            (0xE8, 0x8A, 0xA6),
-            (0xFF, 0xB6, 0xC1),
-        ],
-        [
-            (0x33, 0xE0, 0xA1),
-            (0x19, 0xB6, 0xD8),
-            (0x2A, 0xD5, 0x6C),
-            (0x15, 0x90, 0xD3),
-            (0x0D, 0x75, 0xB4),
-        ],
-        [
-            (0x00, 0xFF, 0xCC),
-            (0x00, 0xDD, 0xFF),
-            (0x66, 0x99, 0xFF),
-            (0xAA, 0x77, 0xFF),
-            (0xFF, 0x66, 0xDD),
-        ],
-        [
-            (0x3A, 0x0C, 0xF0),
-            (0x66, 0x1B, 0xF6),
-            (0x98, 0x2D, 0xFF),
-            (0xF2, 0x36, 0xA3),
-            (0xFF, 0x73, 0x3F),
-        ],
-        [
-            (0x07, 0x1A, 0x40),
-            (0x2E, 0x7B, 0xEA),
-            (0x7C, 0x4D, 0xFF),
-            (0xFF, 0x6B, 0x6B),
-            (0xFF, 0xF1, 0xD6),
-        ],
-        [
-            (0x12, 0xB8, 0xFF),
-            (0x2E, 0x7B, 0xEA),
-            (0x6C, 0x5B, 0xD8),
-            (0xC2, 0x4B, 0xC3),
-            (0xFF, 0x88, 0xA8),
-        ],
-    ]
+# --- fixed palettes (selected with CREATE_DUMP_PALETTE=<index>) ---
+FIXED_PALETTES = [
+    [
+        (0x2E, 0x7B, 0xEA),
+        (0x6C, 0x5B, 0xD8),
+        (0xB6, 0x6D, 0xB9),
+        (0xE8, 0x8A, 0xA6),
+        (0xFF, 0xB6, 0xC1),
+    ],
+    [
+        (0x33, 0xE0, 0xA1),
+        (0x19, 0xB6, 0xD8),
+        (0x2A, 0xD5, 0x6C),
+        (0x15, 0x90, 0xD3),
+        (0x0D, 0x75, 0xB4),
+    ],
+    [
+        (0x00, 0xFF, 0xCC),
+        (0x00, 0xDD, 0xFF),
+        (0x66, 0x99, 0xFF),
+        (0xAA, 0x77, 0xFF),
+        (0xFF, 0x66, 0xDD),
+    ],
+    [
+        (0x3A, 0x0C, 0xF0),
+        (0x66, 0x1B, 0xF6),
+        (0x98, 0x2D, 0xFF),
+        (0xF2, 0x36, 0xA3),
+        (0xFF, 0x73, 0x3F),
+    ],
+    [
+        (0x07, 0x1A, 0x40),
+        (0x2E, 0x7B, 0xEA),
+        (0x7C, 0x4D, 0xFF),
+        (0xFF, 0x6B, 0x6B),
+        (0xFF, 0xF1, 0xD6),
+    ],
+    [
+        (0x12, 0xB8, 0xFF),
+        (0x2E, 0x7B, 0xEA),
+        (0x6C, 0x5B, 0xD8),
+        (0xC2, 0x4B, 0xC3),
+        (0xFF, 0x88, 0xA8),
+    ],
+]
+
+# helper math functions
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+def blend(c1, c2, t):
+    # Gemini gamma + wave shaping
+    t = t ** 1.47
+    t = 0.82 * t + 0.08 * math.sin(3.2 * t)
+    r = int(lerp(c1[0], c2[0], t))
+    g = int(lerp(c1[1], c2[1], t))
+    b = int(lerp(c1[2], c2[2], t))
+    return (r, g, b)
+
+def generate_palette(rand=None):
+    """Procedurally generate a vivid 5-colour palette (practically infinite variations)."""
+    import colorsys
 
     # cryptographically-safe RNG (so other random.seed(...) won't affect us)
-    _sysrand = random.SystemRandom()
+    rand = rand or random.SystemRandom()
+
+    # params: how many control colors to generate across gradient
+    N = 5
+
+    # choose a "base" hue and spacing; equally spaced hues + small jitter gives wide but harmonious variants
+    base_h = rand.random()  # 0..1
+    spacing = 1.0 / N
+
+    # choose saturation and value ranges to keep results vivid but not overly bright/dark
+    sat_center = 0.72 + (rand.random() - 0.5) * 0.2  # ~0.62..0.82
+    val_center = 0.78 + (rand.random() - 0.5) * 0.2  # ~0.68..0.88
+
+    palette = []
+    for i in range(N):
+        # hue: evenly spaced with slight random jitter
+        jitter = (rand.random() - 0.5) * (spacing * 0.6)  # jitter fraction
+        h = (base_h + i * spacing + jitter) % 1.0
+
+        # saturation & value with small per-color variation
+        s = min(max(sat_center + (rand.random() - 0.5) * 0.18, 0.35), 1.0)
+        v = min(max(val_center + (rand.random() - 0.5) * 0.18, 0.35), 1.0)
+
+        # convert HSV -> RGB 0..255
+        r_f, g_f, b_f = colorsys.hsv_to_rgb(h, s, v)
+        palette.append((int(round(r_f * 255)), int(round(g_f * 255)), int(round(b_f * 255))))
+
+    # Occasionally bias the palette towards warmer or cooler by adjusting V slightly
+    if rand.random() < 0.25:
+        # shift all values down/up a bit for moody or pastel variants
+        delta_v = (rand.random() - 0.5) * 0.18
+        new_palette = []
+        for (r, g, b) in palette:
+            h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
+            v = min(max(v + delta_v, 0.2), 1.0)
+            rr, gg, bb = colorsys.hsv_to_rgb(h, s, v)
+            new_palette.append((int(round(rr * 255)), int(round(gg * 255)), int(round(bb * 255))))
+        palette = new_palette
+
+    # permute the palette slightly so gradients shift even when endpoints similar
+    rand.shuffle(palette)
+    return palette
 
-    # If env var is set and numeric -> use fixed palette index (reproducible)
+def fixed_palette_index():
+    """The fixed palette selected with CREATE_DUMP_PALETTE=<n>, or None."""
     idx_env = os.getenv("CREATE_DUMP_PALETTE")
     if idx_env is not None:
         try:
             idx = int(idx_env)
-            if 0 <= idx < len(fixed_palettes):
-                palette = list(fixed_palettes[idx])
-                mode = f"fixed[{idx}]"
-            else:
-                raise ValueError
-        except Exception:
-            # bad value -> fall through to procedural generation
-            palette = None
-            mode = "procedural (bad env fallback)"
-    else:
-        palette = None
-        mode = "procedural"
-
-    # If we didn't get a fixed palette, procedurally generate one (practically infinite variations)
-    if palette is None:
-        # params: how many control colors to generate across gradient
-        N = 5
-
-        # choose a "base" hue and spacing; equally spaced hues + small jitter gives wide but harmonious variants
-        base_h = _sysrand.random()  # 0..1
-        spacing = 1.0 / N
-
-        # choose saturation and value ranges to keep results vivid but not overly bright/dark
-        sat_center = 0.72 + (_sysrand.random() - 0.5) * 0.2  # ~0.62..0.82
-        val_center = 0.78 + (_sysrand.random() - 0.5) * 0.2  # ~0.68..0.88
-
-        palette = []
-        for i in range(N):
-            # hue: evenly spaced with slight random jitter
-            jitter = (_sysrand.random() - 0.5) * (spacing * 0.6)  # jitter fraction
-            h = (base_h + i * spacing + jitter) % 1.0
-
-            # saturation & value with small per-color variation
-            s = min(max(sat_center + (_sysrand.random() - 0.5) * 0.18, 0.35), 1.0)
-            v = min(max(val_center + (_sysrand.random() - 0.5) * 0.18, 0.35), 1.0)
-
-            # convert HSV -> RGB 0..255
-            r_f, g_f, b_f = colorsys.hsv_to_rgb(h, s, v)
-            r, g, b = int(round(r_f * 255)), int(round(g_f * 255)), int(round(b_f * 255))
-
-            palette.append((r, g, b))
-
-        # Occasionally bias the palette towards warmer or cooler by adjusting V or S slightly
-        if _sysrand.random() < 0.25:
-            # shift all values down/up a bit for moody or pastel variants
-            delta_v = (_sysrand.random() - 0.5) * 0.18
-            new_palette = []
-            for (r, g, b) in palette:
-                # convert to HSV, adjust v, convert back
-                h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
-                v = min(max(v + delta_v, 0.2), 1.0)
-                rr, gg, bb = colorsys.hsv_to_rgb(h, s, v)
-                new_palette.append((int(round(rr * 255)), int(round(gg * 255)), int(round(bb * 255))))
-            palette = new_palette
-
-        mode = "procedural"
+        except ValueError:
+            idx = -1
+        if 0 <= idx < len(FIXED_PALETTES):
+            return idx
+    return None
 
-    # permute the palette slightly so gradients shift even when endpoints similar
-    _sysrand.shuffle(palette)
+def render_logo(palette, color_system, width=None) -> str:
+    """
+    Render the gradient logo and subtitle to a ready-to-write ANSI string.
+
+    Lines are cropped to `width` so narrow terminals do not wrap the art.
+    With no color system the plain glyphs are returned.
+    """
+    from rich.color import Color, ColorSystem
 
-    # --- print the logo using chosen palette ---
-    H = len(logo)
-    for i, line in enumerate(logo):
-        tline = Text()
+    system = {
+        "standard": ColorSystem.STANDARD,
+        "256": ColorSystem.EIGHT_BIT,
+        "truecolor": ColorSystem.TRUECOLOR,
+        "windows": ColorSystem.WINDOWS,
+    }.get(color_system)
+
+    H = len(LOGO)
+    out = []
+    for i, line in enumerate(LOGO):
         W = len(line)
+        last_code = None
+        for j, ch in enumerate(line[:width] if width else line):
+            if system is None:
+                out.append(ch)
+                continue
 
-        for j, ch in enumerate(line):
             raw = (i * 0.72 + j * 0.44)
             t = raw / (H * 0.72 + W * 0.44)
 
@@ -179,8 +192,78 @@ def print_logo():
             c1 = palette[idx]
             c2 = palette[min(idx + 1, len(palette) - 1)]
 
-            tline.append(ch, style=blend(c1, c2, t2))
+            code = ";".join(Color.from_rgb(*blend(c1, c2, t2)).downgrade(system).get_ansi_codes())
+            # Runs of the same colour share a single escape sequence.
+            if code != last_code:
+                out.append(f"\x1b[{code}m")
+                last_code = code
+            out.append(ch)
+        if system is not None:
+            out.append("\x1b[0m")
+        out.append("\n")
+
+    if system is None:
+        out.append(f"{SUBTITLE}\n\n")
+    else:
+        out.append(f"\x1b[2m{SUBTITLE}\x1b[0m\n\n")
+    return "".join(out)
+
+def banner_cache_path(key, width, color_system) -> Path:
+    return cache_dir("banner") / f"logo-v{CACHE_VERSION}-{key}-w{width}-{color_system or 'plain'}.ansi"
+
+def get_logo(width=None, color_system=None) -> str:
+    """
+    Returns the rendered logo, using the on-disk cache.
+
+    A fixed palette is cached under its index. Otherwise one of
+    PROCEDURAL_VARIANTS seeds is picked at random and its procedural palette
+    is cached under the seed, so the logo still changes between runs but each
+    variant is only rendered once. Cache failures (read-only home, corrupt
+    file) silently fall back to rendering.
+    """
+    index = fixed_palette_index()
+    if index is not None:
+        key, make_palette = f"p{index}", lambda: list(FIXED_PALETTES[index])
+    else:
+        seed = random.SystemRandom().randrange(PROCEDURAL_VARIANTS)
+        key, make_palette = f"s{seed}", lambda: generate_palette(random.Random(seed))
+
+    path = banner_cache_path(key, width, color_system)
+    try:
+        return path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    rendered = render_logo(make_palette(), color_system, width)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(rendered, encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return rendered
+
+def banner_enabled() -> bool:
+    """The logo is shown only on interactive terminals and when not disabled via env."""
+    if os.environ.get(NO_BANNER_ENV):
+        return False
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+def print_logo(force: bool = False):
+    """
+    Print the gradient logo.
 
-        console.print(tline)
+    Skipped when stdout is not a TTY or TDS_NO_BANNER is set; `force`
+    bypasses the TTY check (the env switch always wins).
+    """
+    if os.environ.get(NO_BANNER_ENV) or not (force or banner_enabled()):
+        return
 
-    console.print("[dim]🔧 Termux Development Environment Setup Tool[/dim]\n")
\ No newline at end of file
+    logo_width = max(len(line) for line in LOGO)
+    width = min(console.width, logo_width)
+    console.file.write(get_logo(width, console.color_system))
+    console.file.flush()
@@ -0,0 +1,230 @@
+"""
+Bounded streaming capture of command output.
+
+`run_command(..., capture_output=True)` holds all of stdout/stderr in memory,
+and without it apt and initdb write straight to the terminal, tearing through
+the setup live view. A streamed command instead has its combined output read
+in chunks: every byte is appended to a per-step log file, only the last
+TAIL_LINES lines are kept in memory (for the error report when it fails), and
+the newest line is shown at most every REFRESH_INTERVAL seconds, in the
+step's row of the live view or, outside a setup graph, in a transient status
+line.
+
+Commands run inside a TaskGraph step are streamed automatically (see
+`step_output`); elsewhere `run_command(..., stream=True)` asks for it.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+from . import timing
+from .paths import state_dir
+from .status import error
+
+TAIL_LINES = 20
+# Longer lines are cut in the in-memory tail (the log file keeps them whole).
+MAX_LINE = 4096
+REFRESH_INTERVAL = 0.25
+CHUNK_SIZE = 64 * 1024
+
+_current = threading.local()
+
+
+def log_path(label: str):
+    return state_dir("logs", f"{label}.log")
+
+
+class step_output:
+    """
+    Context manager marking the calling thread as running step `label`:
+    commands started on it are streamed into the step's log (emptied here)
+    and report their newest line to `on_line`.
+    """
+
+    def __init__(self, label: str, on_line: Optional[Callable[[str], None]] = None):
+        self.label = label
+        self.on_line = on_line
+
+    def __enter__(self):
+        self.saved = getattr(_current, "step", None)
+        _current.step = self
+        try:
+            os.unlink(log_path(self.label))
+        except OSError:
+            pass
+        return self
+
+    def __exit__(self, *exc):
+        _current.step = self.saved
+
+
+def current_step() -> Optional[step_output]:
+    return getattr(_current, "step", None)
+
+
+def streaming_active() -> bool:
+    """Whether the calling thread runs a setup step, whose commands are streamed."""
+    return current_step() is not None
+
+
+class ConsoleTail:
+    """Transient one-line status showing the newest output line, when the console is a terminal."""
+
+    def __init__(self, title: str):
+        from . import tasks
+        from .status import console
+
+        self.status = None
+        if console.is_terminal and not tasks.display_active():
+            status = console.status(f"[dim]{title}[/dim]")
+            try:
+                status.start()
+            except Exception:
+                # rich allows one live display per console, e.g. for two steps streaming at once.
+                return
+            self.status = status
+
+    def __call__(self, line: str):
+        if self.status is not None:
+            from rich.markup import escape
+            self.status.update(f"[dim]{escape(line)}[/dim]")
+
+    def close(self):
+        if self.status is not None:
+            self.status.stop()
+
+
+class OutputCapture:
+    """
+    Sink for one command's output: tees it to `log_file` (appended to, or
+    replaced when `append` is false), keeps the last `tail` lines and passes
+    the newest line to `on_line`, rate-limited. Memory use is bounded by
+    `tail * MAX_LINE` whatever the command prints.
+    """
+
+    def __init__(self, command: str, log_file=None, tail: int = TAIL_LINES,
+                 on_line: Optional[Callable[[str], None]] = None, append: bool = True):
+        self.command = command
+        self.log_file = log_file
+        self.lines = deque(maxlen=tail)
+        self.on_line = on_line
+        self.line_count = 0
+        self.bytes = 0
+        self._partial = b""
+        self._shown = 0.0
+        self._log = None
+        if log_file is not None:
+            try:
+                log_file.parent.mkdir(parents=True, exist_ok=True)
+                self._log = open(log_file, "ab" if append else "wb")
+                self._log.write(f"$ {command}\n".encode())
+            except OSError:
+                self._log, self.log_file = None, None
+
+    def feed(self, chunk: bytes):
+        self.bytes += len(chunk)
+        if self._log is not None:
+            self._log.write(chunk)
+        # \r separates the frames of progress bars, which are lines as far as the tail is concerned.
+        parts = (self._partial + chunk).replace(b"\r", b"\n").split(b"\n")
+        self._partial = parts.pop()[:MAX_LINE]
+        for part in parts:
+            self._line(part)
+
+    def _line(self, raw: bytes):
+        line = raw[:MAX_LINE].decode(errors="replace").rstrip()
+        if not line:
+            return
+        self.lines.append(line)
+        self.line_count += 1
+        now = time.monotonic()
+        if self.on_line is not None and now - self._shown >= REFRESH_INTERVAL:
+            self._shown = now
+            self.on_line(line)
+
+    def close(self):
+        if self._partial:
+            self._line(self._partial)
+            self._partial = b""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def tail_text(self) -> str:
+        return "\n".join(self.lines)
+
+    def check(self, returncode: int):
+        """Report a failed command with its last lines of output (via error(), so TDSError)."""
+        if returncode == 0:
+            return
+        report = f"Command failed: {self.command}"
+        if self.lines:
+            report += f"\nLast {len(self.lines)} of {self.line_count} lines of output:\n{self.tail_text()}"
+        if self.log_file is not None:
+            report += f"\nFull output: {self.log_file}"
+        error(report, exit_code=returncode)
+
+
+def capture_for(command: str) -> OutputCapture:
+    """
+    An OutputCapture logging to the current step's log (emptied when the step
+    starts) or, outside a step, to a log named after the program that only
+    keeps its latest run.
+    """
+    step = current_step()
+    if step is not None:
+        return OutputCapture(command, log_path(step.label), on_line=step.on_line)
+    program = os.path.basename(command.split()[0]) if command.split() else "command"
+    return OutputCapture(command, log_path(program), append=False)
+
+
+def run_streaming(args, command: str, shell: bool = False, check: bool = True) -> subprocess.CompletedProcess:
+    """
+    Run `args` with stdout and stderr streamed into an OutputCapture. The
+    result carries no output (the tail is in the error report, the rest in
+    the log). `command` is the text used in messages and the log.
+    """
+    capture = capture_for(command)
+    console_tail = ConsoleTail(command) if capture.on_line is None else None
+    if console_tail is not None:
+        capture.on_line = console_tail
+    try:
+        try:
+            proc = subprocess.Popen(args, shell=shell, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except FileNotFoundError:
+            timing.annotate(exit_code=127)
+            error(f"Command not found: {args[0] if isinstance(args, list) else args}", exit_code=127)
+            return None
+        with proc:
+            for chunk in iter(lambda: proc.stdout.read1(CHUNK_SIZE), b""):
+                capture.feed(chunk)
+        returncode = proc.wait()
+        timing.annotate(exit_code=returncode, output_bytes=capture.bytes, output_lines=capture.line_count)
+    finally:
+        capture.close()
+        if console_tail is not None:
+            console_tail.close()
+    if check:
+        capture.check(returncode)
+    return subprocess.CompletedProcess(args, returncode)
+
+
+def record_output(command: Sequence[str], result: subprocess.CompletedProcess, check: bool = True) -> subprocess.CompletedProcess:
+    """Feed the output of a command that ran elsewhere (already captured) through the same sink."""
+    from .command import display
+
+    capture = capture_for(display(command))
+    try:
+        for text in (result.stdout, result.stderr):
+            if text:
+                capture.feed(text.encode())
+    finally:
+        capture.close()
+    if check:
+        capture.check(result.returncode)
+    return subprocess.CompletedProcess(result.args, result.returncode)
@@ -0,0 +1,123 @@
+"""
+Argv command builders, so no step needs `/bin/sh` to run a program.
+
+Commands used to be f-strings passed with `shell=True`: every one cost an
+extra shell process, and a quote in a path broke it. The helpers here build
+argv lists instead. `as_user` wraps an argv to run under another account,
+`run_pipeline` chains `subprocess.Popen` objects the way `a | b` would (but
+fails if any stage fails, not only the last), and daemons are launched with
+`process.spawn_detached` in a session of their own in place of `nohup ... &`.
+"""
+
+import os
+import pwd
+import shlex
+import subprocess
+import tempfile
+from typing import List, Optional, Sequence
+
+from . import timing
+from .shell import check_command
+from .status import error
+
+Argv = List[str]
+
+
+def argv(*parts) -> Argv:
+    """An argv list from `parts`; paths and numbers are converted to strings."""
+    return [str(part) for part in parts]
+
+
+def display(command: Sequence[str]) -> str:
+    """`command` quoted as a shell would need it, for messages and logs."""
+    return shlex.join(command)
+
+
+def current_user() -> Optional[str]:
+    try:
+        return pwd.getpwuid(os.geteuid()).pw_name
+    except KeyError:
+        return None
+
+
+def as_user(user: str, command: Sequence[str]) -> Argv:
+    """
+    `command` run as `user`: unchanged when that is already the current user,
+    else through `runuser`, or `su` when runuser is missing. su needs a
+    command string, so it gets one quoted with `shlex.join` and an explicit
+    `/bin/sh`, which also works for system accounts whose shell is nologin.
+    """
+    command = list(command)
+    if user == current_user():
+        return command
+    if check_command("runuser"):
+        return ["runuser", "-u", user, "--", *command]
+    return ["su", "-s", "/bin/sh", user, "-c", display(command)]
+
+
+def run_pipeline(commands: Sequence[Sequence[str]], check: bool = True,
+                 capture_output: bool = False) -> subprocess.CompletedProcess:
+    """
+    Run `commands` connected stdout to stdin, like a shell pipeline.
+
+    Args:
+        commands: The argv of each stage, in order.
+        check: If True, raise/exit when any stage fails.
+        capture_output: If True, return the last stage's stdout and every stage's stderr.
+
+    The exit status is that of the first stage that failed (as with
+    `set -o pipefail`), so `curl` failing is not hidden by the next stage.
+    """
+    commands = [list(command) for command in commands]
+    text = " | ".join(display(command) for command in commands)
+    with timing.span(text, kind=timing.COMMAND, stages=len(commands)):
+        return _run_pipeline(commands, text, check, capture_output)
+
+
+def _run_pipeline(commands, text, check, capture_output):
+    stderr = tempfile.TemporaryFile() if capture_output else None
+    procs = []
+    try:
+        upstream = None
+        for index, command in enumerate(commands):
+            last = index == len(commands) - 1
+            try:
+                proc = subprocess.Popen(
+                    command,
+                    stdin=upstream,
+                    stdout=subprocess.PIPE if not last or capture_output else None,
+                    stderr=stderr,
+                )
+            except FileNotFoundError:
+                for started in procs:
+                    started.kill()
+                    started.wait()
+                timing.annotate(exit_code=127)
+                error(f"Command not found: {command[0]}", exit_code=127)
+                return None
+            finally:
+                # Only the next stage reads from here; closing our copy lets SIGPIPE reach the writer.
+                if upstream is not None:
+                    upstream.close()
+            procs.append(proc)
+            upstream = proc.stdout
+
+        stdout = procs[-1].communicate()[0] if capture_output else None
+        for proc in procs:
+            proc.wait()
+        err = b""
+        if stderr is not None:
+            stderr.seek(0)
+            err = stderr.read()
+    finally:
+        if stderr is not None:
+            stderr.close()
+
+    returncode = next((proc.returncode for proc in procs if proc.returncode != 0), 0)
+    stdout = stdout.decode(errors="replace") if stdout is not None else None
+    err_text = err.decode(errors="replace") if capture_output else None
+    timing.annotate(exit_code=returncode, output_bytes=timing.output_size(stdout, err_text))
+    if check and returncode != 0:
+        err_msg = err_text.strip() if err_text else f"Pipeline '{text}' returned non-zero exit status {returncode}."
+        error(f"Command failed: {text}\nError: {err_msg}", exit_code=returncode)
+    return subprocess.CompletedProcess([proc.args for proc in procs], returncode, stdout, err_text)
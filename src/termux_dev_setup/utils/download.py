@@ -0,0 +1,461 @@
+"""
+Streaming artifact downloads with incremental SHA-256 verification.
+
+The response is read into one reusable buffer and each chunk is hashed as it
+is written to disk, so memory use stays at the buffer size no matter how large
+the artifact is (the collector tarball is 100+ MB, phones have little RAM).
+
+Bytes land in `<dest>.part` first. A dropped connection is retried with
+exponential backoff and resumed with an HTTP Range request from the last byte
+written, and a `.part` left behind by an earlier run is picked up the same
+way, so a flaky mobile link never restarts a large download from zero.
+
+`download_segmented` optionally splits the transfer into byte ranges fetched
+over several connections at once (TDS_DOWNLOAD_CONNECTIONS), which helps on
+high-latency links where one TCP stream never fills the pipe. That file has
+holes until every range is in, so it is assembled in `<dest>.segments`, which
+is never resumed and is removed whenever the download does not complete.
+"""
+
+import functools
+import hashlib
+import http.client
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from ..errors import ChecksumError, DownloadError
+
+# Upper bound (bytes) on the read buffer held in memory during a download.
+MAX_MEMORY_ENV = "TDS_DOWNLOAD_MAX_MEMORY"
+DEFAULT_CHUNK_SIZE = 256 * 1024
+MIN_CHUNK_SIZE = 4 * 1024
+
+USER_AGENT = "termux-dev-setup"
+DEFAULT_TIMEOUT = 30
+
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+# HTTP statuses worth retrying besides 5xx.
+RETRY_STATUSES = (408, 429)
+
+# Parallel connections for download_segmented; 1 keeps the single resumable stream.
+CONNECTIONS_ENV = "TDS_DOWNLOAD_CONNECTIONS"
+DEFAULT_CONNECTIONS = 1
+MAX_CONNECTIONS = 16
+# Below this many bytes per segment, another connection costs more than it saves.
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+
+def chunk_size_limit(requested: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Buffer size to use: `requested`, capped by TDS_DOWNLOAD_MAX_MEMORY."""
+    ceiling = os.environ.get(MAX_MEMORY_ENV)
+    if ceiling:
+        try:
+            requested = min(requested, int(ceiling))
+        except ValueError:
+            pass
+    return max(requested, MIN_CHUNK_SIZE)
+
+
+class StepProgress:
+    """
+    The subset of rich's Progress the downloads use, reported as one line
+    ("otel.tar.gz 42.0/100.0 MB 3.1 MB/s") to a setup step's live row.
+
+    advance() is called from every segment's thread, hence the lock; the
+    line is rebuilt at most every REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.shown = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def add_task(self, description: str, total: Optional[int] = None, completed: int = 0) -> int:
+        with self.lock:
+            self.tasks[len(self.tasks)] = {"description": description, "total": total, "completed": completed,
+                                           "start": time.monotonic(), "initial": completed}
+            return len(self.tasks) - 1
+
+    def update(self, task_id: int, total: Optional[int] = None, completed: Optional[int] = None):
+        with self.lock:
+            task = self.tasks[task_id]
+            if total is not None:
+                task["total"] = total
+            if completed is not None:
+                task["completed"] = completed
+        self._show(task_id)
+
+    def advance(self, task_id: int, amount: int):
+        with self.lock:
+            self.tasks[task_id]["completed"] += amount
+        self._show(task_id)
+
+    def _show(self, task_id: int):
+        from rich.filesize import decimal
+        from .capture import REFRESH_INTERVAL
+
+        now = time.monotonic()
+        with self.lock:
+            if now - self.shown < REFRESH_INTERVAL:
+                return
+            self.shown = now
+            task = dict(self.tasks[task_id])
+        done = decimal(task["completed"])
+        size = f"{done}/{decimal(task['total'])}" if task["total"] else done
+        elapsed = now - task["start"]
+        speed = f" {decimal(int((task['completed'] - task['initial']) / elapsed))}/s" if elapsed > 0 else ""
+        self.on_line(f"{task['description']} {size}{speed}")
+
+
+def make_progress(enabled: bool = True):
+    """
+    Rich progress bar showing bytes, throughput and ETA on the shared console.
+
+    Inside a setup step the graph's live view is already running (and rich
+    < 14.1 allows only one live display at a time), so the progress is shown
+    in the step's row through a StepProgress instead.
+    """
+    from rich.progress import (
+        BarColumn, DownloadColumn, Progress, TextColumn, TimeRemainingColumn, TransferSpeedColumn,
+    )
+    from .capture import current_step
+    from .status import console
+
+    step = current_step()
+    if step is not None:
+        if enabled and step.on_line is not None:
+            return StepProgress(step.on_line)
+        enabled = False
+
+    return Progress(
+        TextColumn("  [info]{task.description}[/info]"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+        disable=not enabled,
+    )
+    from .capture import streaming_active
+    from .status import console
+
+    enabled = enabled and not streaming_active()
+
+    return Progress(
+        TextColumn("  [info]{task.description}[/info]"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+        disable=not enabled,
+    )
+
+
+def connections_from_env() -> int:
+    try:
+        connections = int(os.environ.get(CONNECTIONS_ENV, DEFAULT_CONNECTIONS))
+    except ValueError:
+        return DEFAULT_CONNECTIONS
+    return min(max(connections, 1), MAX_CONNECTIONS)
+
+
+def open_url(url: str, timeout: float = DEFAULT_TIMEOUT, headers: Optional[dict] = None, method: Optional[str] = None):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})}, method=method)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def part_path(dest) -> Path:
+    """Where the bytes of `dest` accumulate until the download completes."""
+    dest = Path(dest)
+    return dest.with_name(dest.name + ".part")
+
+
+def segments_path(dest) -> Path:
+    """Where download_segmented assembles `dest`; unlike `.part` it is never resumed."""
+    dest = Path(dest)
+    return dest.with_name(dest.name + ".segments")
+
+
+def parse_content_range(value: Optional[str]):
+    """Split `bytes 100-199/1000` (or `bytes */1000`) into (start, total); None for unknown parts."""
+    if not value or not value.startswith("bytes "):
+        return None, None
+    span, _, total = value[6:].partition("/")
+    start = span.partition("-")[0]
+    return (int(start) if start.isdigit() else None), (int(total) if total.isdigit() else None)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Transient network failures are retried; client errors and bad URLs are not."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code >= 500 or exc.code in RETRY_STATUSES
+    return isinstance(exc, (OSError, http.client.HTTPException))
+
+
+def _hash_existing(path: Path, hasher, view: memoryview) -> int:
+    """Feed the bytes already on disk into `hasher`; returns how many there were."""
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(view)
+            if not n:
+                return size
+            hasher.update(view[:n])
+            size += n
+
+
+def download_file(
+    url: str,
+    dest,
+    expected_sha256: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout: float = DEFAULT_TIMEOUT,
+    progress: bool = True,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+) -> str:
+    """
+    Stream `url` to `dest`, hashing as it goes, and return the hex SHA-256.
+
+    Interrupted transfers are retried up to `retries` times, waiting `backoff`
+    seconds (doubling each time) and resuming from the `.part` file with a
+    Range request; a server that ignores ranges is downloaded from the start.
+    Raises DownloadError once retries are exhausted or on a non-transient
+    failure, and ChecksumError when `expected_sha256` is given and does not
+    match (the partial file is removed then).
+    """
+    from .status import warning
+
+    dest = Path(dest)
+    part = part_path(dest)
+    hasher = hashlib.sha256()
+    buffer = bytearray(chunk_size_limit(chunk_size))
+    view = memoryview(buffer)
+    offset = _hash_existing(part, hasher, view) if part.exists() else 0
+    # ETag/Last-Modified of the first response, so a resume never splices two versions together.
+    validator = None
+    failures = 0
+
+    with make_progress(progress) as bar:
+        task = bar.add_task(dest.name, total=None, completed=offset)
+        while True:
+            try:
+                headers = {}
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+                    if validator:
+                        headers["If-Range"] = validator
+                try:
+                    response = open_url(url, timeout, headers)
+                except urllib.error.HTTPError as e:
+                    if e.code != 416 or not offset:
+                        raise
+                    # Nothing left past our offset: either the .part is already complete or it is stale.
+                    _, total = parse_content_range(e.headers.get("Content-Range"))
+                    e.close()
+                    if total == offset:
+                        break
+                    hasher, offset = hashlib.sha256(), 0
+                    continue
+
+                with response:
+                    if offset and (response.status != 206 or parse_content_range(response.headers.get("Content-Range"))[0] != offset):
+                        # Range ignored (or the file changed under If-Range): start over.
+                        hasher, offset = hashlib.sha256(), 0
+                    validator = validator or response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    length = response.headers.get("Content-Length")
+                    expected_end = offset + int(length) if length else None
+                    bar.update(task, total=expected_end, completed=offset)
+
+                    with open(part, "r+b" if offset else "wb") as out:
+                        # Drop any bytes past the last chunk we accounted for.
+                        out.seek(offset)
+                        out.truncate()
+                        while True:
+                            n = response.readinto(buffer)
+                            if not n:
+                                break
+                            out.write(view[:n])
+                            hasher.update(view[:n])
+                            offset += n
+                            bar.advance(task, n)
+                    if expected_end is not None and offset < expected_end:
+                        raise ConnectionError(f"Connection closed after {offset} of {expected_end} bytes")
+                break
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                # urllib's URLError/HTTPError are OSErrors; ValueError covers malformed URLs;
+                # a connection dropped mid-body surfaces as http.client.IncompleteRead.
+                failures += 1
+                if failures > retries or not is_retryable(e):
+                    raise DownloadError(str(e)) from e
+                delay = min(backoff * 2 ** (failures - 1), MAX_BACKOFF)
+                warning(f"Download interrupted ({e}); resuming from byte {offset} in {delay:g}s "
+                        f"(retry {failures}/{retries})...")
+                time.sleep(delay)
+
+    digest = hasher.hexdigest()
+    if expected_sha256 and digest != expected_sha256.lower():
+        part.unlink(missing_ok=True)
+        raise ChecksumError(expected_sha256, digest)
+    os.replace(part, dest)
+    return digest
+
+
+class RangeNotSupported(Exception):
+    """The server answered a Range request with something other than that range."""
+
+
+def probe_ranges(url: str, timeout: float = DEFAULT_TIMEOUT) -> Optional[int]:
+    """Size of `url` when a HEAD request shows the server accepts byte ranges, else None."""
+    try:
+        with open_url(url, timeout, method="HEAD") as response:
+            if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+                return None
+            length = response.headers.get("Content-Length", "")
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    return int(length) if length.isdigit() else None
+
+
+def split_ranges(size: int, parts: int, min_size: int = MIN_SEGMENT_SIZE) -> List[Tuple[int, int]]:
+    """Cut `size` bytes into at most `parts` inclusive (start, end) ranges of at least `min_size`."""
+    parts = max(1, min(parts, size // max(min_size, 1)))
+    step = -(-size // parts)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+def _preallocate(fd: int, size: int):
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not every filesystem (or platform) supports fallocate; a sparse file works too.
+        os.ftruncate(fd, size)
+
+
+def _fetch_range(url, fd, start, end, chunk_size, timeout, retries, backoff, advance, abort: threading.Event):
+    """Download bytes start..end into `fd` with positional writes, resuming within the range on retries."""
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    pos = start
+    failures = 0
+    while pos <= end and not abort.is_set():
+        try:
+            with open_url(url, timeout, {"Range": f"bytes={pos}-{end}"}) as response:
+                if response.status != 206 or parse_content_range(response.headers.get("Content-Range"))[0] != pos:
+                    raise RangeNotSupported(f"expected bytes {pos}-{end}, got HTTP {response.status}")
+                while pos <= end and not abort.is_set():
+                    n = response.readinto(view[:min(chunk_size, end - pos + 1)])
+                    if not n:
+                        break
+                    written = 0
+                    while written < n:
+                        written += os.pwrite(fd, view[written:n], pos + written)
+                    pos += n
+                    advance(n)
+            if pos <= end and not abort.is_set():
+                raise ConnectionError(f"Connection closed at byte {pos} of range {start}-{end}")
+        except (OSError, http.client.HTTPException) as e:
+            failures += 1
+            if failures > retries or not is_retryable(e):
+                raise
+            time.sleep(min(backoff * 2 ** (failures - 1), MAX_BACKOFF))
+
+
+def download_segmented(
+    url: str,
+    dest,
+    expected_sha256: Optional[str] = None,
+    connections: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout: float = DEFAULT_TIMEOUT,
+    progress: bool = True,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    min_segment_size: int = MIN_SEGMENT_SIZE,
+) -> str:
+    """
+    Download `url` to `dest` over several concurrent Range requests and return the hex SHA-256.
+
+    The file is preallocated and each segment is written in place with
+    pwrite; the combined SHA-256 is computed over the assembled file (SHA-256
+    cannot be merged from per-segment digests). Falls back to the single
+    resumable stream of download_file when `connections` (default:
+    TDS_DOWNLOAD_CONNECTIONS) is 1, the server does not advertise ranges, the
+    file is too small to split, or a `.part` from an earlier run can be resumed.
+    Segments are assembled in `<dest>.segments` (see segments_path), never in
+    the resumable `.part`. Raises DownloadError/ChecksumError like download_file.
+    """
+    connections = connections_from_env() if connections is None else connections
+    dest = Path(dest)
+    part = part_path(dest)
+    size = probe_ranges(url, timeout) if connections > 1 and not part.exists() else None
+    ranges = split_ranges(size, connections, min_segment_size) if size else []
+    fallback_args = (url, dest, expected_sha256, chunk_size, timeout, progress, retries, backoff)
+    if len(ranges) < 2:
+        return download_file(*fallback_args)
+
+    # The memory ceiling covers all connections together.
+    per_connection = max(chunk_size_limit(chunk_size) // len(ranges), MIN_CHUNK_SIZE)
+    abort = threading.Event()
+    segments = segments_path(dest)
+    fd = os.open(segments, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    complete = False
+    try:
+        try:
+            _preallocate(fd, size)
+            with make_progress(progress) as bar, ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="tds-download") as pool:
+                task = bar.add_task(dest.name, total=size)
+                advance = functools.partial(bar.advance, task)
+                futures = [
+                    pool.submit(_fetch_range, url, fd, start, end, per_connection, timeout, retries, backoff, advance, abort)
+                    for start, end in ranges
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                finally:
+                    # Stop the other segments as soon as one has failed for good.
+                    abort.set()
+        except RangeNotSupported:
+            # Advertised ranges that are not honoured: use one plain stream instead.
+            os.close(fd)
+            fd = None
+            segments.unlink(missing_ok=True)
+            return download_file(*fallback_args)
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            raise DownloadError(str(e)) from e
+        os.close(fd)
+        fd = None
+
+        hasher = hashlib.sha256()
+        _hash_existing(segments, hasher, memoryview(bytearray(chunk_size_limit(chunk_size))))
+        digest = hasher.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            raise ChecksumError(expected_sha256, digest)
+        os.replace(segments, dest)
+        complete = True
+        return digest
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if not complete:
+            # Failure, bad checksum, Ctrl-C: a file with holes must never outlive the call.
+            segments.unlink(missing_ok=True)
@@ -0,0 +1,82 @@
+"""
+Fingerprints of setup step inputs, and the per-flow record of them.
+
+A step's fingerprint is a digest of whatever decides its outcome: config
+values, the files it writes, the binaries it runs. `TaskGraph` compares it
+with the one recorded after the step last succeeded and skips the step when
+they match, so rerunning `tds setup <svc>` on an unchanged system does no
+work. The record lives in `state_dir("steps", "<flow>.json")`.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .paths import state_dir
+
+FORCE_ENV = "TDS_FORCE_STEPS"
+
+
+def force_from_env() -> bool:
+    """TDS_FORCE_STEPS=1 reruns every step regardless of recorded fingerprints."""
+    return os.environ.get(FORCE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def digest(value) -> str:
+    """Stable SHA-256 of any JSON-serialisable value (paths and the like via str)."""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def file_digest(path) -> Optional[str]:
+    """SHA-256 of a file's content, or None when it cannot be read."""
+    hasher = hashlib.sha256()
+    try:
+        with Path(path).open("rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def file_signature(path) -> Optional[Tuple[int, int, int]]:
+    """(size, mtime_ns, uid) of a path, a cheap stand-in for hashing big binaries; None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_uid
+
+
+def owner_signature(path) -> Optional[Tuple[int, int, int]]:
+    """(uid, gid, mode) of a path, e.g. a directory a step creates and chowns; None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_uid, st.st_gid, st.st_mode
+
+
+class StepState:
+    """Recorded fingerprints of one setup flow's steps."""
+
+    def __init__(self, flow: str, path: Optional[Path] = None):
+        self.path = Path(path) if path else state_dir("steps", f"{flow}.json")
+        self.fingerprints: Dict[str, str] = {}
+
+    def load(self) -> "StepState":
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        self.fingerprints = data if isinstance(data, dict) else {}
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.fingerprints, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.path)
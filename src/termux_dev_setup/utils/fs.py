@@ -0,0 +1,100 @@
+"""
+Native directory preparation (replaces `mkdir -p`, `chown -R` and `chmod`).
+
+Each of those used to be a subprocess, and `chown -R` rewrote the owner of
+every entry of a populated data directory on each run. `ensure_dir` creates
+the directory with `os.makedirs`, then walks the tree with `os.scandir` and
+only calls `os.chown`/`os.chmod` on entries whose ownership or mode is wrong,
+so a tree that is already right costs one lstat per entry and no writes. Large
+trees can be walked by several threads, one directory per work item.
+"""
+
+import grp
+import os
+import pwd
+import stat
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Threads used by callers that walk directories which can grow large (data dirs).
+WALK_WORKERS = 4
+
+Owner = Tuple[int, int]
+
+
+def lookup_owner(user: str, group: Optional[str] = None) -> Optional[Owner]:
+    """(uid, gid) of `user` and `group` (default: the group named like the user); None if either is missing."""
+    try:
+        return pwd.getpwnam(user).pw_uid, grp.getgrnam(group or user).gr_gid
+    except KeyError:
+        return None
+
+
+def _fix(path, st: os.stat_result, owner: Optional[Owner], mode: Optional[int]) -> bool:
+    """Apply `owner`/`mode` to one entry if they differ from `st`; True when it changed."""
+    changed = False
+    if owner is not None and (st.st_uid, st.st_gid) != owner:
+        os.chown(path, *owner, follow_symlinks=False)
+        changed = True
+    if mode is not None and stat.S_IMODE(st.st_mode) != mode:
+        os.chmod(path, mode)
+        changed = True
+    return changed
+
+
+def _scan(directory: str, owner: Owner) -> Tuple[int, List[str]]:
+    """Fix the owner of `directory`'s entries; return how many changed and the subdirectories to visit."""
+    changed = 0
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if _fix(entry.path, entry.stat(follow_symlinks=False), owner, None):
+                changed += 1
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    return changed, subdirs
+
+
+def chown_tree(root, owner: Owner, workers: int = 1) -> int:
+    """
+    Give every entry below `root` the owner `owner` (symlinks themselves, never
+    their targets). Returns the number of entries changed.
+    """
+    changed = 0
+    if workers <= 1:
+        stack = [str(root)]
+        while stack:
+            count, subdirs = _scan(stack.pop(), owner)
+            changed += count
+            stack.extend(subdirs)
+        return changed
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tds-walk") as pool:
+        pending = {pool.submit(_scan, str(root), owner)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                count, subdirs = future.result()
+                changed += count
+                pending |= {pool.submit(_scan, subdir, owner) for subdir in subdirs}
+    return changed
+
+
+def ensure_dir(path, owner: Optional[Owner] = None, mode: Optional[int] = None,
+               recursive: bool = False, workers: int = 1) -> int:
+    """
+    Create `path` (with parents) and give it `owner` and `mode`; with
+    `recursive`, also the owner of everything below it.
+
+    Returns how many entries were created or changed (0 when all was right).
+    Raises OSError when the directory cannot be created or changed.
+    """
+    path = Path(path)
+    created = not path.is_dir()
+    if created:
+        os.makedirs(path, exist_ok=True)
+    changed = int(_fix(path, os.stat(path), owner, mode) or created)
+    if recursive and owner is not None:
+        changed += chown_tree(path, owner, workers)
+    return changed
@@ -0,0 +1,94 @@
+"""
+Per-flow journal of completed setup steps, for `tds setup <svc> --resume`.
+
+`TaskGraph` records each step in `state_dir("journal", "<flow>.json")` as
+soon as it finishes, so a run that dies halfway (say `initdb` after a long
+`apt install`) leaves a record of what is already done. A resumed run skips
+those steps; a successful run deletes the journal. Steps may also carry an
+undo callable, which `--rollback` runs in reverse order for the steps the
+failed attempt applied.
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .paths import state_dir
+
+class Journal:
+    def __init__(self, flow: str, path: Optional[Path] = None):
+        self.flow = flow
+        self.path = Path(path) if path else state_dir("journal", f"{flow}.json")
+        self.steps: Dict[str, dict] = {}
+
+    def load(self) -> "Journal":
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        steps = data.get("steps") if isinstance(data, dict) else None
+        self.steps = steps if isinstance(steps, dict) else {}
+        return self
+
+    def completed(self) -> List[str]:
+        """Steps recorded as finished, in the order they finished."""
+        return list(self.steps)
+
+    def record(self, step: str, status: str):
+        """Note that `step` finished with `status` (done, or unchanged)."""
+        self.steps[step] = {"status": status, "finished": time.time()}
+        self.save()
+
+    def forget(self, step: str):
+        if self.steps.pop(step, None) is not None:
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"flow": self.flow, "steps": self.steps}, indent=1))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.steps = {}
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def snapshot_file(path) -> Callable[[], None]:
+    """
+    Remember a small file's current content (e.g. a generated config); the
+    returned undo puts it back, or removes the file if it did not exist yet.
+    """
+    path = Path(path)
+    try:
+        previous = path.read_bytes()
+    except OSError:
+        previous = None
+
+    def undo():
+        if previous is None:
+            path.unlink(missing_ok=True)
+        else:
+            path.write_bytes(previous)
+    return undo
+
+
+def remove_if_new(path) -> Callable[[], None]:
+    """The returned undo removes `path` (file or directory) unless it already exists now."""
+    path = Path(path)
+    existed = path.exists()
+
+    def undo():
+        if existed:
+            return
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+    return undo
@@ -0,0 +1,125 @@
+"""
+Cached PATH and account lookups.
+
+`check_command` used to call `shutil.which`, which stats a candidate in every
+PATH directory on each call. `which` here answers from an index of PATH built
+with one `os.scandir` per directory and rebuilt when PATH changes. A miss is
+trusted only while no PATH directory was modified since the scan, so a binary
+apt just installed is found without an explicit refresh.
+
+`user_exists`/`group_exists` read /etc/passwd and /etc/group directly instead
+of spawning `id`, and re-read them only when the file changed.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+PASSWD = "/etc/passwd"
+GROUP = "/etc/group"
+
+
+class PathIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._entries: Dict[str, List[str]] = {}
+        self._mtimes: Tuple[Optional[int], ...] = ()
+
+    @staticmethod
+    def _dirs(path: str) -> List[str]:
+        # An empty PATH element means the current directory, as for shutil.which.
+        return list(dict.fromkeys(d or os.curdir for d in path.split(os.pathsep)))
+
+    @staticmethod
+    def _mtime(directory: str) -> Optional[int]:
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build(self, path: str):
+        entries: Dict[str, List[str]] = {}
+        mtimes = []
+        for directory in self._dirs(path):
+            mtimes.append(self._mtime(directory))
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        entries.setdefault(entry.name, []).append(entry.path)
+            except OSError:
+                continue
+        self._path, self._entries, self._mtimes = path, entries, tuple(mtimes)
+
+    def _stale(self) -> bool:
+        return tuple(self._mtime(d) for d in self._dirs(self._path)) != self._mtimes
+
+    def which(self, name: str) -> Optional[str]:
+        """Full path of the first executable `name` on PATH, or None."""
+        if os.sep in name:
+            return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+        path = os.environ.get("PATH", os.defpath)
+        with self._lock:
+            if path != self._path:
+                self._build(path)
+            found = self._first_executable(name)
+            if found is None and self._stale():
+                self._build(path)
+                found = self._first_executable(name)
+            return found
+
+    def _first_executable(self, name: str) -> Optional[str]:
+        for candidate in self._entries.get(name, ()):
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._path = None
+
+
+_index = PathIndex()
+
+
+def which(name: str) -> Optional[str]:
+    return _index.which(name)
+
+
+def invalidate_path_index():
+    """Forget the PATH index, e.g. after removing a binary (additions are picked up on their own)."""
+    _index.invalidate()
+
+
+_account_lock = threading.Lock()
+_accounts: Dict[str, Tuple[Tuple[int, int], frozenset]] = {}
+
+
+def _names(db: str) -> frozenset:
+    """First fields of a passwd/group style file, re-read only when it changed."""
+    try:
+        st = os.stat(db)
+    except OSError:
+        return frozenset()
+    signature = (st.st_mtime_ns, st.st_size)
+    with _account_lock:
+        cached = _accounts.get(db)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            with open(db, encoding="utf-8", errors="replace") as f:
+                names = frozenset(line.split(":", 1)[0] for line in f if ":" in line and not line.startswith("#"))
+        except OSError:
+            names = frozenset()
+        _accounts[db] = (signature, names)
+        return names
+
+
+def user_exists(name: str) -> bool:
+    """Whether /etc/passwd has an entry for `name`."""
+    return name in _names(PASSWD)
+
+
+def group_exists(name: str) -> bool:
+    """Whether /etc/group has an entry for `name`."""
+    return name in _names(GROUP)
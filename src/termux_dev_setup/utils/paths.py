@@ -0,0 +1,27 @@
+import os
+from pathlib import Path
+
+def cache_dir(*parts: str) -> Path:
+    """
+    Per-user cache directory for tds (not created).
+
+    Honours TDS_CACHE_DIR, then XDG_CACHE_HOME, then ~/.cache/tds.
+    """
+    base = os.environ.get("TDS_CACHE_DIR")
+    if not base:
+        xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(xdg, "tds")
+    return Path(base, *parts)
+
+def state_dir(*parts: str) -> Path:
+    """
+    Per-user state directory for tds (not created). Unlike the cache, losing it
+    only costs a full rerun of setup steps.
+
+    Honours TDS_STATE_DIR, then XDG_STATE_HOME, then ~/.local/state/tds.
+    """
+    base = os.environ.get("TDS_STATE_DIR")
+    if not base:
+        xdg = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+        base = os.path.join(xdg, "tds")
+    return Path(base, *parts)
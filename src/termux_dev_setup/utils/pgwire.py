@@ -0,0 +1,122 @@
+"""
+Minimal PostgreSQL wire-protocol readiness probe (what `pg_isready` does).
+
+A bare TCP connect only proves the postmaster is listening. Sending a
+StartupMessage and reading the first reply tells apart a server that accepts
+connections (it asks for authentication, or rejects us for an ordinary reason
+such as pg_hba) from one that is still starting, recovering or shutting down
+(SQLSTATE 57P03, "cannot_connect_now"). No credentials are ever sent.
+"""
+
+import os
+import socket
+import struct
+from typing import Tuple
+
+from ..service_status import ServiceStatus
+
+DEFAULT_TIMEOUT = 0.5
+PROTOCOL_VERSION = 3 << 16  # 3.0
+CANNOT_CONNECT_NOW = "57P03"
+
+# Message texts the server uses for 57P03, mapped to our lifecycle states.
+CANNOT_CONNECT_STATES = (
+    ("starting up", ServiceStatus.STARTING),
+    ("shutting down", ServiceStatus.STOPPING),
+    ("recovery", ServiceStatus.RECOVERING),
+    ("not yet accepting connections", ServiceStatus.RECOVERING),
+)
+
+
+def startup_message(user: str, database: str = "postgres") -> bytes:
+    """Encode a protocol 3.0 StartupMessage for `user`/`database`."""
+    params = b"".join(
+        key.encode() + b"\0" + value.encode() + b"\0"
+        for key, value in (("user", user), ("database", database))
+    ) + b"\0"
+    return struct.pack("!ii", len(params) + 8, PROTOCOL_VERSION) + params
+
+
+def parse_error_fields(payload: bytes) -> dict:
+    """Split an ErrorResponse body into its {field code: value} map (S, C, M, ...)."""
+    fields = {}
+    for part in payload.split(b"\0"):
+        if part:
+            fields[part[:1].decode(errors="replace")] = part[1:].decode(errors="replace")
+    return fields
+
+
+def classify_reply(kind: bytes, payload: bytes) -> Tuple[ServiceStatus, str]:
+    """Map the server's first reply to a startup message onto a ServiceStatus."""
+    if kind == b"R":
+        return ServiceStatus.RUNNING, "accepting connections"
+    if kind == b"E":
+        fields = parse_error_fields(payload)
+        message = fields.get("M", "")
+        if fields.get("C") == CANNOT_CONNECT_NOW:
+            for needle, status in CANNOT_CONNECT_STATES:
+                if needle in message:
+                    return status, message
+            return ServiceStatus.STARTING, message
+        # Rejected for an ordinary reason (auth, pg_hba, unknown role): the server is up.
+        return ServiceStatus.RUNNING, "accepting connections"
+    return ServiceStatus.UNKNOWN, "unexpected reply"
+
+
+def socket_path(socket_dir: str, port: int) -> str:
+    return os.path.join(socket_dir, f".s.PGSQL.{port}")
+
+
+def read_message(sock: socket.socket) -> Tuple[bytes, bytes]:
+    """Read one backend message; returns (type byte, body)."""
+    header = _recv_exact(sock, 5)
+    kind, length = header[:1], struct.unpack("!i", header[1:])[0]
+    # Only the first message matters; cap the body so a misbehaving peer cannot make us buffer much.
+    return kind, _recv_exact(sock, min(max(length - 4, 0), 8192))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed by server")
+        data += chunk
+    return data
+
+
+def _connect(host: str, port: int, socket_dir: str, timeout: float) -> socket.socket:
+    """Prefer the Unix socket in `socket_dir`, falling back to TCP."""
+    if socket_dir:
+        path = socket_path(socket_dir, port)
+        if os.path.exists(path):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(path)
+                return sock
+            except OSError:
+                # Stale socket file left behind by a crashed server.
+                sock.close()
+    return socket.create_connection((host, port), timeout=timeout)
+
+
+def probe(host: str = "127.0.0.1", port: int = 5432, socket_dir: str = "", user: str = "postgres", timeout: float = DEFAULT_TIMEOUT) -> Tuple[ServiceStatus, str]:
+    """
+    Ask the server whether it accepts connections.
+
+    Returns (status, detail): RUNNING, STARTING, RECOVERING or STOPPING when
+    the server answered, STOPPED when nothing is listening, UNKNOWN otherwise.
+    """
+    try:
+        sock = _connect(host, port, socket_dir, timeout)
+    except OSError:
+        return ServiceStatus.STOPPED, "no server listening"
+    try:
+        sock.sendall(startup_message(user))
+        kind, payload = read_message(sock)
+    except (OSError, ValueError) as e:
+        return ServiceStatus.UNKNOWN, f"no reply: {e}"
+    finally:
+        sock.close()
+    return classify_reply(kind, payload)
@@ -1,6 +1,13 @@
-from .shell import run_command, check_command
+from .shell import run_command
+from .command import as_user
+from .capture import record_output, streaming_active
+from .user_worker import WorkerSession, WorkerUnavailable
 from pathlib import Path
 
+NO_WORKER_ENV = "TDS_NO_PG_WORKER"
+
+_session = WorkerSession("postgres", disable_env=NO_WORKER_ENV)
+
 def get_pg_bin() -> Path:
     """Detect PostgreSQL bin directory."""
     try:
@@ -12,10 +19,31 @@ def get_pg_bin() -> Path:
     except Exception:
         return None
 
-def run_as_postgres(cmd, check=True, capture_output=False):
-    """Helper to run command as postgres user."""
-    if check_command("runuser"):
-        full_cmd = f"runuser -u postgres -- {cmd}"
-    else:
-        full_cmd = f"su - postgres -c \"{cmd}\""
-    return run_command(full_cmd, shell=True, check=check, capture_output=capture_output)
+def read_postmaster_pid(data_dir) -> int:
+    """PID of the running postmaster from `<data_dir>/postmaster.pid`, or None."""
+    try:
+        with open(Path(data_dir) / "postmaster.pid") as f:
+            return int(f.readline().strip())
+    except (OSError, ValueError):
+        return None
+
+def postgres_session() -> WorkerSession:
+    """
+    Context manager within which `run_as_postgres` hands commands to one
+    resident worker running as postgres instead of switching user for each.
+    """
+    return _session
+
+def run_as_postgres(argv, check=True, capture_output=False):
+    """Run the argv list `argv` as the postgres user (no shell is involved)."""
+    worker = _session.worker()
+    if worker is not None:
+        # Inside a setup step the output belongs in the step log, as for run_command.
+        streamed = not capture_output and streaming_active()
+        try:
+            result = worker.run(argv, check=check and not streamed, capture_output=capture_output or streamed)
+        except WorkerUnavailable:
+            pass
+        else:
+            return record_output(argv, result, check) if streamed else result
+    return run_command(as_user("postgres", argv), check=check, capture_output=capture_output)
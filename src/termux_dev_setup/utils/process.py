@@ -0,0 +1,117 @@
+"""
+PID-file based tracking for the background services tds launches.
+
+Stopping a service signals exactly the PID it recorded, after checking that
+the PID is still alive in /proc and still belongs to the expected program, so
+other instances (or an unrelated process that inherited a recycled PID) are
+never touched and no process-table scan (`pkill`) is needed.
+"""
+
+import os
+import signal
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+PROC = Path("/proc")
+
+
+def read_pid(pid_file) -> Optional[int]:
+    """PID recorded in `pid_file`, or None when missing or malformed."""
+    try:
+        pid = int(Path(pid_file).read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pid if pid > 0 else None
+
+
+def write_pid(pid_file, pid: int):
+    """Atomically record `pid` in `pid_file`."""
+    path = Path(pid_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(f"{pid}\n")
+    os.replace(tmp_path, path)
+
+
+def remove_pid(pid_file):
+    try:
+        os.unlink(pid_file)
+    except OSError:
+        pass
+
+
+def is_alive(pid: int) -> bool:
+    """True while `pid` exists and is not a zombie."""
+    if not pid:
+        return False
+    if not PROC.is_dir():
+        # No /proc (e.g. macOS): ask the kernel directly; zombies cannot be told apart here.
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+    try:
+        stat = (PROC / str(pid) / "stat").read_text()
+    except OSError:
+        return False
+    # The state follows the parenthesised command name, which may itself contain ") ".
+    state = stat.rsplit(")", 1)[-1].split()[:1]
+    return state not in (["Z"], ["X"])
+
+
+def cmdline(pid: int) -> Optional[List[str]]:
+    """Arguments of `pid` from /proc, or None when unavailable (or not yet populated)."""
+    try:
+        raw = (PROC / str(pid) / "cmdline").read_bytes()
+    except OSError:
+        return None
+    return [part.decode(errors="replace") for part in raw.split(b"\0") if part] or None
+
+
+def running_pid(pid_file, name: str = None) -> Optional[int]:
+    """
+    PID from `pid_file` if that process is alive (and, when `name` is given,
+    its command line mentions `name`); None for stale or recycled PIDs.
+    """
+    pid = read_pid(pid_file)
+    if pid is None or not is_alive(pid):
+        return None
+    if name:
+        args = cmdline(pid)
+        # Redis rewrites its process title, so match anywhere in the arguments.
+        if args is not None and not any(name in arg for arg in args):
+            return None
+    return pid
+
+
+def send_signal(pid: int, sig: int = signal.SIGTERM) -> bool:
+    """Signal `pid`; False when it no longer exists."""
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def spawn_detached(argv: List[str], log_file=None, pid_file=None) -> int:
+    """
+    Start `argv` in its own session with output written to `log_file`
+    (truncated, like a shell `>` redirect; discarded when None), record its
+    PID in `pid_file` (unless None, e.g. for a server that writes its own)
+    and return it.
+    """
+    with open(log_file if log_file is not None else os.devnull, "wb") as log:
+        proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    if pid_file is not None:
+        write_pid(pid_file, proc.pid)
+    return proc.pid
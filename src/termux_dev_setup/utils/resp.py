@@ -0,0 +1,136 @@
+"""
+Minimal in-process Redis (RESP2) client for health checks and shutdown.
+
+Replaces spawning `redis-cli` for PING/INFO/SHUTDOWN: each check is a single
+socket round-trip, and the password never appears on a process command line.
+"""
+
+import socket
+from typing import Dict, Optional
+
+DEFAULT_TIMEOUT = 0.5
+
+
+class RespError(Exception):
+    """Error reply from the server (e.g. NOAUTH, WRONGPASS, LOADING)."""
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class RespClient:
+    """
+    One short-lived connection to a Redis server.
+
+    Usage:
+        with RespClient("127.0.0.1", 6379, password="secret") as client:
+            client.command("PING")  # -> "PONG"
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, password: str = "", timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+
+    def __enter__(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            self.command("AUTH", self.password)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+        if self._sock:
+            self._sock.close()
+        self._sock = self._file = None
+
+    def send(self, *args):
+        self._sock.sendall(encode_command(*args))
+
+    def command(self, *args):
+        """Send a command and return its decoded reply; error replies raise RespError."""
+        self.send(*args)
+        return self.read_reply()
+
+    def read_reply(self):
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by server")
+            return data[:-2].decode(errors="replace")
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self.read_reply() for _ in range(count)]
+        raise RespError(f"Unexpected reply type: {line[:20]!r}")
+
+
+def ping(host: str = "127.0.0.1", port: int = 6379, password: str = "", timeout: float = DEFAULT_TIMEOUT) -> bool:
+    """True when the server answers PING with PONG (after AUTH, if a password is set)."""
+    try:
+        with RespClient(host, port, password, timeout) as client:
+            return client.command("PING") == "PONG"
+    except (OSError, RespError, ValueError):
+        return False
+
+
+def parse_info(text: str) -> Dict[str, str]:
+    """Parse an INFO reply ("key:value" lines, "#" section headers) into a dict."""
+    result = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#") or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        result[key] = value
+    return result
+
+
+def info(host: str = "127.0.0.1", port: int = 6379, password: str = "", section: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT) -> Dict[str, str]:
+    """Return the server's INFO fields; raises OSError/RespError when unavailable."""
+    with RespClient(host, port, password, timeout) as client:
+        reply = client.command("INFO", section) if section else client.command("INFO")
+    return parse_info(reply or "")
+
+
+def shutdown(host: str = "127.0.0.1", port: int = 6379, password: str = "", timeout: float = DEFAULT_TIMEOUT) -> None:
+    """
+    Ask the server to SHUTDOWN (saving per its config).
+
+    On success the server closes the connection without replying; an error
+    reply (e.g. a failed save or bad password) raises RespError.
+    """
+    with RespClient(host, port, password, timeout) as client:
+        client.send("SHUTDOWN")
+        try:
+            client.read_reply()
+        except (ConnectionError, socket.timeout):
+            return
@@ -1,40 +1,201 @@
 import subprocess
 import shlex
-from typing import Optional, Tuple
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+from . import timing
 from .status import error, info
 
-def run_command(command: str, shell: bool = False, check: bool = True, capture_output: bool = False) -> subprocess.CompletedProcess:
+def run_command(command: Union[str, Sequence[str]], shell: bool = False, check: bool = True, capture_output: bool = False,
+                stream: bool = False) -> subprocess.CompletedProcess:
     """
     Run a shell command safely.
     
     Args:
-        command: The command string to run.
+        command: The command string to run, or an argv list (run as is, never split or quoted).
         shell: If True, run through the shell (use carefully).
         check: If True, raise/exit on failure.
         capture_output: If True, return stdout/stderr in the result.
+        stream: If True, stream the output into a log file and a bounded tail
+            instead of the terminal (always the case inside a setup step; see utils/capture.py).
     """
-    args = command if shell else shlex.split(command)
-    
+    if not isinstance(command, str):
+        args, shell = list(command), False
+        command = shlex.join(args)
+    else:
+        args = command if shell else shlex.split(command)
+
+    with timing.span(command, kind=timing.COMMAND):
+        if not capture_output:
+            from .capture import run_streaming, streaming_active
+            if stream or streaming_active():
+                return run_streaming(args, command, shell=shell, check=check)
+
+        try:
+            result = subprocess.run(
+                args,
+                shell=shell,
+                check=check,
+                text=True,
+                capture_output=capture_output
+            )
+            timing.annotate(exit_code=result.returncode, output_bytes=timing.output_size(result.stdout, result.stderr))
+            return result
+        except subprocess.CalledProcessError as e:
+            timing.annotate(exit_code=e.returncode, output_bytes=timing.output_size(e.stdout, e.stderr))
+            if check:
+                # If capturing output, the error might be in stderr
+                err_msg = e.stderr.strip() if e.stderr else str(e)
+                error(f"Command failed: {command}\nError: {err_msg}", exit_code=e.returncode)
+
+        except FileNotFoundError:
+            timing.annotate(exit_code=127)
+            error(f"Command not found: {args[0] if isinstance(args, list) else args}", exit_code=127)
+
+
+# Exit code reported for a command killed at its timeout (as coreutils `timeout` does).
+TIMEOUT_EXIT_CODE = 124
+DEFAULT_CONCURRENCY = 4
+
+
+def _kill(proc, shell: bool):
+    """Kill a running child; a shell's whole process group, so pipelines die too."""
+    import os
+    import signal
+
+    if proc.returncode is not None:
+        return
     try:
-        result = subprocess.run(
-            args,
-            shell=shell,
-            check=check,
-            text=True,
-            capture_output=capture_output
-        )
+        if shell:
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def run_command_async(command: Union[str, Sequence[str]], shell: bool = False, check: bool = True, capture_output: bool = False,
+                            timeout: Optional[float] = None,
+                            on_output: Optional[Callable[[str, str], None]] = None) -> subprocess.CompletedProcess:
+    """
+    Asyncio counterpart of `run_command`, so independent commands can run concurrently.
+
+    Args:
+        command: The command string to run, or an argv list (run as is, never split or quoted).
+        shell: If True, run through the shell (use carefully).
+        check: If True, raise/exit on failure.
+        capture_output: If True, return stdout/stderr in the result.
+        timeout: Seconds after which the command is killed and reported with exit code 124.
+        on_output: Called as on_output("stdout" | "stderr", line) for each line as it arrives.
+
+    Failures map to TDSError exactly as in `run_command`. Cancelling the
+    awaiting task kills the command.
+    """
+    if not isinstance(command, str):
+        args, shell = list(command), False
+        command = shlex.join(args)
+    else:
+        args = command if shell else shlex.split(command)
+
+    if not timing.enabled():
+        return await _run_command_async(command, args, shell, check, capture_output, timeout, on_output)
+    import time
+
+    started, clock = time.time(), time.perf_counter()
+    attrs = {}
+    try:
+        result = await _run_command_async(command, args, shell, check, capture_output, timeout, on_output)
+        attrs = {"exit_code": result.returncode, "output_bytes": timing.output_size(result.stdout, result.stderr)}
         return result
-    except subprocess.CalledProcessError as e:
-        if check:
-            # If capturing output, the error might be in stderr
-            err_msg = e.stderr.strip() if e.stderr else str(e)
-            error(f"Command failed: {command}\nError: {err_msg}", exit_code=e.returncode)
+    except BaseException as e:
+        attrs = {"exit_code": getattr(e, "exit_code", None), "error": type(e).__name__}
+        raise
+    finally:
+        timing.record(command, timing.COMMAND, started, time.perf_counter() - clock, **attrs)
+
+
+async def _run_command_async(command, args, shell, check, capture_output, timeout, on_output):
+    import asyncio
 
+    pipe = asyncio.subprocess.PIPE if capture_output or on_output else None
+    try:
+        if shell:
+            proc = await asyncio.create_subprocess_shell(command, stdout=pipe, stderr=pipe, start_new_session=True)
+        else:
+            proc = await asyncio.create_subprocess_exec(*args, stdout=pipe, stderr=pipe)
     except FileNotFoundError:
         error(f"Command not found: {args[0] if isinstance(args, list) else args}", exit_code=127)
+        return None
+
+    captured = {"stdout": [], "stderr": []}
+
+    async def pump(name, stream):
+        async for raw in stream:
+            line = raw.decode(errors="replace")
+            if capture_output:
+                captured[name].append(line)
+            if on_output:
+                on_output(name, line.rstrip("\n"))
+
+    async def communicate():
+        streams = [("stdout", proc.stdout), ("stderr", proc.stderr)]
+        await asyncio.gather(*(pump(name, stream) for name, stream in streams if stream is not None))
+        return await proc.wait()
+
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        _kill(proc, shell)
+        await proc.wait()
+        error(f"Command timed out after {timeout}s: {command}", exit_code=TIMEOUT_EXIT_CODE)
+        return None
+    except asyncio.CancelledError:
+        _kill(proc, shell)
+        await proc.wait()
+        raise
+
+    stdout = "".join(captured["stdout"]) if capture_output else None
+    stderr = "".join(captured["stderr"]) if capture_output else None
+    if check and returncode != 0:
+        err_msg = stderr.strip() if stderr else f"Command '{command}' returned non-zero exit status {returncode}."
+        error(f"Command failed: {command}\nError: {err_msg}", exit_code=returncode)
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
+async def gather_commands(commands: Iterable[Union[str, Sequence[str]]], limit: int = DEFAULT_CONCURRENCY, **kwargs) -> List[subprocess.CompletedProcess]:
+    """
+    Run `commands` with at most `limit` at a time; results come back in input order.
+
+    Keyword arguments are passed to `run_command_async`. The first failure
+    cancels (and so kills) the commands still running, then is re-raised.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(command):
+        async with semaphore:
+            return await run_command_async(command, **kwargs)
+
+    tasks = [asyncio.ensure_future(bounded(command)) for command in commands]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    for task in tasks:
+        if task in done and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+def run_commands(commands: Iterable[Union[str, Sequence[str]]], limit: int = DEFAULT_CONCURRENCY, **kwargs) -> List[subprocess.CompletedProcess]:
+    """Blocking entry point for `gather_commands`, for callers that are not async themselves."""
+    import asyncio
+    return asyncio.run(gather_commands(commands, limit, **kwargs))
 
 
 def check_command(cmd: str) -> bool:
-    """Check if a command exists in the PATH."""
-    from shutil import which
+    """Check if a command exists in the PATH (answered from a cached PATH index)."""
+    from .lookup import which
     return which(cmd) is not None
@@ -0,0 +1,375 @@
+"""
+Dependency-aware setup scheduler.
+
+Setup flows declare their steps as tasks with dependencies and resource tags
+("apt", "network", "disk"). `TaskGraph.run` starts every task whose
+dependencies have finished on a thread pool, so independent work overlaps
+(e.g. the collector download runs while apt installs packages), while the
+per-resource limits keep dpkg strictly serialised. A live view shows what is
+running, and every step's wall-clock time is kept in its TaskResult.
+
+Steps declared with a fingerprint are skipped as "unchanged" when the
+fingerprint matches the one recorded after their last success and no
+fingerprinted step upstream ran (see utils/fingerprint.py).
+
+A graph with a journal records each finished step as it goes, so a failed
+run can be resumed from where it stopped or have its applied steps undone
+(see utils/journal.py).
+
+Output of the commands a step runs goes to the step's log file, with its
+newest line shown in the step's row (see utils/capture.py).
+"""
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..errors import TDSError
+from . import timing
+from .capture import step_output
+from .fingerprint import StepState, digest, force_from_env
+from .journal import Journal
+
+DEFAULT_WORKERS = 4
+
+# Concurrent holders allowed per resource. apt takes the dpkg lock, so one at a time.
+RESOURCE_LIMITS = {"apt": 1, "network": 2, "disk": 2}
+
+# Task outcomes.
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+UNCHANGED = "unchanged"
+RESUMED = "resumed"
+
+STATUS_MARKS = {
+    DONE: "[success]✔[/success]",
+    UNCHANGED: "[dim]✔[/dim]",
+    RESUMED: "[dim]✔[/dim]",
+    FAILED: "[error]✖[/error]",
+    SKIPPED: "[dim]-[/dim]",
+}
+
+# Only one live display may be active per console; nested graphs run without one.
+_display_lock = threading.Lock()
+_display_active = False
+
+
+def display_active() -> bool:
+    """Whether a graph's live view currently owns the console."""
+    return _display_active
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable[[], Any]
+    deps: Tuple[str, ...] = ()
+    resources: Tuple[str, ...] = ()
+    title: str = ""
+    fingerprint: Optional[Callable[[], Any]] = None
+    undo: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: str
+    elapsed: float = 0.0
+    detail: str = ""
+    exception: Optional[BaseException] = field(default=None, repr=False)
+    # Whether this step (or a fingerprinted step upstream of it) did work.
+    changed: bool = False
+    fingerprint: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status not in (FAILED, SKIPPED)
+
+
+class TaskGraph:
+    def __init__(self, name: str, max_workers: int = DEFAULT_WORKERS, resource_limits: Optional[Dict[str, int]] = None,
+                 state: Optional[StepState] = None, force: Optional[bool] = None, journal: Optional[Journal] = None):
+        self.name = name
+        self.state = state
+        self.journal = journal
+        self.force = force_from_env() if force is None else force
+        self.max_workers = max_workers
+        self.resource_limits = {**RESOURCE_LIMITS, **(resource_limits or {})}
+        self.tasks: Dict[str, Task] = {}
+        self.results: Dict[str, TaskResult] = {}
+        self.elapsed = 0.0
+        self.shown = False
+        # Id of the running flow's timing span: steps run on pool threads, so they name it as their parent.
+        self.flow_span: Optional[int] = None
+
+    def add(self, name: str, func: Callable[[], Any], deps=(), resources=(), title: str = "",
+            fingerprint: Optional[Callable[[], Any]] = None, undo: Optional[Callable[[], Any]] = None) -> Task:
+        """
+        Declare a step. `func` fails the step by returning False or raising.
+
+        Dependencies must already be declared, which also rules out cycles.
+        `fingerprint` returns a JSON-serialisable description of the step's
+        inputs and outputs; it is evaluated before the step (to decide whether
+        to skip it) and again after it succeeds (to record it). `undo` reverts
+        the step when a failed run is rolled back.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task '{name}'")
+        unknown = [dep for dep in deps if dep not in self.tasks]
+        if unknown:
+            raise ValueError(f"Task '{name}' depends on unknown task(s): {', '.join(unknown)}")
+        task = Task(name, func, tuple(deps), tuple(resources), title or name, fingerprint, undo)
+        self.tasks[name] = task
+        return task
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.results.values())
+
+    def _fits(self, task: Task, in_use: Counter) -> bool:
+        return all(in_use[r] < self.resource_limits.get(r, 1) for r in task.resources)
+
+    def _execute(self, task: Task, recorded: Optional[str], upstream_changed: bool,
+                 on_line: Optional[Callable[[str], None]] = None) -> TaskResult:
+        """
+        Run one step on a worker thread; `recorded` is its fingerprint from the
+        last success. Commands the step runs are streamed into its log, with
+        their newest output line passed to `on_line`.
+        """
+        with timing.span(f"{self.name}/{task.name}", kind=timing.STEP, parent=self.flow_span):
+            result = self._attempt(task, recorded, upstream_changed, on_line)
+            timing.annotate(status=result.status)
+            return result
+
+    def _attempt(self, task: Task, recorded: Optional[str], upstream_changed: bool,
+                 on_line: Optional[Callable[[str], None]]) -> TaskResult:
+        started = time.perf_counter()
+        try:
+            if task.fingerprint:
+                if not self.force and not upstream_changed and digest(task.fingerprint()) == recorded:
+                    return TaskResult(task.name, UNCHANGED, time.perf_counter() - started, "unchanged")
+            with step_output(f"{self.name}-{task.name}", on_line):
+                outcome = task.func()
+            fingerprint = digest(task.fingerprint()) if task.fingerprint and outcome is not False else None
+        except Exception as e:
+            # TDSError has already been reported through error().
+            return TaskResult(task.name, FAILED, time.perf_counter() - started, str(e), e)
+        status = FAILED if outcome is False else DONE
+        changed = upstream_changed or bool(task.fingerprint)
+        return TaskResult(task.name, status, time.perf_counter() - started, changed=changed, fingerprint=fingerprint)
+
+    def _settle(self, pending: Dict[str, Task]):
+        """
+        Skip pending tasks whose dependencies failed or were skipped. Once any
+        task has failed nothing new is started, as in a sequential flow.
+        """
+        failed = next((r.name for r in self.results.values() if r.status == FAILED), None)
+        if failed:
+            for name in list(pending):
+                self.results[name] = TaskResult(name, SKIPPED, detail=f"'{failed}' failed")
+                del pending[name]
+            return
+        changed = True
+        while changed:
+            changed = False
+            for name, task in list(pending.items()):
+                blocker = next((d for d in task.deps if d in self.results and not self.results[d].ok), None)
+                if blocker:
+                    self.results[name] = TaskResult(name, SKIPPED, detail=f"'{blocker}' did not complete")
+                    del pending[name]
+                    changed = True
+
+    def run(self, progress: bool = True, resume: bool = False, rollback: bool = False) -> Dict[str, TaskResult]:
+        """
+        Run every task, overlapping independent ones, and return results in declaration order.
+
+        With `resume`, steps the journal records as finished are not run
+        again. With `rollback`, a failed run undoes the steps it applied, in
+        reverse order. Once all running tasks have finished (and any rollback
+        is done), re-raises the TDSError of the first task that raised, so
+        CLI exit codes are the same as for a sequential flow; any other
+        exception is reported and raised as a TDSError (exit code 1).
+        """
+        global _display_active
+        if self.state is None and any(task.fingerprint for task in self.tasks.values()):
+            self.state = StepState(self.name).load()
+        completed = []
+        if self.journal is not None:
+            self.journal.load()
+            if resume:
+                completed = [name for name in self.journal.completed() if name in self.tasks]
+            else:
+                self._journal(self.journal.clear)
+        with _display_lock:
+            show = progress and not _display_active
+            if show:
+                _display_active = True
+        try:
+            self.shown = show
+            with timing.span(f"setup {self.name}", kind=timing.FLOW) as flow:
+                self.flow_span = flow.id if flow else None
+                self._schedule(show, completed)
+        finally:
+            if show:
+                with _display_lock:
+                    _display_active = False
+
+        self.results = {name: self.results[name] for name in self.tasks}
+        self._record()
+        if self.journal is not None:
+            self._finish_journal(rollback)
+        failure = next((r for r in self.results.values() if r.exception is not None), None)
+        if failure is not None:
+            if isinstance(failure.exception, TDSError):
+                raise failure.exception
+            # Anything else (an OSError from a config write, ...) was never reported.
+            from .status import error
+            error(f"Step '{self.tasks[failure.name].title}' failed: {failure.detail or type(failure.exception).__name__}",
+                  exit_code=1)
+        return self.results
+
+    def _schedule(self, show: bool, completed=()):
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+        from .status import console
+
+        self.results = {name: TaskResult(name, RESUMED, detail="done in a previous run") for name in completed}
+        self.applied = []
+        pending = {name: task for name, task in self.tasks.items() if name not in self.results}
+        in_use = Counter()
+        running = {}
+        started = time.perf_counter()
+
+        columns = (SpinnerColumn(finished_text=" "), TextColumn("{task.description}"), TimeElapsedColumn())
+        with Progress(*columns, console=console, disable=not show) as view, \
+                ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"tds-{self.name}") as pool:
+            while pending or running:
+                self._settle(pending)
+                for name, task in list(pending.items()):
+                    if len(running) >= self.max_workers:
+                        break
+                    if all(d in self.results for d in task.deps) and self._fits(task, in_use):
+                        in_use.update(task.resources)
+                        row = view.add_task(task.title, total=1)
+                        recorded = self.state.fingerprints.get(name) if self.state else None
+                        upstream_changed = any(self.results[d].changed for d in task.deps)
+                        on_line = self._tail(view, row, task) if show else None
+                        running[pool.submit(self._execute, task, recorded, upstream_changed, on_line)] = (task, row)
+                        del pending[name]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, row = running.pop(future)
+                    in_use.subtract(task.resources)
+                    result = future.result()
+                    self.results[task.name] = result
+                    if result.status == DONE:
+                        self.applied.append(task.name)
+                    if self.journal is not None and result.status in (DONE, UNCHANGED):
+                        self._journal(self.journal.record, task.name, result.status)
+                    view.update(row, completed=1, description=f"{STATUS_MARKS[result.status]} {self._label(task, result)}")
+                    view.stop_task(row)
+            for name, result in self.results.items():
+                if result.status in (SKIPPED, RESUMED):
+                    row = view.add_task(f"{STATUS_MARKS[result.status]} [dim]{self.tasks[name].title} ({result.detail})[/dim]", total=1)
+                    view.update(row, completed=1)
+                    view.stop_task(row)
+        self.elapsed = time.perf_counter() - started
+
+    @staticmethod
+    def _tail(view, row, task: Task) -> Callable[[str], None]:
+        """Show a step's newest output line next to its title in the live view."""
+        from rich.markup import escape
+
+        def show(line: str):
+            view.update(row, description=f"{task.title} [dim]{escape(line[:80])}[/dim]")
+        return show
+
+    def _record(self):
+        """Remember the fingerprints of steps that succeeded; forget failed ones."""
+        if self.state is None:
+            return
+        for name, result in self.results.items():
+            if result.fingerprint:
+                self.state.fingerprints[name] = result.fingerprint
+            elif result.status == FAILED:
+                self.state.fingerprints.pop(name, None)
+        try:
+            self.state.save()
+        except OSError as e:
+            from .status import warning
+            warning(f"Could not record setup state: {e}")
+
+    def _journal(self, method, *args):
+        """Journal writes are best-effort: on failure, warn once and carry on without one."""
+        try:
+            method(*args)
+        except OSError as e:
+            from .status import warning
+            warning(f"Could not write setup journal: {e}")
+            self.journal = None
+
+    def _finish_journal(self, rollback: bool):
+        from .status import info
+
+        if self.ok:
+            self._journal(self.journal.clear)
+        elif rollback:
+            self._rollback()
+        else:
+            info(f"Finished steps were journaled; `tds setup {self.name} --resume` continues from the failed one.")
+
+    def _rollback(self):
+        """Undo the steps this run applied, newest first, and forget them."""
+        from .status import info, warning
+
+        for name in reversed(self.applied):
+            task = self.tasks[name]
+            if task.undo is None:
+                continue
+            info(f"Rolling back: {task.title}")
+            try:
+                task.undo()
+            except Exception as e:
+                warning(f"Could not roll back '{task.title}': {e}")
+                continue
+            self.results[name].detail = "rolled back"
+            self.results[name].fingerprint = None
+            if self.state is not None:
+                self.state.fingerprints.pop(name, None)
+            if self.journal is not None:
+                self._journal(self.journal.forget, name)
+        if self.state is not None:
+            self._record()
+
+    @staticmethod
+    def _label(task: Task, result: TaskResult) -> str:
+        if result.status in (UNCHANGED, RESUMED) or result.detail == "rolled back":
+            return f"[dim]{task.title} ({result.detail})[/dim]"
+        if result.status == FAILED and result.detail:
+            from rich.markup import escape
+            return f"{task.title} [dim]({escape(result.detail.splitlines()[0][:80])})[/dim]"
+        return task.title
+
+    def summary(self) -> str:
+        busy = sum(result.elapsed for result in self.results.values())
+        unchanged = sum(result.status == UNCHANGED for result in self.results.values())
+        counts = f"{len(self.results)} steps" + (f" ({unchanged} unchanged)" if unchanged else "")
+        return f"{counts} in {self.elapsed:.1f}s ({busy:.1f}s of step time)"
+
+    def report(self):
+        """
+        Print the overall timing summary, preceded by each step's outcome and
+        time when the live view did not already show them.
+        """
+        from .status import console
+
+        for name in () if self.shown else self.results:
+            result = self.results[name]
+            elapsed = f"{result.elapsed:6.1f}s" if result.status != SKIPPED else "      -"
+            console.print(f"  {STATUS_MARKS[result.status]} {elapsed}  {self._label(self.tasks[name], result)}")
+        console.print(f"  [dim]{self.summary()}[/dim]")
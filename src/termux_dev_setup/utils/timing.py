@@ -0,0 +1,191 @@
+"""
+Timing spans for setup flows, steps, commands and readiness waits.
+
+With `tds --timings` (or TDS_TIMINGS=1), every setup flow and step, every
+command run through `run_command` (or a pipeline, or the postgres worker),
+every readiness wait and every manage action is recorded as a span: a name,
+a kind, its wall-clock start and duration, and attributes such as the exit
+code and bytes of output.
+At exit a summary table is printed and the raw spans are appended as JSON
+lines to `$TDS_STATE_DIR/timings.jsonl`, one run id per invocation, e.g. for
+`jq 'select(.kind == "command")'`.
+
+Recording is off by default; a disabled `span` costs one global lookup.
+Spans nest per thread. Setup steps run on pool threads, so TaskGraph passes
+its flow span as their parent explicitly.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+TIMINGS_ENV = "TDS_TIMINGS"
+
+# Span kinds, in the order the summary lists them.
+FLOW = "flow"
+STEP = "step"
+MANAGE = "manage"
+WAIT = "wait"
+COMMAND = "command"
+KINDS = (FLOW, STEP, MANAGE, WAIT, COMMAND)
+
+_enabled = False
+_lock = threading.Lock()
+_spans: List["Span"] = []
+_ids = itertools.count(1)
+_local = threading.local()
+_run_id = os.urandom(6).hex()
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    id: int
+    parent: Optional[int]
+    thread: str
+    start: float
+    duration: float = 0.0
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Disable recording and drop the recorded spans."""
+    global _enabled
+    _enabled = False
+    with _lock:
+        _spans.clear()
+
+
+def spans() -> List[Span]:
+    with _lock:
+        return list(_spans)
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def span(name: str, kind: str = STEP, parent: Optional[int] = None, **attrs) -> Iterator[Optional[Span]]:
+    """
+    Record the enclosed block as a span (yields None while recording is off).
+
+    `parent` defaults to the innermost span open on this thread. An
+    exception leaving the block is noted in the `error` attribute.
+    """
+    if not _enabled:
+        yield None
+        return
+    stack = _stack()
+    if parent is None and stack:
+        parent = stack[-1].id
+    current = Span(name, kind, next(_ids), parent, threading.current_thread().name, time.time(), attrs=attrs)
+    stack.append(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        stack.pop()
+        with _lock:
+            _spans.append(current)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost span open on this thread (no-op when there is none)."""
+    if _enabled:
+        stack = _stack()
+        if stack:
+            stack[-1].attrs.update(attrs)
+
+
+def record(name: str, kind: str, started: float, duration: float, **attrs):
+    """Record a span measured elsewhere, e.g. by a coroutine, where the per-thread nesting does not apply."""
+    if _enabled:
+        with _lock:
+            _spans.append(Span(name, kind, next(_ids), None, threading.current_thread().name, started, duration, attrs))
+
+
+def output_size(*outputs) -> int:
+    """Bytes of captured output (str or bytes), for the `output_bytes` attribute."""
+    return sum(len(out.encode() if isinstance(out, str) else out) for out in outputs if out)
+
+
+def default_path():
+    from .paths import state_dir
+    return state_dir("timings.jsonl")
+
+
+def write_jsonl(path=None):
+    """Append the recorded spans to `path` (default: $TDS_STATE_DIR/timings.jsonl); returns the path."""
+    path = path or default_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for recorded in spans():
+            f.write(json.dumps({"run": _run_id, **asdict(recorded)}, default=str) + "\n")
+    return path
+
+
+def summary_rows():
+    """(kind, name, calls, total seconds, max seconds) per distinct span, by kind then total time."""
+    totals: Dict[tuple, List[float]] = {}
+    for recorded in spans():
+        totals.setdefault((recorded.kind, recorded.name), []).append(recorded.duration)
+    rank = {kind: i for i, kind in enumerate(KINDS)}
+    rows = [(kind, name, len(d), sum(d), max(d)) for (kind, name), d in totals.items()]
+    return sorted(rows, key=lambda row: (rank.get(row[0], len(KINDS)), -row[3]))
+
+
+def report(path=None):
+    """Print the summary table and write the raw spans (a failure to write is only a warning)."""
+    from rich.markup import escape
+    from rich.table import Table
+    from .status import console, info, warning
+
+    if not spans():
+        return
+    table = Table(title="Timings", title_justify="left")
+    table.add_column("Kind", style="dim")
+    table.add_column("Span", overflow="fold")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Max", justify="right")
+    for kind, name, calls, total, longest in summary_rows():
+        table.add_row(kind, escape(name), str(calls), f"{total:.2f}s", f"{longest:.2f}s")
+    commands = [s for s in spans() if s.kind == COMMAND]
+    if commands:
+        output = sum(s.attrs.get("output_bytes", 0) for s in commands)
+        table.caption = f"{len(commands)} commands, {sum(s.duration for s in commands):.2f}s, {output} bytes of output"
+    console.print(table)
+    try:
+        written = write_jsonl(path)
+    except OSError as e:
+        warning(f"Could not write timings: {e}")
+        return
+    info(f"Raw spans: {written}")
+
+
+def env_enabled() -> bool:
+    """Whether TDS_TIMINGS asks for timings (like `--timings`)."""
+    return os.environ.get(TIMINGS_ENV, "").lower() in ("1", "true", "yes")
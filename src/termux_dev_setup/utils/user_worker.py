@@ -0,0 +1,194 @@
+"""
+Long-lived worker process running as another user.
+
+Each `run_as_postgres` call used to fork `runuser` (or `su`, which also
+starts a login shell) just to drop privileges for one command, and PostgreSQL
+setup makes several in a row (`initdb`, `pg_ctl`, `createuser`, `createdb`).
+A `UserWorker` switches user once: it starts a small stdlib-only Python loop
+as that user, which reads one JSON request per line on stdin (an argv list),
+runs it and answers with one JSON line on stdout (exit status and, when
+asked for, the captured output). Output that is not captured goes to the
+worker's stderr, i.e. the terminal, as before.
+
+A worker is only an optimisation: when it cannot be started (not root, no
+runuser/su, Python not readable by that user), callers fall back to one
+privilege switch per command.
+"""
+
+import json
+import os
+import selectors
+import subprocess
+import sys
+import threading
+from typing import Optional, Sequence
+
+from . import timing
+from .command import as_user, current_user, display
+from .status import error
+
+START_TIMEOUT = 5.0
+STOP_TIMEOUT = 2.0
+
+# Runs as the target user with `python -I -S`, so it must only need the standard library.
+WORKER_SOURCE = r"""
+import json, os, subprocess, sys
+reply = sys.stdout
+sys.stdout = sys.stderr
+def send(message):
+    reply.write(json.dumps(message) + "\n")
+    reply.flush()
+send({"ready": os.getpid()})
+for line in sys.stdin:
+    request = json.loads(line)
+    capture = request.get("capture", False)
+    try:
+        result = subprocess.run(request["argv"], stdin=subprocess.DEVNULL, text=True,
+                                stdout=subprocess.PIPE if capture else 2,
+                                stderr=subprocess.PIPE if capture else None)
+    except FileNotFoundError:
+        send({"error": "not-found"})
+        continue
+    except OSError as e:
+        send({"error": str(e)})
+        continue
+    send({"returncode": result.returncode, "stdout": result.stdout, "stderr": result.stderr})
+"""
+
+
+class WorkerUnavailable(Exception):
+    """The request never reached the worker; it is safe to run the command another way."""
+
+
+class UserWorker:
+    def __init__(self, user: str, start_timeout: float = START_TIMEOUT):
+        self.user = user
+        self.start_timeout = start_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> bool:
+        """Launch the worker and wait for its greeting; False (and nothing left running) if it does not come."""
+        argv = as_user(self.user, [sys.executable, "-I", "-S", "-c", WORKER_SOURCE])
+        try:
+            # "/" rather than our cwd, which the target user often cannot enter (e.g. /root).
+            self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd="/", text=True)
+        except OSError:
+            return False
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.proc.stdout, selectors.EVENT_READ)
+            greeting = self.proc.stdout.readline() if selector.select(self.start_timeout) else ""
+        try:
+            self.pid = json.loads(greeting)["ready"]
+        except (ValueError, KeyError, TypeError):
+            self.close()
+            return False
+        return True
+
+    def run(self, command: Sequence[str], check: bool = True, capture_output: bool = False) -> subprocess.CompletedProcess:
+        """
+        Run the argv `command` in the worker, with the same results and
+        errors as `run_command`. Raises WorkerUnavailable when the worker is
+        gone before it received the request.
+        """
+        command = [str(part) for part in command]
+        text = display(command)
+        with timing.span(text, kind=timing.COMMAND, worker=self.user):
+            return self._run(command, text, check, capture_output)
+
+    def _run(self, command, text, check, capture_output):
+        with self._lock:
+            if not self.alive:
+                raise WorkerUnavailable(f"{self.user} worker is not running")
+            try:
+                self.proc.stdin.write(json.dumps({"argv": command, "capture": capture_output}) + "\n")
+                self.proc.stdin.flush()
+            except (BrokenPipeError, ValueError) as e:
+                raise WorkerUnavailable(str(e)) from e
+            line = self.proc.stdout.readline()
+        if not line:
+            # The command may have run already, so it must not be retried.
+            self.close()
+            error(f"The {self.user} worker exited while running: {text}", exit_code=1)
+            return None
+        reply = json.loads(line)
+        if reply.get("error") == "not-found":
+            timing.annotate(exit_code=127)
+            error(f"Command not found: {command[0]}", exit_code=127)
+            return None
+        if "error" in reply:
+            error(f"Command failed: {text}\nError: {reply['error']}", exit_code=1)
+            return None
+        result = subprocess.CompletedProcess(command, reply["returncode"], reply["stdout"], reply["stderr"])
+        timing.annotate(exit_code=result.returncode, output_bytes=timing.output_size(result.stdout, result.stderr))
+        if check and result.returncode != 0:
+            err_msg = result.stderr.strip() if result.stderr else f"Command '{text}' returned non-zero exit status {result.returncode}."
+            error(f"Command failed: {text}\nError: {err_msg}", exit_code=result.returncode)
+        return result
+
+    def close(self):
+        """Let the worker finish (EOF on its stdin ends the loop); kill it if it does not."""
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        for stream in (proc.stdin, proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        try:
+            proc.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+class WorkerSession:
+    """
+    Scope in which commands for `user` share one worker, started on first use.
+
+    Entering the session again (e.g. `manage("start")` inside a setup) reuses
+    the same worker; it is stopped when the outermost session ends. A worker
+    that fails to start is not tried again in the same session.
+    """
+
+    def __init__(self, user: str, disable_env: Optional[str] = None):
+        self.user = user
+        self.disable_env = disable_env
+        self.depth = 0
+        self.failed = False
+        self._worker: Optional[UserWorker] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.depth -= 1
+            if self.depth == 0:
+                worker, self._worker, self.failed = self._worker, None, False
+                if worker is not None:
+                    worker.close()
+
+    def worker(self) -> Optional[UserWorker]:
+        """The session's live worker, or None outside a session, when disabled or when it cannot run."""
+        with self._lock:
+            if self.depth == 0 or self.failed:
+                return None
+            if (self.disable_env and os.environ.get(self.disable_env)) or current_user() == self.user:
+                return None
+            if self._worker is None or not self._worker.alive:
+                worker = UserWorker(self.user)
+                if not worker.start():
+                    self.failed = True
+                    return None
+                self._worker = worker
+            return self._worker
@@ -0,0 +1,170 @@
+"""
+Adaptive readiness waiter shared by the service start/stop paths.
+
+`wait_until` polls a predicate with exponential backoff starting in the
+millisecond range, so a service that comes up in 80 ms is noticed after
+~80 ms rather than on the next whole-second tick. Where the platform allows
+it, the wait between attempts is cut short when a watched log file is
+written (inotify) or a watched process exits (pidfd), which is exactly when
+the state we are waiting for is likely to have changed.
+"""
+
+import os
+import select
+import sys
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+INITIAL_INTERVAL = 0.005
+BACKOFF_FACTOR = 2.0
+MAX_INTERVAL = 0.25
+# A log write ends a pause no sooner than this: a probe that itself logs (as
+# pgwire does while the server starts up) would otherwise wake its own waiter.
+MIN_WAKE_INTERVAL = 0.02
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+
+@dataclass
+class WaitResult:
+    ok: bool
+    attempts: int
+    elapsed: float
+    # Seconds spent in the predicate on each attempt.
+    timings: List[float] = field(default_factory=list)
+
+    def __bool__(self):
+        return self.ok
+
+
+@lru_cache(maxsize=1)
+def _libc():
+    import ctypes
+    import ctypes.util
+
+    return ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+
+def watch_file(path: str) -> Optional[int]:
+    """
+    Return a non-blocking inotify fd that becomes readable when `path` (or a
+    sibling in its directory) is created or written, or None where unsupported.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = _libc()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    # Watch the directory: the file itself may not exist yet when the service starts.
+    directory = os.path.dirname(os.path.abspath(path))
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def watch_pid(pid: int) -> Optional[int]:
+    """Return a pidfd that becomes readable when `pid` exits, or None where unsupported."""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def _drain(fd: int):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except OSError:
+        pass
+
+
+def _block(watches: Dict[int, str], timeout: float):
+    """
+    Sleep up to `timeout`, returning early when a watched fd fires (but not
+    before MIN_WAKE_INTERVAL when the wake-up was a file write).
+    """
+    if not watches:
+        time.sleep(timeout)
+        return
+    started = time.monotonic()
+    readable, _, _ = select.select(list(watches), [], [], timeout)
+    written = False
+    for fd in readable:
+        if watches[fd] == "pid":
+            # A pidfd stays readable once the process is gone; stop watching it.
+            del watches[fd]
+            os.close(fd)
+        else:
+            _drain(fd)
+            written = True
+    if written:
+        rest = min(MIN_WAKE_INTERVAL, timeout) - (time.monotonic() - started)
+        if rest > 0:
+            time.sleep(rest)
+
+
+def wait_until(
+    predicate: Callable[[], bool],
+    timeout: float,
+    initial: float = INITIAL_INTERVAL,
+    factor: float = BACKOFF_FACTOR,
+    max_interval: float = MAX_INTERVAL,
+    watch_path: Optional[str] = None,
+    pid: Optional[int] = None,
+    label: Optional[str] = None,
+) -> WaitResult:
+    """
+    Poll `predicate` until it returns true or `timeout` seconds have passed.
+
+    The predicate is always tried at least once. The pause between attempts
+    starts at `initial` and grows by `factor` up to `max_interval`; it ends
+    early when `watch_path` is written or process `pid` exits. With timings
+    on, the wait is recorded as a span named `label` (default "wait").
+    """
+    from . import timing
+
+    with timing.span(label or "wait", kind=timing.WAIT, timeout=timeout):
+        result = _poll(predicate, timeout, initial, factor, max_interval, watch_path, pid)
+        timing.annotate(ready=result.ok, attempts=result.attempts)
+        return result
+
+
+def _poll(predicate, timeout, initial, factor, max_interval, watch_path, pid) -> WaitResult:
+    watches = {}
+    if watch_path:
+        fd = watch_file(watch_path)
+        if fd is not None:
+            watches[fd] = "file"
+    if pid:
+        fd = watch_pid(pid)
+        if fd is not None:
+            watches[fd] = "pid"
+
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = initial
+    timings = []
+    try:
+        while True:
+            attempt_start = time.monotonic()
+            ok = bool(predicate())
+            now = time.monotonic()
+            timings.append(now - attempt_start)
+            if ok or now >= deadline:
+                return WaitResult(ok, len(timings), now - start, timings)
+            _block(watches, min(interval, deadline - now))
+            interval = min(interval * factor, max_interval)
+    finally:
+        for fd in watches:
+            os.close(fd)
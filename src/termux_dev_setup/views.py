@@ -1,9 +1,26 @@
 from .utils.status import console, info, success, error, warning, step
 from .config import PostgresConfig
+from .service_status import ServiceStatus
+
+STATUS_STYLES = {
+    ServiceStatus.RUNNING: "[bold green]UP[/bold green]",
+    ServiceStatus.STOPPED: "[bold red]DOWN[/bold red]",
+    ServiceStatus.STARTING: "[bold yellow]STARTING[/bold yellow]",
+    ServiceStatus.RECOVERING: "[bold yellow]RECOVERING[/bold yellow]",
+    ServiceStatus.STOPPING: "[bold yellow]STOPPING[/bold yellow]",
+    ServiceStatus.TIMEOUT: "[bold yellow]TIMEOUT[/bold yellow]",
+}
 
 class PostgresView:
-    def print_status(self, is_running: bool, config: PostgresConfig):
-        state = "[bold green]UP[/bold green]" if is_running else "[bold red]DOWN[/bold red]"
+    def print_status(self, is_running, config: PostgresConfig, detail: str = ""):
+        """`is_running` is a bool or the ServiceStatus reported by the readiness probe."""
+        if isinstance(is_running, ServiceStatus):
+            state = STATUS_STYLES.get(is_running, f"[yellow]{is_running.name}[/yellow]")
+            if is_running not in (ServiceStatus.RUNNING, ServiceStatus.STOPPED) and detail:
+                state += f" [dim]({detail})[/dim]"
+            is_running = is_running == ServiceStatus.RUNNING
+        else:
+            state = "[bold green]UP[/bold green]" if is_running else "[bold red]DOWN[/bold red]"
         console.print(f"  Status: {state}")
         console.print(f"  Data Dir: {config.data_dir}")
         console.print(f"  Log File: {config.log_file}")
@@ -25,3 +42,26 @@ class PostgresView:
 
     def print_warning(self, message: str):
         warning(message)
+
+class StatusView:
+    def print_table(self, results, elapsed: float = None):
+        from rich.table import Table
+
+        table = Table(show_header=True, header_style="bold")
+        table.add_column("Service")
+        table.add_column("Endpoint")
+        table.add_column("Status")
+        table.add_column("Latency", justify="right")
+        table.add_column("Detail", style="dim")
+
+        for result in results:
+            state = STATUS_STYLES.get(result.status, f"[yellow]{result.status.name}[/yellow]")
+            latency = f"{result.latency * 1000:.1f} ms" if result.latency is not None else "-"
+            table.add_row(result.service, result.endpoint, state, latency, result.detail)
+
+        console.print(table)
+        if elapsed is not None:
+            console.print(f"  [dim]Checked {len(results)} service(s) in {elapsed * 1000:.0f} ms[/dim]")
+
+    def print_step(self, message: str):
+        step(message)
@@ -0,0 +1,262 @@
+import socket
+import threading
+import pytest
+
+# =================== apt ===================
+@pytest.fixture(autouse=True)
+def fake_apt(monkeypatch, tmp_path):
+    """
+    Never run a real `apt update` from the suite: the shared apt layer runs its
+    commands through this mock, with its freshness state kept in a temp cache.
+    """
+    from unittest.mock import MagicMock
+    from termux_dev_setup.utils import apt
+
+    monkeypatch.setenv("TDS_CACHE_DIR", str(tmp_path / "tds-cache"))
+    runner = MagicMock()
+    monkeypatch.setattr(apt, "run_command", runner)
+    return runner
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    """Keep recorded setup step fingerprints out of the real state directory."""
+    state = tmp_path / "tds-state"
+    monkeypatch.setenv("TDS_STATE_DIR", str(state))
+    monkeypatch.delenv("TDS_FORCE_STEPS", raising=False)
+    return state
+
+# =================== Fake Servers ===================
+def _server_factory(start):
+    """Body of a factory fixture: yields `start` wrapped so every server it creates is closed after the test."""
+    servers = []
+
+    def factory(*args, **kwargs):
+        server = start(*args, **kwargs)
+        servers.append(server)
+        return server
+
+    try:
+        yield factory
+    finally:
+        for server in servers:
+            server.close()
+
+# =================== Fake Redis Server ===================
+class FakeRedis:
+    """Tiny RESP server: answers AUTH/PING/INFO/SHUTDOWN for one password."""
+
+    def __init__(self, password="", ping_reply=b"+PONG\r\n"):
+        self.password = password
+        self.ping_reply = ping_reply
+        self.commands = []
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(8)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _read_command(self, f):
+        header = f.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(f.readline()[1:])
+            args.append(f.read(length + 2)[:-2].decode())
+        return args
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rb") as f:
+                authed = not self.password
+                while True:
+                    args = self._read_command(f)
+                    if args is None:
+                        break
+                    self.commands.append(args)
+                    name = args[0].upper()
+                    if name == "AUTH":
+                        authed = args[1] == self.password
+                        conn.sendall(b"+OK\r\n" if authed else b"-WRONGPASS invalid username-password pair\r\n")
+                    elif not authed:
+                        conn.sendall(b"-NOAUTH Authentication required.\r\n")
+                    elif name == "PING":
+                        conn.sendall(self.ping_reply)
+                    elif name == "INFO":
+                        body = b"# Server\r\nredis_version:7.2.4\r\nuptime_in_seconds:42\r\n"
+                        conn.sendall(b"$%d\r\n%s\r\n" % (len(body), body))
+                    elif name == "SHUTDOWN":
+                        break
+                    else:
+                        conn.sendall(b"-ERR unknown command\r\n")
+
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture
+def fake_redis_server():
+    """Factory for FakeRedis servers on ephemeral ports, closed after the test."""
+    yield from _server_factory(FakeRedis)
+
+# =================== Fake PostgreSQL Server ===================
+def pg_error(code, message):
+    """Encode an ErrorResponse ('E') message with severity, SQLSTATE and text."""
+    body = b"SFATAL\0C" + code.encode() + b"\0M" + message.encode() + b"\0\0"
+    return b"E" + (len(body) + 4).to_bytes(4, "big") + body
+
+# AuthenticationSASL: what a ready server sends first to a password-protected role.
+PG_AUTH_REQUEST = b"R\x00\x00\x00\x17\x00\x00\x00\x0aSCRAM-SHA-256\x00\x00"
+
+class FakePostgres:
+    """
+    Answers every StartupMessage with a fixed reply (an auth request, or an
+    ErrorResponse when `error=(sqlstate, message)`); listens on TCP or a Unix socket path.
+    """
+
+    def __init__(self, reply=PG_AUTH_REQUEST, error=None, unix_path=None):
+        self.reply = pg_error(*error) if error else reply
+        self.startups = []
+        if unix_path:
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.listener.bind(unix_path)
+            self.port = None
+        else:
+            self.listener = socket.socket()
+            self.listener.bind(("127.0.0.1", 0))
+            self.port = self.listener.getsockname()[1]
+        self.listener.listen(8)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rb") as f:
+                header = f.read(4)
+                if len(header) < 4:
+                    continue
+                self.startups.append(f.read(int.from_bytes(header, "big") - 4))
+                conn.sendall(self.reply)
+
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture
+def fake_postgres_server():
+    """Factory for FakePostgres servers, closed after the test."""
+    yield from _server_factory(FakePostgres)
+
+# =================== Fake Clock ===================
+class FakeClock:
+    """Stands in for the `time` module inside utils.wait: sleeping just advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Run wait_until() loops instantly (and without file/pid watches) on a virtual clock."""
+    from termux_dev_setup.utils import wait
+
+    clock = FakeClock()
+    monkeypatch.setattr(wait, "time", clock)
+    monkeypatch.setattr(wait, "watch_file", lambda path: None)
+    monkeypatch.setattr(wait, "watch_pid", lambda pid: None)
+    return clock
+
+# =================== Local HTTP Server ===================
+class FakeHTTPServer:
+    """
+    Serves in-memory files over HTTP on an ephemeral port.
+
+    `ranges` enables single-range `Range: bytes=a-b` requests (206 replies);
+    `drop_after` cuts each response body off after that many bytes, the way a
+    flaky mobile link would.
+    """
+
+    def __init__(self, files, ranges=True, drop_after=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.files = files
+        self.ranges = ranges
+        self.drop_after = drop_after
+        self.requests = []
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, head_only):
+                owner.requests.append((self.command, self.path, self.headers.get("Range")))
+                data = owner.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                start, end, status = 0, len(data) - 1, 200
+                header = self.headers.get("Range")
+                if header and owner.ranges:
+                    first, _, last = header.split("=", 1)[1].partition("-")
+                    start = int(first)
+                    end = min(int(last), end) if last else end
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.end_headers()
+                        return
+                    status = 206
+                body = data[start:end + 1]
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                if owner.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.end_headers()
+                if head_only:
+                    return
+                if owner.drop_after is not None and len(body) > owner.drop_after:
+                    self.wfile.write(body[:owner.drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send(head_only=False)
+
+            def do_HEAD(self):
+                self._send(head_only=True)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def http_server():
+    """Factory for FakeHTTPServer instances, shut down after the test."""
+    yield from _server_factory(FakeHTTPServer)
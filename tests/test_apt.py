@@ -0,0 +1,100 @@
+import json
+import time
+
+import pytest
+
+from termux_dev_setup.utils import apt
+
+
+@pytest.fixture
+def apt_root(tmp_path, monkeypatch, fake_apt):
+    """Fake /etc/apt and /var/lib/apt/lists with one indexed source; apt update succeeds."""
+    sources = tmp_path / "etc" / "sources.list"
+    sources_dir = tmp_path / "etc" / "sources.list.d"
+    lists = tmp_path / "lists"
+    sources_dir.mkdir(parents=True)
+    lists.mkdir()
+    sources.write_text("deb http://ports.ubuntu.com/ubuntu-ports jammy main\n")
+    (lists / "ports.ubuntu.com_ubuntu-ports_dists_jammy_main_binary-arm64_Packages.lz4").write_bytes(b"")
+    monkeypatch.setattr(apt, "SOURCES_LIST", sources)
+    monkeypatch.setattr(apt, "SOURCES_DIR", sources_dir)
+    monkeypatch.setattr(apt, "LISTS_DIR", lists)
+    monkeypatch.delenv(apt.MAX_AGE_ENV, raising=False)
+    fake_apt.return_value.returncode = 0
+    return sources_dir
+
+
+def test_first_update_runs_and_is_recorded(apt_root, fake_apt):
+    assert apt.apt_update() is True
+    fake_apt.assert_called_once_with(["apt", "update"], check=False)
+    state = json.loads(apt.state_path().read_text())
+    assert list(state["sources"]) == [str(apt.SOURCES_LIST)]
+
+def test_back_to_back_updates_are_skipped(apt_root, fake_apt, capsys):
+    apt.apt_update()
+    assert apt.apt_update(["apt-get", "update", "-y"]) is False
+    assert fake_apt.call_count == 1
+    assert "Skipping 'apt-get update -y'" in capsys.readouterr().out
+
+def test_added_source_forces_refresh(apt_root, fake_apt):
+    apt.apt_update()
+    (apt_root / "google-cloud-sdk.list").write_text("deb https://packages.cloud.google.com/apt cloud-sdk main\n")
+    assert apt.needs_update() == (True, "sources changed: google-cloud-sdk.list")
+    assert apt.apt_update() is True
+    assert apt.apt_update() is False
+
+def test_rewriting_identical_source_does_not_refresh(apt_root, fake_apt):
+    repo = apt_root / "google-cloud-sdk.list"
+    repo.write_text("deb x\n")
+    apt.apt_update()
+    repo.write_text("deb x\n")
+    assert apt.apt_update() is False
+
+def test_removed_and_ignored_sources(apt_root, fake_apt):
+    repo = apt_root / "extra.sources"
+    repo.write_text("Types: deb\n")
+    apt.apt_update()
+    (apt_root / "notes.txt").write_text("not a source")
+    assert apt.needs_update()[0] is False
+    repo.unlink()
+    assert apt.needs_update() == (True, "sources changed: extra.sources")
+
+def test_stale_indexes_refresh(apt_root, fake_apt, monkeypatch):
+    apt.apt_update()
+    state = json.loads(apt.state_path().read_text())
+    state["updated"] = time.time() - 7200
+    apt.state_path().write_text(json.dumps(state))
+    assert apt.needs_update() == (True, "indexes are 120 min old")
+    monkeypatch.setenv(apt.MAX_AGE_ENV, "86400")
+    assert apt.needs_update()[0] is False
+
+def test_missing_indexes_refresh(apt_root, fake_apt):
+    apt.apt_update()
+    for path in apt.LISTS_DIR.iterdir():
+        path.unlink()
+    assert apt.needs_update() == (True, "no package indexes yet")
+
+def test_failed_update_is_not_recorded(apt_root, fake_apt):
+    fake_apt.return_value.returncode = 100
+    assert apt.apt_update() is True
+    assert not apt.state_path().exists()
+    assert apt.apt_update() is True
+
+def test_force(apt_root, fake_apt):
+    apt.apt_update()
+    assert apt.apt_update(force=True) is True
+    assert fake_apt.call_count == 2
+
+def test_corrupt_state(apt_root):
+    apt.state_path().parent.mkdir(parents=True)
+    apt.state_path().write_text("{oops")
+    assert apt.needs_update() == (True, "no record of a previous refresh")
+
+def test_unreadable_sources_dir(apt_root, monkeypatch, tmp_path):
+    monkeypatch.setattr(apt, "SOURCES_DIR", tmp_path / "missing")
+    assert list(apt.source_fingerprints()) == [str(apt.SOURCES_LIST)]
+
+@pytest.mark.parametrize("env, expected", [("600", 600.0), ("soon", apt.DEFAULT_MAX_AGE)])
+def test_max_age_from_env(monkeypatch, env, expected):
+    monkeypatch.setenv(apt.MAX_AGE_ENV, env)
+    assert apt.max_age_from_env() == expected
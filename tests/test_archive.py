@@ -0,0 +1,85 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from termux_dev_setup.utils import archive
+from termux_dev_setup.utils.archive import extract_member
+
+BINARY = os.urandom(64 * 1024)
+
+
+def make_tarball(path, members, mode="w:gz"):
+    """Write a tarball of {name: bytes or None (directory)} entries."""
+    with tarfile.open(path, mode) as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.fixture
+def tarball(tmp_path):
+    return make_tarball(tmp_path / "otel.tar.gz", {
+        "README.md": b"docs",
+        "bin": None,
+        "bin/otelcol-contrib": BINARY,
+        "LICENSE": b"license",
+    })
+
+
+def test_extract_member_writes_only_the_binary(tarball, tmp_path):
+    dest_dir = tmp_path / "install"
+    dest_dir.mkdir()
+    dest = dest_dir / "otelcol-contrib"
+
+    assert extract_member(tarball, "otelcol-contrib", dest) is True
+
+    assert dest.read_bytes() == BINARY
+    assert dest.stat().st_mode & 0o777 == 0o755
+    assert os.listdir(dest_dir) == ["otelcol-contrib"]
+
+def test_extract_member_replaces_existing_file(tarball, tmp_path):
+    dest = tmp_path / "otelcol-contrib"
+    dest.write_bytes(b"old")
+    # A reader holding the old inode (e.g. the running collector) keeps seeing it.
+    with open(dest, "rb") as old:
+        assert extract_member(tarball, "otelcol-contrib", dest, mode=0o700)
+        assert old.read() == b"old"
+    assert dest.read_bytes() == BINARY
+    assert dest.stat().st_mode & 0o777 == 0o700
+
+def test_extract_member_missing(tarball, tmp_path):
+    assert extract_member(tarball, "otelcol", tmp_path / "otelcol") is False
+    assert not (tmp_path / "otelcol").exists()
+
+def test_extract_member_ignores_directories_with_the_name(tmp_path):
+    path = make_tarball(tmp_path / "a.tar.gz", {"otelcol-contrib": None})
+    assert extract_member(path, "otelcol-contrib", tmp_path / "out") is False
+
+def test_extract_member_uncompressed(tmp_path):
+    path = make_tarball(tmp_path / "a.tar", {"otelcol-contrib": BINARY}, mode="w")
+    assert extract_member(path, "otelcol-contrib", tmp_path / "out")
+    assert (tmp_path / "out").read_bytes() == BINARY
+
+def test_extract_member_corrupt_archive(tmp_path):
+    path = tmp_path / "broken.tar.gz"
+    path.write_bytes(b"not a tarball")
+    with pytest.raises(tarfile.TarError):
+        extract_member(path, "otelcol-contrib", tmp_path / "out")
+
+def test_extract_member_cleans_up_on_failure(tarball, tmp_path, monkeypatch):
+    def failing_copy(src, dst, length):
+        dst.write(b"partial")
+        raise OSError("No space left on device")
+    monkeypatch.setattr(archive.shutil, "copyfileobj", failing_copy)
+
+    with pytest.raises(OSError):
+        extract_member(tarball, "otelcol-contrib", tmp_path / "otelcol-contrib")
+    assert sorted(os.listdir(tmp_path)) == ["otel.tar.gz"]
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import artifact_cache
+from termux_dev_setup.utils.artifact_cache import ArtifactCache, manage_cache, parse_size, format_size
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "artifacts", max_bytes=1000)
+
+
+def make_artifact(tmp_path, name, size):
+    path = tmp_path / name
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return path, hashlib.sha256(data).hexdigest()
+
+
+# =================== sizes ===================
+@pytest.mark.parametrize("value, expected", [
+    ("1024", 1024),
+    (2048, 2048),
+    ("512K", 512 * 1024),
+    ("200M", 200 * 1024 ** 2),
+    ("1.5g", int(1.5 * 1024 ** 3)),
+    ("2GB", 2 * 1024 ** 3),
+])
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+def test_parse_size_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+def test_format_size():
+    assert format_size(512) == "512 B"
+    assert format_size(1536) == "1.5 KiB"
+    assert format_size(3 * 1024 ** 3) == "3.0 GiB"
+
+def test_max_bytes_from_env(monkeypatch):
+    monkeypatch.setenv("TDS_CACHE_MAX_BYTES", "10M")
+    assert ArtifactCache().max_bytes == 10 * 1024 ** 2
+    monkeypatch.setenv("TDS_CACHE_MAX_BYTES", "nonsense")
+    assert ArtifactCache().max_bytes == artifact_cache.DEFAULT_MAX_BYTES
+
+def test_default_root_follows_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("TDS_CACHE_DIR", str(tmp_path))
+    assert ArtifactCache().root == tmp_path / "artifacts"
+
+
+# =================== store / lookup ===================
+def test_store_then_lookup(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cached = cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+
+    assert cached == cache.root / f"{digest}-otel.tar.gz"
+    assert cached.read_bytes() == src.read_bytes()
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64") == cached
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64", digest.upper()) == cached
+
+def test_cached_copy_survives_source_removal(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cached = cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+    src.unlink()
+    assert cached.exists()
+
+def test_lookup_misses(cache, tmp_path):
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64") is None
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+
+    assert cache.lookup("otelcol-contrib", "1.1", "linux_arm64") is None
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_amd64") is None
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64", "0" * 64) is None
+
+def test_lookup_ignores_truncated_file(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cached = cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+    cached.write_bytes(b"partial")
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64") is None
+
+def test_corrupt_index_is_treated_as_empty(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+    cache.index_path.write_text("{not json")
+    assert cache.entries() == []
+    cache.index_path.write_text(json.dumps({"version": 99, "entries": []}))
+    assert cache.lookup("otelcol-contrib", "1.0", "linux_arm64") is None
+
+def test_index_skips_malformed_entries(cache):
+    cache.root.mkdir(parents=True)
+    cache.index_path.write_text(json.dumps({"version": 1, "entries": [{"name": "x"}]}))
+    assert cache.entries() == []
+
+def test_store_falls_back_to_copy(cache, tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise OSError("cross-device link")
+    monkeypatch.setattr(artifact_cache.os, "link", no_link)
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cached = cache.store("otelcol-contrib", "1.0", "linux_arm64", src, digest)
+    assert cached.read_bytes() == src.read_bytes()
+
+
+# =================== eviction ===================
+def test_store_evicts_least_recently_used(cache, tmp_path):
+    stored = {}
+    for version in ("1", "2", "3"):
+        src, digest = make_artifact(tmp_path, f"otel-{version}.tar.gz", 400)
+        stored[version] = cache.store("otelcol-contrib", version, "linux_arm64", src, digest)
+        # Touch version 1 so version 2 becomes the least recently used.
+        cache.lookup("otelcol-contrib", "1", "linux_arm64")
+
+    assert [e.version for e in cache.entries()] == ["1", "3"]
+    assert not stored["2"].exists()
+    assert cache.total_size() == 800
+
+def test_store_keeps_new_entry_larger_than_limit(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "big.tar.gz", 2000)
+    cached = cache.store("otelcol-contrib", "1", "linux_arm64", src, digest)
+    assert cached.exists()
+    assert [e.version for e in cache.entries()] == ["1"]
+
+def test_prune_to_size_and_strays(cache, tmp_path):
+    for version in ("1", "2"):
+        src, digest = make_artifact(tmp_path, f"otel-{version}.tar.gz", 300)
+        cache.store("otelcol-contrib", version, "linux_arm64", src, digest)
+    stray = cache.root / "leftover.tmp"
+    stray.write_bytes(b"x")
+
+    removed = cache.prune(max_bytes=300)
+
+    assert [e.version for e in removed] == ["1"]
+    assert [e.version for e in cache.entries()] == ["2"]
+    assert not stray.exists()
+
+def test_prune_drops_entries_with_missing_files(cache, tmp_path):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    cache.store("otelcol-contrib", "1", "linux_arm64", src, digest).unlink()
+    assert [e.version for e in cache.prune()] == ["1"]
+    assert cache.entries() == []
+
+def test_clear(cache, tmp_path):
+    assert cache.clear() == 0
+    assert cache.prune() == []
+    for version in ("1", "2"):
+        src, digest = make_artifact(tmp_path, f"otel-{version}.tar.gz", 100)
+        cache.store("otelcol-contrib", version, "linux_arm64", src, digest)
+
+    assert cache.clear() == 2
+    assert cache.entries() == []
+    assert sorted(p.name for p in cache.root.iterdir()) == [".lock", "index.json"]
+
+
+def test_partial_downloads_survive_prune_but_not_clear(cache):
+    part = cache.download_path("otel.tar.gz").with_name("otel.tar.gz.part")
+    part.write_bytes(b"half")
+    cache.prune(max_bytes=0)
+    assert part.exists()
+    cache.clear()
+    assert not part.exists()
+
+# =================== manage_cache ===================
+@pytest.fixture
+def env_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("TDS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("TDS_CACHE_MAX_BYTES", raising=False)
+    return ArtifactCache()
+
+def test_manage_cache_list_empty(env_cache, capsys):
+    manage_cache("list")
+    assert "Cache is empty" in capsys.readouterr().out
+
+def test_manage_cache_list(env_cache, tmp_path, capsys):
+    src, digest = make_artifact(tmp_path, "otel.tar.gz", 100)
+    env_cache.store("otelcol", "0.120.0", "linux_arm64", src, digest)
+    manage_cache("list")
+    out = capsys.readouterr().out
+    assert "otelcol" in out and "0.120.0" in out and digest[:12] in out
+
+def test_manage_cache_prune_and_clear(env_cache, tmp_path, capsys):
+    for version in ("1", "2"):
+        src, digest = make_artifact(tmp_path, f"otel-{version}.tar.gz", 100)
+        env_cache.store("otelcol-contrib", version, "linux_arm64", src, digest)
+
+    manage_cache("prune", max_size="100")
+    assert "Pruned 1 artifact(s)" in capsys.readouterr().out
+    manage_cache("clear")
+    assert "Removed 1 artifact(s)" in capsys.readouterr().out
+
+def test_manage_cache_prune_invalid_size(env_cache):
+    with pytest.raises(TDSError) as excinfo:
+        manage_cache("prune", max_size="huge")
+    assert excinfo.value.exit_code == 2
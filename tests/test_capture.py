@@ -0,0 +1,147 @@
+import io
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from rich.console import Console
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import capture, postgres_utils, status
+from termux_dev_setup.utils.capture import OutputCapture, step_output
+from termux_dev_setup.utils.shell import run_command
+from termux_dev_setup.utils.tasks import TaskGraph
+
+PY = sys.executable
+
+
+def printer(lines, exit_code=0):
+    """argv of a command printing `lines` numbered lines (half on stderr) and exiting with `exit_code`."""
+    script = ("import sys\n"
+              f"for i in range({lines}):\n"
+              "    (sys.stdout if i % 2 else sys.stderr).write(f'line {i}\\n'); sys.stdout.flush(); sys.stderr.flush()\n"
+              f"sys.exit({exit_code})")
+    return [PY, "-c", script]
+
+
+def test_tail_is_bounded_and_log_is_complete(tmp_path):
+    log = tmp_path / "logs" / "step.log"
+    sink = OutputCapture("cmd", log, tail=3)
+    for i in range(1000):
+        sink.feed(f"line {i}\n".encode())
+    sink.close()
+
+    assert list(sink.lines) == ["line 997", "line 998", "line 999"]
+    assert sink.line_count == 1000
+    assert log.read_text().splitlines()[0] == "$ cmd"
+    assert len(log.read_text().splitlines()) == 1001
+
+def test_progress_frames_partial_and_long_lines():
+    sink = OutputCapture("cmd")
+    sink.feed(b"10%\r20%\rDone")
+    sink.feed(b"\n" + b"x" * (capture.MAX_LINE * 3))
+    sink.close()
+    assert list(sink.lines)[:3] == ["10%", "20%", "Done"]
+    assert len(sink.lines[-1]) == capture.MAX_LINE
+
+def test_newest_line_is_rate_limited(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(capture.time, "monotonic", lambda: now[0])
+    shown = []
+    sink = OutputCapture("cmd", on_line=shown.append)
+    sink.feed(b"a\nb\n")
+    now[0] += capture.REFRESH_INTERVAL
+    sink.feed(b"c\n")
+    assert shown == ["a", "c"]
+
+def test_failure_report_has_tail_and_log(tmp_path, capsys):
+    sink = OutputCapture("apt install -y foo", tmp_path / "apt.log", tail=2)
+    sink.feed(b"Reading package lists...\nE: Unable to locate package foo\nE: giving up\n")
+    sink.close()
+    sink.check(0)
+    with pytest.raises(TDSError) as excinfo:
+        sink.check(100)
+    assert excinfo.value.exit_code == 100
+    out = " ".join(capsys.readouterr().out.split())
+    assert "Last 2 of 3 lines of output: E: Unable to locate package foo E: giving up" in out
+    assert "apt.log" in out
+
+def test_unwritable_log_still_keeps_tail(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    sink = OutputCapture("cmd", blocker / "x.log")
+    sink.feed(b"kept\n")
+    sink.close()
+    assert sink.log_file is None and list(sink.lines) == ["kept"]
+
+
+def test_commands_in_a_step_are_streamed_to_its_log(isolated_state, capfd):
+    seen = []
+    with step_output("svc-install", seen.append):
+        result = run_command(printer(5))
+    assert result.returncode == 0 and result.stdout is None
+
+    log = (isolated_state / "logs" / "svc-install.log").read_text()
+    assert all(f"line {i}" in log for i in range(5))
+    assert seen == ["line 0"]
+    assert "line" not in capfd.readouterr().out
+
+def test_step_log_starts_empty_each_run(isolated_state):
+    for _ in range(2):
+        with step_output("svc-config"):
+            run_command([PY, "-c", "print('once')"])
+    assert (isolated_state / "logs" / "svc-config.log").read_text().splitlines().count("once") == 1
+
+def test_streamed_failure_reports_last_lines(isolated_state, capsys):
+    with step_output("svc-initdb"), pytest.raises(TDSError) as excinfo:
+        run_command(printer(50, exit_code=3))
+    assert excinfo.value.exit_code == 3
+    out = capsys.readouterr().out
+    assert "line 49" in out and "line 5\n" not in out
+    assert "Last 20 of 50 lines" in " ".join(out.split())
+    # check=False still returns the exit status.
+    with step_output("svc-initdb"):
+        assert run_command(printer(1, exit_code=2), check=False).returncode == 2
+
+def test_stream_outside_a_step_logs_by_program(isolated_state, monkeypatch):
+    term = Console(file=io.StringIO(), force_terminal=True)
+    monkeypatch.setattr(status, "console", term)
+    run_command(printer(3), stream=True)
+    log = isolated_state / "logs" / f"{PY.rsplit('/', 1)[-1]}.log"
+    assert "line 2" in log.read_text()
+
+def test_log_outside_a_step_keeps_only_the_latest_run(isolated_state):
+    for text in ("first", "second"):
+        run_command([PY, "-c", f"print('{text}')"], stream=True)
+    log = (isolated_state / "logs" / f"{PY.rsplit('/', 1)[-1]}.log").read_text()
+    assert "second" in log and "first" not in log
+
+def test_streamed_command_not_found(isolated_state):
+    with pytest.raises(TDSError) as excinfo:
+        run_command(["tds-no-such-program"], stream=True)
+    assert excinfo.value.exit_code == 127
+
+def test_capture_output_is_never_streamed():
+    with step_output("svc-probe"):
+        assert run_command([PY, "-c", "print('x')"], capture_output=True).stdout == "x\n"
+
+
+def test_worker_output_goes_to_the_step_log(isolated_state, monkeypatch):
+    worker = MagicMock()
+    worker.run.return_value = subprocess.CompletedProcess(["initdb"], 1, "creating directories\n", "initdb: error\n")
+    monkeypatch.setattr(postgres_utils._session, "worker", lambda: worker)
+
+    with step_output("postgres-initdb"), pytest.raises(TDSError):
+        postgres_utils.run_as_postgres(["initdb", "-D", "/data"])
+
+    worker.run.assert_called_once_with(["initdb", "-D", "/data"], check=False, capture_output=True)
+    log = (isolated_state / "logs" / "postgres-initdb.log").read_text()
+    assert "creating directories" in log and "initdb: error" in log
+
+
+def test_graph_steps_stream_into_the_live_view(isolated_state):
+    graph = TaskGraph("svc")
+    graph.add("install", lambda: run_command(printer(4)), title="Install packages")
+    graph.run()
+    assert graph.ok
+    assert "line 3" in (isolated_state / "logs" / "svc-install.log").read_text()
@@ -7,14 +7,16 @@ from termux_dev_setup.errors import TDSError
 @pytest.fixture(autouse=True)
 def mock_commands(monkeypatch):
     """Auto-mock all functions that the CLI can call."""
-    monkeypatch.setattr("termux_dev_setup.cli.setup_postgres", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.manage_postgres", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.setup_redis", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.manage_redis", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.setup_otel", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.manage_otel", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.setup_gcloud", MagicMock())
-    monkeypatch.setattr("termux_dev_setup.cli.print_logo", MagicMock())
+    # Commands are resolved lazily from their modules, so patch them at the source.
+    monkeypatch.setattr("termux_dev_setup.postgres.setup_postgres", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.postgres.manage_postgres", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.redis.setup_redis", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.redis.manage_redis", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.otel.setup_otel", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.otel.manage_otel", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.gcloud.setup_gcloud", MagicMock())
+    monkeypatch.setattr("termux_dev_setup.utils.banner.print_logo", MagicMock())
+    monkeypatch.setenv("TDS_NO_DAEMON", "1")
 
 # =================== Help and No-Command Tests ===================
 def test_main_no_args():
@@ -37,10 +39,10 @@ def test_manage_no_service():
 
 # =================== Setup Command Tests ===================
 @pytest.mark.parametrize("service, mock_target", [
-    ("postgres", "termux_dev_setup.cli.setup_postgres"),
-    ("redis", "termux_dev_setup.cli.setup_redis"),
-    ("otel", "termux_dev_setup.cli.setup_otel"),
-    ("gcloud", "termux_dev_setup.cli.setup_gcloud"),
+    ("postgres", "termux_dev_setup.postgres.setup_postgres"),
+    ("redis", "termux_dev_setup.redis.setup_redis"),
+    ("otel", "termux_dev_setup.otel.setup_otel"),
+    ("gcloud", "termux_dev_setup.gcloud.setup_gcloud"),
 ])
 def test_setup_commands(service, mock_target):
     with patch(mock_target) as mock_func:
@@ -48,24 +50,57 @@ def test_setup_commands(service, mock_target):
             main()
             mock_func.assert_called_once()
 
+def test_setup_multiple_services():
+    with patch('sys.argv', ['tds', 'setup', 'postgres', 'redis', 'otel', 'redis']), \
+         patch('termux_dev_setup.stack.setup_services') as mock_setup:
+        main()
+    mock_setup.assert_called_once_with(["postgres", "redis", "otel", "redis"])
+
+@pytest.mark.parametrize("argv, expected", [
+    (['tds', 'setup', 'postgres', '--resume'], {"version": None, "resume": True, "rollback": False}),
+    (['tds', 'setup', 'postgres', '--version', '15', '--rollback'], {"version": "15", "resume": False, "rollback": True}),
+])
+def test_setup_journal_options(argv, expected):
+    from termux_dev_setup.postgres import setup_postgres
+    with patch('sys.argv', argv):
+        main()
+    setup_postgres.assert_called_once_with(**expected)
+
+def test_setup_gcloud_is_not_journaled():
+    from termux_dev_setup.gcloud import setup_gcloud
+    with patch('sys.argv', ['tds', 'setup', 'gcloud']):
+        main()
+    setup_gcloud.assert_called_once_with(version=None)
+
+@pytest.mark.parametrize("argv", [
+    ['tds', 'setup', 'postgres', 'mysql'],
+    ['tds', 'setup', 'postgres', 'redis', '--version', '15'],
+    ['tds', 'setup', 'postgres', 'redis', '--resume'],
+    ['tds', 'setup', 'gcloud', '--resume'],
+])
+def test_setup_multiple_services_invalid(argv):
+    with patch('sys.argv', argv), pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 2
+
 # =================== Manage Command Tests ===================
 @pytest.mark.parametrize("action", ["start", "stop", "restart", "status"])
 def test_manage_postgres_commands(action):
-    from termux_dev_setup.cli import manage_postgres
+    from termux_dev_setup.postgres import manage_postgres
     with patch('sys.argv', ['tds', 'manage', 'postgres', action]):
         main()
         manage_postgres.assert_called_with(action)
 
 @pytest.mark.parametrize("action", ["start", "stop", "restart", "status"])
 def test_manage_redis_commands(action):
-    from termux_dev_setup.cli import manage_redis
+    from termux_dev_setup.redis import manage_redis
     with patch('sys.argv', ['tds', 'manage', 'redis', action]):
         main()
         manage_redis.assert_called_with(action)
 
 @pytest.mark.parametrize("action", ["start", "stop", "restart", "status"])
 def test_manage_otel_commands(action):
-    from termux_dev_setup.cli import manage_otel
+    from termux_dev_setup.otel import manage_otel
     with patch('sys.argv', ['tds', 'manage', 'otel', action]):
         main()
         manage_otel.assert_called_with(action)
@@ -73,15 +108,15 @@ def test_manage_otel_commands(action):
 # =================== Interactive Mode Tests ===================
 def test_interactive_mode_success():
     with patch('sys.argv', ['tds', '--interactive']), \
-         patch('termux_dev_setup.cli.interactive.run_wizard', return_value="postgres") as mock_wizard, \
-         patch('termux_dev_setup.cli.interactive.run_service_setup') as mock_run_setup:
+         patch('termux_dev_setup.interactive.run_wizard', return_value="postgres") as mock_wizard, \
+         patch('termux_dev_setup.interactive.run_service_setup') as mock_run_setup:
         main()
         mock_wizard.assert_called_once()
         mock_run_setup.assert_called_with("postgres")
 
 def test_interactive_mode_exit():
     with patch('sys.argv', ['tds', '--interactive']), \
-         patch('termux_dev_setup.cli.interactive.run_wizard', return_value=None) as mock_wizard:
+         patch('termux_dev_setup.interactive.run_wizard', return_value=None) as mock_wizard:
         with pytest.raises(SystemExit) as excinfo:
             main()
         assert excinfo.value.code == 0
@@ -89,7 +124,7 @@ def test_interactive_mode_exit():
 
 # =================== Exception Handling Tests ===================
 def test_keyboard_interrupt():
-    from termux_dev_setup.cli import setup_postgres
+    from termux_dev_setup.postgres import setup_postgres
     setup_postgres.side_effect = KeyboardInterrupt
     with patch('sys.argv', ['tds', 'setup', 'postgres']), \
          patch('rich.console.Console.print') as mock_print:
@@ -99,7 +134,7 @@ def test_keyboard_interrupt():
         mock_print.assert_called_with("\n[error]✖  Operation cancelled by user.[/error]")
 
 def test_generic_exception():
-    from termux_dev_setup.cli import setup_gcloud
+    from termux_dev_setup.gcloud import setup_gcloud
     setup_gcloud.side_effect = Exception("Something broke")
     with patch('sys.argv', ['tds', 'setup', 'gcloud']), \
          patch('rich.console.Console.print') as mock_print:
@@ -109,9 +144,148 @@ def test_generic_exception():
         mock_print.assert_called_with("[error]✖  Unexpected error: Something broke[/error]")
 
 def test_tds_error():
-    from termux_dev_setup.cli import setup_gcloud
+    from termux_dev_setup.gcloud import setup_gcloud
     setup_gcloud.side_effect = TDSError("Known error", exit_code=7)
     with patch('sys.argv', ['tds', 'setup', 'gcloud']):
         with pytest.raises(SystemExit) as excinfo:
             main()
         assert excinfo.value.code == 7
+
+# =================== Startup Import Budget Tests ===================
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = str(Path(__file__).resolve().parents[1] / "src")
+
+# Modules that only specific subcommands need; none of them may load at startup.
+HEAVY_MODULES = [
+    "termux_dev_setup.postgres",
+    "termux_dev_setup.redis",
+    "termux_dev_setup.otel",
+    "termux_dev_setup.gcloud",
+    "termux_dev_setup.interactive",
+    "rich_argparse",
+    "pygments",
+    "tarfile",
+    "urllib.request",
+    "hashlib",
+    "platform",
+    "rich",
+]
+
+# Recorded budget for `import termux_dev_setup.cli` (cumulative, microseconds).
+# Generous on purpose: it catches an eager import creeping back in, not jitter.
+IMPORT_TIME_BUDGET_US = 400_000
+
+def _run_python(code, *args):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, TDS_NO_DAEMON="1")
+    return subprocess.run([sys.executable, *args, "-c", code], env=env, capture_output=True, text=True, timeout=30)
+
+def test_cli_import_is_lazy():
+    res = _run_python("import sys, termux_dev_setup.cli; print('\\n'.join(sys.modules))")
+    loaded = set(res.stdout.split())
+    assert "termux_dev_setup.cli" in loaded
+    assert [m for m in HEAVY_MODULES if m in loaded] == []
+
+def test_manage_dispatch_only_imports_selected_service():
+    code = (
+        "import sys\n"
+        "from unittest.mock import patch\n"
+        "import termux_dev_setup.redis as r\n"
+        "from termux_dev_setup import cli\n"
+        "with patch.object(r, 'manage_redis') as m, patch('sys.argv', ['tds', 'manage', 'redis', 'status']), patch('termux_dev_setup.utils.banner.print_logo'):\n"
+        "    cli.main()\n"
+        "    assert m.call_args.args == ('status',)\n"
+        "print('\\n'.join(sys.modules))\n"
+    )
+    res = _run_python(code)
+    assert res.returncode == 0, res.stderr
+    loaded = set(res.stdout.split())
+    assert "termux_dev_setup.redis" in loaded
+    for name in ("termux_dev_setup.postgres", "termux_dev_setup.otel", "termux_dev_setup.gcloud", "tarfile", "rich_argparse"):
+        assert name not in loaded
+
+def test_cli_import_time_budget():
+    res = _run_python("import termux_dev_setup.cli", "-X", "importtime")
+    cumulative = None
+    for line in res.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "termux_dev_setup.cli":
+            cumulative = int(parts[1])
+    assert cumulative is not None, res.stderr
+    assert cumulative < IMPORT_TIME_BUDGET_US
+
+# =================== Banner Switch Tests ===================
+def test_no_banner_flag_skips_logo():
+    from termux_dev_setup.utils import banner
+    with patch('sys.argv', ['tds', '--no-banner', 'manage', 'redis', 'status']):
+        main()
+    banner.print_logo.assert_not_called()
+
+def test_banner_printed_by_default():
+    from termux_dev_setup.utils import banner
+    with patch('sys.argv', ['tds', 'manage', 'redis', 'status']):
+        main()
+    banner.print_logo.assert_called_once()
+
+# =================== Daemon Delegation Tests ===================
+def test_manage_delegated_to_daemon():
+    from termux_dev_setup.utils import banner
+    with patch('sys.argv', ['tds', 'manage', 'redis', 'status']), \
+         patch('termux_dev_setup.daemon.try_manage', return_value=0) as mock_try:
+        main()
+    mock_try.assert_called_once_with("redis", "status")
+    banner.print_logo.assert_not_called()
+    from termux_dev_setup.redis import manage_redis
+    manage_redis.assert_not_called()
+
+def test_manage_daemon_failure_exit_code():
+    with patch('sys.argv', ['tds', 'manage', 'otel', 'start']), \
+         patch('termux_dev_setup.daemon.try_manage', return_value=4):
+        with pytest.raises(SystemExit) as excinfo:
+            main()
+        assert excinfo.value.code == 4
+
+def test_manage_falls_back_when_daemon_unavailable():
+    from termux_dev_setup.postgres import manage_postgres
+    with patch('sys.argv', ['tds', 'manage', 'postgres', 'stop']), \
+         patch('termux_dev_setup.daemon.try_manage', return_value=None):
+        main()
+    manage_postgres.assert_called_with("stop")
+
+def test_daemon_command():
+    with patch('sys.argv', ['tds', 'daemon', 'status']), \
+         patch('termux_dev_setup.daemon.manage_daemon') as mock_manage:
+        main()
+    mock_manage.assert_called_once_with("status")
+
+# =================== Status Command Tests ===================
+@pytest.mark.parametrize("argv, expected", [
+    (["tds", "status"], None),
+    (["tds", "status", "--all"], None),
+    (["tds", "status", "redis", "otel"], ["redis", "otel"]),
+])
+def test_status_command(argv, expected):
+    with patch('sys.argv', argv), patch('termux_dev_setup.health.status_all') as mock_status:
+        main()
+    mock_status.assert_called_once_with(expected, deadline=2.0)
+
+def test_status_command_rejects_unknown_service():
+    with patch('sys.argv', ['tds', 'status', 'mysql']):
+        with pytest.raises(SystemExit) as excinfo:
+            main()
+        assert excinfo.value.code == 2
+
+# =================== Cache Command Tests ===================
+@pytest.mark.parametrize("argv, expected", [
+    (["tds", "cache", "list"], ("list", None)),
+    (["tds", "cache", "prune", "--max-size", "200M"], ("prune", "200M")),
+    (["tds", "cache", "clear"], ("clear", None)),
+])
+def test_cache_command(argv, expected):
+    with patch('sys.argv', argv), patch('termux_dev_setup.utils.artifact_cache.manage_cache') as mock_cache:
+        main()
+    action, max_size = expected
+    mock_cache.assert_called_once_with(action, max_size=max_size)
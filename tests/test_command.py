@@ -0,0 +1,84 @@
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import command, process
+from termux_dev_setup.utils.command import argv, as_user, run_pipeline
+from termux_dev_setup.utils.shell import run_command
+
+PY = sys.executable
+
+
+def test_argv_stringifies_parts():
+    assert argv(Path("/usr/lib/postgresql/16/bin") / "initdb", "-D", Path("/data dir"), 5432) == \
+        ["/usr/lib/postgresql/16/bin/initdb", "-D", "/data dir", "5432"]
+
+@patch("termux_dev_setup.utils.command.check_command", return_value=True)
+def test_as_user_prefers_runuser(mock_check):
+    assert as_user("postgres", ["createdb", "-O", "me", "my db"]) == \
+        ["runuser", "-u", "postgres", "--", "createdb", "-O", "me", "my db"]
+
+@patch("termux_dev_setup.utils.command.check_command", return_value=False)
+def test_as_user_su_fallback_quotes_arguments(mock_check):
+    result = as_user("redis", ["redis-server", "/etc/redis/it's.conf"])
+    assert result[:5] == ["su", "-s", "/bin/sh", "redis", "-c"]
+    assert result[5] == "redis-server '/etc/redis/it'\"'\"'s.conf'"
+
+@patch("termux_dev_setup.utils.command.check_command")
+def test_as_user_current_user_is_not_wrapped(mock_check):
+    assert as_user(command.current_user(), ["id"]) == ["id"]
+    mock_check.assert_not_called()
+
+def test_run_command_accepts_argv_without_splitting():
+    result = run_command([PY, "-c", "import sys; print(sys.argv[1])", "two words; $HOME"], capture_output=True)
+    assert result.stdout == "two words; $HOME\n"
+
+def test_run_command_argv_failure_is_quoted(capsys):
+    with pytest.raises(TDSError):
+        run_command([PY, "-c", "raise SystemExit(3)"])
+    assert "-c 'raise SystemExit(3)'" in " ".join(capsys.readouterr().out.split())
+
+
+def test_pipeline_connects_stages():
+    result = run_pipeline([
+        [PY, "-c", "print('hello')"],
+        [PY, "-c", "import sys; print(sys.stdin.read().upper(), end='')"],
+    ], capture_output=True)
+    assert result.returncode == 0
+    assert result.stdout == "HELLO\n"
+    assert len(result.args) == 2
+
+def test_pipeline_reports_first_failed_stage(capsys):
+    with pytest.raises(TDSError) as excinfo:
+        run_pipeline([
+            [PY, "-c", "import sys; sys.stderr.write('download failed'); sys.exit(6)"],
+            [PY, "-c", "import sys; sys.stdin.read()"],
+        ], capture_output=True)
+    assert excinfo.value.exit_code == 6
+    assert "download failed" in capsys.readouterr().out
+
+def test_pipeline_unchecked_returns_status():
+    result = run_pipeline([[PY, "-c", "pass"], [PY, "-c", "raise SystemExit(2)"]], check=False)
+    assert result.returncode == 2
+    assert result.stdout is None
+
+def test_pipeline_missing_program_stops_started_stages():
+    with pytest.raises(TDSError) as excinfo:
+        run_pipeline([[PY, "-c", "import time; time.sleep(5)"], ["tds-no-such-program"]])
+    assert excinfo.value.exit_code == 127
+
+
+def test_spawn_detached_without_log_or_pid_file(tmp_path):
+    marker = tmp_path / "ran"
+    pid = process.spawn_detached([PY, "-c", f"open({str(marker)!r}, 'w').close()"])
+    assert pid > 0
+    for _ in range(200):
+        if marker.exists():
+            break
+        time.sleep(0.01)
+    assert marker.exists()
+    assert list(tmp_path.iterdir()) == [marker]
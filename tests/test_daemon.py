@@ -0,0 +1,237 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from termux_dev_setup import daemon
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils.status import console
+
+# =================== Fixtures ===================
+@pytest.fixture
+def sock_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "tds.sock")
+    monkeypatch.setenv("TDS_DAEMON_SOCKET", path)
+    monkeypatch.delenv("TDS_NO_DAEMON", raising=False)
+    return path
+
+@pytest.fixture
+def running_daemon(sock_path):
+    """A real daemon server on a temp socket whose service handlers are mocks."""
+    instance = daemon.TDSDaemon()
+    handlers = {name: MagicMock(name=name) for name in daemon.MANAGED_SERVICES}
+    instance.handlers.update(handlers)
+    server = daemon.make_server(instance, sock_path)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield instance, handlers
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=2)
+
+# =================== Client Tests ===================
+def test_request_without_daemon(sock_path):
+    assert daemon.request({"op": "ping"}) is None
+
+def test_request_stale_socket(sock_path):
+    open(sock_path, "w").close()
+    assert daemon.request({"op": "ping"}) is None
+
+def test_request_refuses_another_users_socket(running_daemon, monkeypatch):
+    instance, handlers = running_daemon
+    monkeypatch.setattr(daemon.os, "geteuid", lambda: daemon.os.stat(daemon.socket_path()).st_uid + 1)
+    assert daemon.try_manage("redis", "status") is None
+    handlers["redis"].assert_not_called()
+
+@pytest.fixture
+def silent_daemon(sock_path):
+    """A socket that accepts requests and then closes (reply=None) or never answers."""
+    import socket
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(sock_path)
+    server.listen()
+    received, conns = [], []
+
+    def accept(reply):
+        conn, _ = server.accept()
+        conns.append(conn)
+        received.append(conn.makefile("rb").readline())
+        if reply is not None:
+            conn.sendall(reply)
+            conn.close()
+
+    def serve(reply=None):
+        threading.Thread(target=accept, args=(reply,), daemon=True).start()
+        return received
+
+    yield serve
+    for conn in conns:
+        conn.close()
+    server.close()
+
+def test_request_unanswered_after_send_is_not_a_fallback(silent_daemon, monkeypatch, capsys):
+    monkeypatch.setattr(daemon, "REQUEST_TIMEOUT", 0.2)
+    received = silent_daemon()
+    assert daemon.try_manage("postgres", "start") == 1
+    assert b'"postgres"' in received[0]
+    assert "did not answer 'postgres start'" in capsys.readouterr().err
+
+@pytest.mark.parametrize("reply", [b'{"status": "ok", "exit_co', b"not json\n"])
+def test_request_partial_or_bad_reply(silent_daemon, reply):
+    silent_daemon(reply)
+    with pytest.raises(daemon.NoReply):
+        daemon.request({"op": "ping"}, timeout=2)
+
+def test_ping_treats_no_reply_as_down(silent_daemon):
+    silent_daemon(b"")
+    assert daemon.ping(timeout=2) is None
+
+def test_try_manage_disabled(sock_path, monkeypatch):
+    monkeypatch.setenv("TDS_NO_DAEMON", "1")
+    with patch.object(daemon, "request") as mock_request:
+        assert daemon.try_manage("redis", "status") is None
+        mock_request.assert_not_called()
+
+def test_config_env_filters_keys():
+    env = {"PG_DATA": "/d", "REDIS_PORT": "1", "OTEL_LOG": "x", "BASE_DIR": "/b", "TERM": "xterm"}
+    assert daemon.config_env(env) == {"PG_DATA": "/d", "REDIS_PORT": "1", "OTEL_LOG": "x", "BASE_DIR": "/b"}
+
+def test_env_fingerprint_ignores_order():
+    assert daemon.env_fingerprint({"A": "1", "B": "2"}) == daemon.env_fingerprint({"B": "2", "A": "1"})
+    assert daemon.env_fingerprint({"A": "1"}) != daemon.env_fingerprint({"A": "2"})
+
+def test_try_manage_sends_no_secrets(silent_daemon, monkeypatch):
+    monkeypatch.setenv("PG_PASSWORD", "hunter2")
+    received = silent_daemon(b'{"status": "ok", "exit_code": 0}\n')
+    assert daemon.try_manage("postgres", "status") == 0
+    assert b"hunter2" not in received[0]
+    assert daemon.env_fingerprint(daemon.config_env()).encode() in received[0]
+
+# =================== Server Round-trip Tests ===================
+def test_ping(running_daemon):
+    reply = daemon.request({"op": "ping"})
+    assert reply["status"] == "ok"
+    assert "pid" in reply
+
+def test_try_manage_round_trip(running_daemon, capsys):
+    instance, handlers = running_daemon
+    handlers["redis"].side_effect = lambda action: console.print(f"redis {action} done")
+
+    assert daemon.try_manage("redis", "status") == 0
+    handlers["redis"].assert_called_once_with("status")
+    assert "redis status done" in capsys.readouterr().out
+
+def test_try_manage_propagates_exit_code(running_daemon):
+    instance, handlers = running_daemon
+    handlers["otel"].side_effect = TDSError("boom", exit_code=4)
+    assert daemon.try_manage("otel", "start") == 4
+
+def test_try_manage_unexpected_error(running_daemon, capsys):
+    instance, handlers = running_daemon
+    handlers["postgres"].side_effect = RuntimeError("kaput")
+    assert daemon.try_manage("postgres", "stop") == 1
+    assert "Unexpected error: kaput" in capsys.readouterr().out
+
+def test_try_manage_env_mismatch_falls_back(running_daemon, monkeypatch):
+    instance, handlers = running_daemon
+    monkeypatch.setenv("REDIS_PORT", "7000")
+    assert daemon.try_manage("redis", "status") is None
+    handlers["redis"].assert_not_called()
+
+def test_unsupported_requests(running_daemon):
+    assert daemon.request({"op": "manage", "service": "gcloud", "action": "start"})["status"] == "error"
+    assert daemon.request({"op": "bogus"})["status"] == "error"
+    assert daemon.request(["not", "a", "dict"])["status"] == "error"
+
+def test_shutdown_op(sock_path):
+    server = daemon.make_server(daemon.TDSDaemon(), sock_path)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    assert daemon.request({"op": "shutdown"})["status"] == "ok"
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    server.server_close()
+
+# =================== Resident Handler Tests ===================
+@pytest.mark.parametrize("service, target, kwarg, cls", [
+    ("postgres", "termux_dev_setup.postgres.manage_postgres", "controller", "termux_dev_setup.postgres.PostgresController"),
+    ("redis", "termux_dev_setup.redis.manage_redis", "service", "termux_dev_setup.redis.RedisService"),
+    ("otel", "termux_dev_setup.otel.manage_otel", "service", "termux_dev_setup.otel.OtelService"),
+])
+def test_handlers_are_resident(service, target, kwarg, cls):
+    instance = daemon.TDSDaemon(env={})
+    with patch(target) as mock_manage, patch(cls) as mock_cls:
+        instance.get_handler(service)("status")
+        instance.get_handler(service)("start")
+    # The service object is built once and reused for every request.
+    mock_cls.assert_called_once()
+    assert mock_manage.call_args_list[0].kwargs[kwarg] is mock_manage.call_args_list[1].kwargs[kwarg]
+    instance.close()
+
+def test_resident_postgres_session_ends_with_daemon():
+    from termux_dev_setup.utils.postgres_utils import postgres_session
+    instance = daemon.TDSDaemon(env={})
+    with patch("termux_dev_setup.postgres.PostgresController"):
+        instance.get_handler("postgres")
+    # The postgres worker scope stays open between requests...
+    assert postgres_session().depth == 1
+    instance.close()
+    assert postgres_session().depth == 0
+
+# =================== manage_daemon Tests ===================
+def test_manage_daemon_start_already_running(sock_path):
+    with patch.object(daemon, "request", return_value={"status": "ok", "pid": 42}), \
+         patch("termux_dev_setup.utils.status.success") as mock_success:
+        daemon.manage_daemon("start")
+        mock_success.assert_called_with("tds daemon is already running (pid 42).")
+
+def test_manage_daemon_start_spawns(sock_path):
+    with patch.object(daemon, "request", return_value=None), \
+         patch.object(daemon, "start_daemon", return_value=True) as mock_start, \
+         patch("termux_dev_setup.utils.status.success") as mock_success:
+        daemon.manage_daemon("start")
+        mock_start.assert_called_once_with(sock_path)
+        mock_success.assert_called_with(f"tds daemon started on {sock_path}.")
+
+def test_manage_daemon_start_fails(sock_path):
+    with patch.object(daemon, "request", return_value=None), \
+         patch.object(daemon, "start_daemon", return_value=False):
+        with pytest.raises(TDSError):
+            daemon.manage_daemon("start")
+
+def test_manage_daemon_stop(sock_path):
+    with patch.object(daemon, "request", side_effect=[{"status": "ok", "pid": 7}, {"status": "ok"}]) as mock_request:
+        daemon.manage_daemon("stop")
+        assert mock_request.call_args_list[1].args[0] == {"op": "shutdown"}
+
+def test_manage_daemon_status(sock_path, monkeypatch):
+    monkeypatch.setenv("TDS_NO_DAEMON", "1")
+    with patch.object(daemon, "request", return_value={"status": "ok", "pid": 7, "uptime": 3}), \
+         patch("termux_dev_setup.utils.status.console.print") as mock_print:
+        daemon.manage_daemon("status")
+        assert any("UP" in str(args) for args, kwargs in mock_print.call_args_list)
+
+def test_start_daemon_launches_detached(sock_path):
+    with patch("subprocess.Popen") as mock_popen, \
+         patch.object(daemon, "request", side_effect=[None, {"status": "ok"}]), \
+         patch.object(daemon, "DEFAULT_LOG", sock_path + ".log"), \
+         patch("time.sleep"):
+        assert daemon.start_daemon(sock_path) is True
+        assert mock_popen.call_args.kwargs["start_new_session"] is True
+
+def test_serve_cleans_up_socket(sock_path, monkeypatch):
+    monkeypatch.setattr(daemon, "make_server", MagicMock())
+    open(sock_path, "w").close()
+    with patch("signal.signal") as mock_signal, \
+         patch("termux_dev_setup.utils.lock.Path", return_value=MagicMock()), \
+         patch("builtins.open", MagicMock()), \
+         patch("fcntl.lockf"):
+        daemon.serve(sock_path)
+    server = daemon.make_server.return_value
+    server.serve_forever.assert_called_once()
+    server.server_close.assert_called_once()
+    import os
+    assert not os.path.exists(sock_path)
+
+    # SIGTERM handler shuts the server down from a helper thread.
+    handler = mock_signal.call_args.args[1]
+    handler(15, None)
@@ -0,0 +1,304 @@
+import hashlib
+import os
+import pytest
+from unittest.mock import patch
+from termux_dev_setup.utils import download
+from termux_dev_setup.errors import ChecksumError, DownloadError
+
+PAYLOAD = os.urandom(300 * 1024 + 17)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+@pytest.fixture
+def server(http_server):
+    return http_server({"/otel.tar.gz": PAYLOAD})
+
+# =================== download_file Tests ===================
+def test_download_file_streams_and_hashes(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    digest = download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256=PAYLOAD_SHA256, progress=False)
+    assert digest == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+
+def test_download_file_checksum_mismatch(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    with pytest.raises(ChecksumError) as excinfo:
+        download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256="0" * 64, progress=False)
+    assert excinfo.value.exit_code == 3
+    assert excinfo.value.actual == PAYLOAD_SHA256
+    assert not dest.exists()
+
+def test_download_file_http_error(server, tmp_path):
+    with pytest.raises(DownloadError) as excinfo:
+        download.download_file(server.url("/missing"), tmp_path / "x", progress=False)
+    assert excinfo.value.exit_code == 4
+    assert "404" in str(excinfo.value)
+
+def test_download_file_truncated(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, drop_after=1000)
+    with pytest.raises(DownloadError):
+        download.download_file(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz", progress=False, retries=2, backoff=0)
+    # Three attempts, each resuming where the previous one stopped.
+    assert [r[2] for r in server.requests] == [None, "bytes=1000-", "bytes=2000-"]
+    assert download.part_path(tmp_path / "otel.tar.gz").stat().st_size == 3000
+
+# =================== resume / retry Tests ===================
+def test_download_file_resumes_after_drops(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, drop_after=100 * 1024)
+    dest = tmp_path / "otel.tar.gz"
+    digest = download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256=PAYLOAD_SHA256, progress=False, backoff=0)
+    assert digest == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+    assert not download.part_path(dest).exists()
+    assert [r[2] for r in server.requests] == [None, "bytes=102400-", "bytes=204800-", "bytes=307200-"]
+
+def test_download_file_resumes_part_from_previous_run(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(PAYLOAD[:5000])
+    digest = download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256=PAYLOAD_SHA256, progress=False)
+    assert digest == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests == [("GET", "/otel.tar.gz", "bytes=5000-")]
+
+def test_download_file_complete_part_is_not_refetched(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(PAYLOAD)
+    assert download.download_file(server.url("/otel.tar.gz"), dest, progress=False) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+    assert len(server.requests) == 1
+
+def test_download_file_stale_part_restarts(server, tmp_path):
+    """A .part longer than the remote file cannot be resumed; it is downloaded afresh."""
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(b"x" * (len(PAYLOAD) + 10))
+    assert download.download_file(server.url("/otel.tar.gz"), dest, progress=False) == PAYLOAD_SHA256
+    assert [r[2] for r in server.requests] == ["bytes=%d-" % (len(PAYLOAD) + 10), None]
+
+def test_download_file_restarts_when_ranges_unsupported(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, ranges=False)
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(b"garbage")
+    assert download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256=PAYLOAD_SHA256, progress=False) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+
+def test_download_file_checksum_mismatch_after_resume_removes_part(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(b"y" * 5000)
+    with pytest.raises(ChecksumError):
+        download.download_file(server.url("/otel.tar.gz"), dest, expected_sha256=PAYLOAD_SHA256, progress=False)
+    assert not download.part_path(dest).exists()
+
+def test_download_file_backoff_doubles(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, drop_after=10)
+    with patch.object(download.time, "sleep") as mock_sleep, pytest.raises(DownloadError):
+        download.download_file(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz", progress=False, retries=4, backoff=1.0)
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [1.0, 2.0, 4.0, 8.0]
+
+def test_download_file_client_error_not_retried(server, tmp_path):
+    with pytest.raises(DownloadError):
+        download.download_file(server.url("/missing"), tmp_path / "x", progress=False, backoff=0)
+    assert len(server.requests) == 1
+
+@pytest.mark.parametrize("value, expected", [
+    ("bytes 100-199/1000", (100, 1000)),
+    ("bytes */1000", (None, 1000)),
+    ("bytes 0-9/*", (0, None)),
+    (None, (None, None)),
+    ("items 1-2/3", (None, None)),
+])
+def test_parse_content_range(value, expected):
+    assert download.parse_content_range(value) == expected
+
+def test_is_retryable():
+    import http.client
+    import urllib.error
+    assert download.is_retryable(ConnectionResetError())
+    assert download.is_retryable(http.client.IncompleteRead(b""))
+    assert download.is_retryable(urllib.error.HTTPError("u", 503, "busy", {}, None))
+    assert download.is_retryable(urllib.error.HTTPError("u", 429, "slow down", {}, None))
+    assert not download.is_retryable(urllib.error.HTTPError("u", 404, "missing", {}, None))
+    assert not download.is_retryable(ValueError("unknown url type"))
+
+def test_download_file_bad_url(tmp_path):
+    with pytest.raises(DownloadError):
+        download.download_file("not a url", tmp_path / "x", progress=False)
+
+def test_download_file_respects_memory_ceiling(server, tmp_path, monkeypatch):
+    """The only buffer held in memory is capped by TDS_DOWNLOAD_MAX_MEMORY."""
+    monkeypatch.setenv(download.MAX_MEMORY_ENV, str(16 * 1024))
+    sizes = []
+    real_bytearray = bytearray
+
+    def tracking_bytearray(size):
+        sizes.append(size)
+        return real_bytearray(size)
+
+    with patch.object(download, "bytearray", tracking_bytearray, create=True):
+        download.download_file(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz", progress=False)
+    assert sizes == [16 * 1024]
+
+def test_download_file_with_progress(server, tmp_path):
+    digest = download.download_file(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz", progress=True)
+    assert digest == PAYLOAD_SHA256
+
+@pytest.mark.parametrize("env, expected", [
+    (None, download.DEFAULT_CHUNK_SIZE),
+    ("65536", 65536),
+    ("10", download.MIN_CHUNK_SIZE),
+    ("lots", download.DEFAULT_CHUNK_SIZE),
+])
+def test_chunk_size_limit(monkeypatch, env, expected):
+    if env is None:
+        monkeypatch.delenv(download.MAX_MEMORY_ENV, raising=False)
+    else:
+        monkeypatch.setenv(download.MAX_MEMORY_ENV, env)
+    assert download.chunk_size_limit() == expected
+
+# =================== segmented download Tests ===================
+def segmented(server, dest, **kwargs):
+    kwargs.setdefault("connections", 4)
+    kwargs.setdefault("min_segment_size", 16 * 1024)
+    return download.download_segmented(server.url("/otel.tar.gz"), dest, progress=False, backoff=0, **kwargs)
+
+def test_split_ranges():
+    assert download.split_ranges(10, 3, min_size=1) == [(0, 3), (4, 7), (8, 9)]
+    assert download.split_ranges(100, 8, min_size=40) == [(0, 49), (50, 99)]
+    assert download.split_ranges(10, 4, min_size=100) == [(0, 9)]
+
+def test_download_segmented_fetches_ranges_concurrently(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    assert segmented(server, dest, expected_sha256=PAYLOAD_SHA256) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+    assert not download.part_path(dest).exists() and not download.segments_path(dest).exists()
+    assert server.requests[0] == ("HEAD", "/otel.tar.gz", None)
+    ranges = sorted(r[2] for r in server.requests[1:])
+    assert len(ranges) == 4 and all(r.startswith("bytes=") for r in ranges)
+
+def test_download_segmented_retries_dropped_segments(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, drop_after=30 * 1024)
+    dest = tmp_path / "otel.tar.gz"
+    assert segmented(server, dest, expected_sha256=PAYLOAD_SHA256) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+
+def test_download_segmented_failure_discards_part(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, drop_after=1024)
+    dest = tmp_path / "otel.tar.gz"
+    with pytest.raises(DownloadError):
+        segmented(server, dest, retries=0)
+    assert not download.part_path(dest).exists() and not download.segments_path(dest).exists()
+
+def test_download_segmented_interrupted_leaves_nothing_to_resume(server, tmp_path, monkeypatch):
+    real_fetch_range = download._fetch_range
+
+    def interrupted(url, fd, start, *args):
+        real_fetch_range(url, fd, start, *args)
+        if start:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(download, "_fetch_range", interrupted)
+
+    dest = tmp_path / "otel.tar.gz"
+    with pytest.raises(KeyboardInterrupt):
+        segmented(server, dest)
+    assert not download.part_path(dest).exists() and not download.segments_path(dest).exists()
+
+    # The next run starts over instead of resuming a file with holes.
+    monkeypatch.setattr(download, "_fetch_range", real_fetch_range)
+    assert segmented(server, dest, expected_sha256=PAYLOAD_SHA256) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+
+def test_download_segmented_checksum_mismatch(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    with pytest.raises(ChecksumError):
+        segmented(server, dest, expected_sha256="0" * 64)
+    assert not dest.exists() and not download.part_path(dest).exists()
+    assert not download.segments_path(dest).exists()
+
+def test_download_segmented_falls_back_without_ranges(http_server, tmp_path):
+    server = http_server({"/otel.tar.gz": PAYLOAD}, ranges=False)
+    dest = tmp_path / "otel.tar.gz"
+    assert segmented(server, dest) == PAYLOAD_SHA256
+    assert [r[0] for r in server.requests] == ["HEAD", "GET"]
+
+def test_download_segmented_falls_back_when_range_ignored(server, tmp_path, monkeypatch):
+    real_open_url = download.open_url
+
+    def ignore_ranges(url, timeout=30, headers=None, method=None):
+        # Advertises Accept-Ranges on HEAD but answers every GET in full.
+        return real_open_url(url, timeout, None, method)
+    monkeypatch.setattr(download, "open_url", ignore_ranges)
+
+    dest = tmp_path / "otel.tar.gz"
+    assert segmented(server, dest) == PAYLOAD_SHA256
+    assert dest.read_bytes() == PAYLOAD
+
+@pytest.mark.parametrize("kwargs", [{"connections": 1}, {"min_segment_size": 10 * 1024 * 1024}])
+def test_download_segmented_single_stream_cases(server, tmp_path, kwargs):
+    assert segmented(server, tmp_path / "otel.tar.gz", **kwargs) == PAYLOAD_SHA256
+    assert [r[0] for r in server.requests if r[0] == "GET"] == ["GET"]
+
+def test_download_segmented_resumes_existing_part(server, tmp_path):
+    dest = tmp_path / "otel.tar.gz"
+    download.part_path(dest).write_bytes(PAYLOAD[:1000])
+    assert segmented(server, dest) == PAYLOAD_SHA256
+    assert server.requests == [("GET", "/otel.tar.gz", "bytes=1000-")]
+
+def test_download_segmented_splits_memory_ceiling(server, tmp_path, monkeypatch):
+    monkeypatch.setenv(download.MAX_MEMORY_ENV, str(64 * 1024))
+    sizes = []
+    real_bytearray = bytearray
+
+    def tracking_bytearray(size):
+        sizes.append(size)
+        return real_bytearray(size)
+
+    with patch.object(download, "bytearray", tracking_bytearray, create=True):
+        segmented(server, tmp_path / "otel.tar.gz")
+    # Four 16 KiB segment buffers, then one buffer for the final hash pass.
+    assert sorted(sizes) == [16 * 1024] * 4 + [64 * 1024]
+
+@pytest.mark.parametrize("env, expected", [(None, 1), ("4", 4), ("0", 1), ("99", download.MAX_CONNECTIONS), ("x", 1)])
+def test_connections_from_env(monkeypatch, env, expected):
+    if env is None:
+        monkeypatch.delenv(download.CONNECTIONS_ENV, raising=False)
+    else:
+        monkeypatch.setenv(download.CONNECTIONS_ENV, env)
+    assert download.connections_from_env() == expected
+
+def test_probe_ranges(server, http_server):
+    assert download.probe_ranges(server.url("/otel.tar.gz")) == len(PAYLOAD)
+    assert download.probe_ranges(server.url("/missing")) is None
+    no_ranges = http_server({"/a": b"x"}, ranges=False)
+    assert download.probe_ranges(no_ranges.url("/a")) is None
+
+def test_no_second_live_display_inside_a_setup_step(server, tmp_path):
+    from termux_dev_setup.utils.tasks import TaskGraph
+
+    seen = []
+    graph = TaskGraph("otel")
+    graph.add("download", lambda: seen.append(download.make_progress().disable)
+              or download.download_file(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz"))
+    graph.run(progress=False)
+    assert graph.ok and seen == [True]
+    assert download.make_progress().disable is False
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_download_progress_goes_to_the_step_row(server, tmp_path, connections):
+    from termux_dev_setup.utils.capture import step_output
+
+    lines = []
+    with step_output("otel-binary", on_line=lines.append):
+        assert isinstance(download.make_progress(), download.StepProgress)
+        download.download_segmented(server.url("/otel.tar.gz"), tmp_path / "otel.tar.gz",
+                                    connections=connections, min_segment_size=16 * 1024)
+    assert lines and all(line.startswith("otel.tar.gz ") and line.endswith("/s") for line in lines)
+
+def test_step_progress_line(fake_clock, monkeypatch):
+    monkeypatch.setattr(download, "time", fake_clock)
+    lines = []
+    with download.StepProgress(lines.append) as bar:
+        task = bar.add_task("otel.tar.gz", total=None)
+        fake_clock.sleep(2)
+        bar.update(task, total=100_000_000, completed=0)
+        bar.advance(task, 10_000_000)
+        fake_clock.sleep(1)
+        bar.advance(task, 32_000_000)
+    assert lines == ["otel.tar.gz 0 bytes/100.0 MB 0 bytes/s", "otel.tar.gz 42.0 MB/100.0 MB 14.0 MB/s"]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from termux_dev_setup.utils import fingerprint
+from termux_dev_setup.utils.fingerprint import StepState, digest, file_digest, file_signature, owner_signature
+from termux_dev_setup.utils.paths import state_dir
+
+
+def test_digest_is_stable_across_key_order():
+    assert digest({"port": 6379, "dir": "/data"}) == digest({"dir": "/data", "port": 6379})
+    assert digest({"port": 6379}) != digest({"port": 6380})
+
+def test_file_digest(tmp_path):
+    path = tmp_path / "redis.conf"
+    path.write_text("port 6379\n")
+    before = file_digest(path)
+    path.write_text("port 6380\n")
+    assert file_digest(path) != before
+    assert file_digest(tmp_path / "missing") is None
+
+def test_signatures(tmp_path):
+    path = tmp_path / "otelcol-contrib"
+    path.write_bytes(b"binary")
+    assert file_signature(path)[0] == 6
+    assert owner_signature(tmp_path)[:2] == (os.getuid(), os.getgid())
+    assert file_signature(tmp_path / "missing") is None
+    assert owner_signature(tmp_path / "missing") is None
+
+def test_step_state_round_trip(isolated_state):
+    state = StepState("redis").load()
+    assert state.fingerprints == {}
+    state.fingerprints["config"] = "abc"
+    state.save()
+    assert state.path == isolated_state / "steps" / "redis.json"
+    assert StepState("redis").load().fingerprints == {"config": "abc"}
+
+@pytest.mark.parametrize("content", ["{oops", "[1, 2]"])
+def test_step_state_ignores_bad_records(tmp_path, content):
+    path = tmp_path / "redis.json"
+    path.write_text(content)
+    assert StepState("redis", path).load().fingerprints == {}
+
+@pytest.mark.parametrize("value, expected", [("1", True), ("yes", True), ("0", False), ("", False)])
+def test_force_from_env(monkeypatch, value, expected):
+    monkeypatch.setenv(fingerprint.FORCE_ENV, value)
+    assert fingerprint.force_from_env() is expected
+
+def test_state_dir_resolution(monkeypatch, tmp_path):
+    monkeypatch.delenv("TDS_STATE_DIR")
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    assert state_dir("steps") == tmp_path / "tds" / "steps"
+    monkeypatch.delenv("XDG_STATE_HOME")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert state_dir() == tmp_path / ".local" / "state" / "tds"
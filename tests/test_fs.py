@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from termux_dev_setup.utils.fs import chown_tree, ensure_dir, lookup_owner
+
+OWNER = (4242, 4242)
+
+needs_root = pytest.mark.skipif(os.geteuid() != 0, reason="chown to another user needs root")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """data/{a, sub/{b, deeper/c}} plus a symlink pointing out of the tree."""
+    root = tmp_path / "data"
+    (root / "sub" / "deeper").mkdir(parents=True)
+    for path in (root / "a", root / "sub" / "b", root / "sub" / "deeper" / "c"):
+        path.write_text("x")
+    outside = tmp_path / "outside"
+    outside.write_text("keep")
+    (root / "link").symlink_to(outside)
+    return root
+
+
+def owners(root):
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            st = os.lstat(os.path.join(dirpath, name))
+            found[os.path.relpath(os.path.join(dirpath, name), root)] = (st.st_uid, st.st_gid)
+    return found
+
+
+def test_ensure_dir_creates_with_mode(tmp_path):
+    path = tmp_path / "a" / "b"
+    assert ensure_dir(path, mode=0o700) == 1
+    assert path.is_dir() and path.stat().st_mode & 0o777 == 0o700
+    assert ensure_dir(path, mode=0o700) == 0
+
+def test_ensure_dir_fixes_mode_of_existing(tmp_path):
+    tmp_path.joinpath("d").mkdir(mode=0o755)
+    assert ensure_dir(tmp_path / "d", mode=0o700) == 1
+
+@needs_root
+@pytest.mark.parametrize("workers", [1, 3])
+def test_recursive_ensure_dir_only_changes_wrong_entries(tree, tmp_path, workers):
+    assert ensure_dir(tree, OWNER, recursive=True, workers=workers) == 7
+    assert set(owners(tree).values()) == {OWNER}
+    # The symlink itself was changed, never its target.
+    assert (os.stat(tmp_path / "outside").st_uid, os.lstat(tree / "link").st_uid) == (0, OWNER[0])
+
+    os.chown(tree / "sub" / "b", 0, 0)
+    assert ensure_dir(tree, OWNER, recursive=True, workers=workers) == 1
+    assert ensure_dir(tree, OWNER, recursive=True, workers=workers) == 0
+
+@needs_root
+def test_chown_tree_parallel_matches_sequential(tmp_path):
+    for i in range(20):
+        (tmp_path / f"d{i}" / "x").mkdir(parents=True)
+        (tmp_path / f"d{i}" / "x" / "f").write_text("")
+    assert chown_tree(tmp_path, OWNER, workers=4) == 60
+    assert chown_tree(tmp_path, OWNER, workers=1) == 0
+
+def test_ensure_dir_propagates_errors(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    with pytest.raises(OSError):
+        ensure_dir(blocker / "data")
+
+def test_lookup_owner():
+    assert lookup_owner("root") == (0, 0)
+    assert lookup_owner("no-such-user-tds") is None
+    assert lookup_owner("root", "no-such-group-tds") is None
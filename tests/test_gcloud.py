@@ -2,7 +2,14 @@ from unittest.mock import patch, mock_open
 import pytest
 from termux_dev_setup import gcloud
 
-def test_setup_gcloud_success():
+
+@pytest.fixture(autouse=True)
+def fake_pipeline():
+    """The key import pipes curl into gpg; never reach the network from tests."""
+    with patch("termux_dev_setup.gcloud.run_pipeline") as mock_pipeline:
+        yield mock_pipeline
+
+def test_setup_gcloud_success(fake_apt, fake_pipeline):
     """
     Tests the successful installation and configuration of gcloud.
     """
@@ -17,15 +24,15 @@ def test_setup_gcloud_success():
         mock_check_command.assert_any_call("apt-get")
 
         # 2. Prerequisites
-        mock_run_command.assert_any_call("apt-get update -y", check=False)
-        mock_run_command.assert_any_call("apt-get install -y apt-transport-https ca-certificates gnupg curl gnupg2 lsb-release")
+        fake_apt.assert_any_call(["apt-get", "update", "-y"], check=False)
+        mock_run_command.assert_any_call(["apt-get", "install", "-y", "apt-transport-https", "ca-certificates", "gnupg", "curl", "gnupg2", "lsb-release"])
 
         # 3. Import Key
         keyring_path = "/usr/share/keyrings/cloud.google.gpg"
-        mock_run_command.assert_any_call(
-            f"curl -fsSL https://packages.cloud.google.com/apt/doc/apt-key.gpg | gpg --dearmor -o {keyring_path} --yes",
-            shell=True
-        )
+        fake_pipeline.assert_called_once_with([
+            ["curl", "-fsSL", "https://packages.cloud.google.com/apt/doc/apt-key.gpg"],
+            ["gpg", "--dearmor", "-o", keyring_path, "--yes"],
+        ])
 
         # 4. Add Repository
         repo_file = "/etc/apt/sources.list.d/google-cloud-sdk.list"
@@ -35,14 +42,14 @@ def test_setup_gcloud_success():
         handle.write.assert_called_once_with(repo_line + "\n")
 
 
-        # 5. Install gcloud
-        mock_run_command.assert_any_call("apt-get update -y", check=False)
-        mock_run_command.assert_any_call("apt-get install -y google-cloud-cli")
+        # 5. Install gcloud (the indexes were never recorded as fresh, so both refreshes ran)
+        assert fake_apt.call_count == 2
+        mock_run_command.assert_any_call(["apt-get", "install", "-y", "google-cloud-cli"])
 
 
         # 6. Verification
         mock_check_command.assert_any_call("gcloud")
-        mock_run_command.assert_any_call("gcloud --version", check=False)
+        mock_run_command.assert_any_call(["gcloud", "--version"], check=False)
 
 def test_setup_gcloud_with_version():
     """
@@ -55,7 +62,7 @@ def test_setup_gcloud_with_version():
 
         gcloud.setup_gcloud(version=version)
 
-        mock_run_command.assert_any_call(f"apt-get install -y google-cloud-cli={version}-*")
+        mock_run_command.assert_any_call(["apt-get", "install", "-y", f"google-cloud-cli={version}-*"])
 
 
 def test_setup_gcloud_no_apt():
@@ -89,18 +96,19 @@ def test_setup_gcloud_prereq_install_exception():
     Tests exception handling during prerequisite installation.
     """
     with patch("termux_dev_setup.gcloud.check_command", return_value=True), \
-         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, Exception("Install error")]) as mock_run_command, \
+         patch("termux_dev_setup.gcloud.run_command", side_effect=[Exception("Install error")]) as mock_run_command, \
          patch("termux_dev_setup.gcloud.error") as mock_error:
         gcloud.setup_gcloud()
         mock_error.assert_called_with("Failed to install prerequisites.")
 
 
-def test_setup_gcloud_key_import_exception():
+def test_setup_gcloud_key_import_exception(fake_pipeline):
     """
     Tests exception handling during key import.
     """
+    fake_pipeline.side_effect = Exception("Key error")
     with patch("termux_dev_setup.gcloud.check_command", return_value=True), \
-         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, None, Exception("Key error")]) as mock_run_command, \
+         patch("termux_dev_setup.gcloud.run_command") as mock_run_command, \
          patch("termux_dev_setup.gcloud.error") as mock_error:
         gcloud.setup_gcloud()
         mock_error.assert_called_with("Failed to import Google Cloud key.")
@@ -124,7 +132,7 @@ def test_setup_gcloud_cli_install_exception():
     Tests exception handling during gcloud-cli installation.
     """
     with patch("termux_dev_setup.gcloud.check_command", return_value=True), \
-         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, None, None, None, Exception("Install error")]) as mock_run_command, \
+         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, Exception("Install error")]) as mock_run_command, \
          patch("builtins.open", mock_open()), \
          patch("termux_dev_setup.gcloud.error") as mock_error:
         gcloud.setup_gcloud()
@@ -137,8 +145,20 @@ def test_setup_gcloud_cli_install_exception_with_version():
     version = "1.2.3"
     pkg_name = f"google-cloud-cli={version}-*"
     with patch("termux_dev_setup.gcloud.check_command", return_value=True), \
-         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, None, None, None, Exception("Install error")]) as mock_run_command, \
+         patch("termux_dev_setup.gcloud.run_command", side_effect=[None, Exception("Install error")]) as mock_run_command, \
          patch("builtins.open", mock_open()), \
          patch("termux_dev_setup.gcloud.error") as mock_error:
         gcloud.setup_gcloud(version=version)
         mock_error.assert_called_with(f"Failed to install {pkg_name}.")
+
+def test_setup_gcloud_packages_preinstalled(fake_apt):
+    """Prerequisites installed by a batched multi-service setup are not installed again."""
+    with patch("termux_dev_setup.gcloud.check_command", side_effect=[True, True]), \
+         patch("termux_dev_setup.gcloud.run_command") as mock_run_command, \
+         patch("builtins.open", mock_open()):
+        gcloud.setup_gcloud(packages_installed=True)
+
+    assert "apt-transport-https" not in str(mock_run_command.call_args_list)
+    mock_run_command.assert_any_call(["apt-get", "install", "-y", "google-cloud-cli"])
+    # Only the refresh after adding the Google Cloud repository remains.
+    fake_apt.assert_called_once_with(["apt-get", "update", "-y"], check=False)
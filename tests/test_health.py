@@ -0,0 +1,154 @@
+import asyncio
+import socket
+import time
+import pytest
+from unittest.mock import patch
+from termux_dev_setup import health
+from termux_dev_setup.health import ProbeResult
+from termux_dev_setup.service_status import ServiceStatus
+
+def _run(coro):
+    return asyncio.run(coro)
+
+# =================== probe_tcp Tests ===================
+def test_probe_tcp_open_port():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        status, detail = _run(health.probe_tcp("127.0.0.1", port))
+    assert status == ServiceStatus.RUNNING
+
+def test_probe_tcp_closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    status, detail = _run(health.probe_tcp("127.0.0.1", port))
+    assert status == ServiceStatus.STOPPED
+
+# =================== probe_redis Tests ===================
+@pytest.mark.parametrize("password, ping_reply, expected", [
+    ("", b"+PONG\r\n", ServiceStatus.RUNNING),
+    ("s3cret", b"+PONG\r\n", ServiceStatus.RUNNING),
+    ("", b"-LOADING Redis is loading the dataset in memory\r\n", ServiceStatus.STARTING),
+    ("", b"-MISCONF oops\r\n", ServiceStatus.FAILED),
+    ("", b":1\r\n", ServiceStatus.UNKNOWN),
+])
+def test_probe_redis(password, ping_reply, expected, fake_redis_server):
+    server = fake_redis_server(password=password, ping_reply=ping_reply)
+    status, detail = _run(health.probe_redis("127.0.0.1", server.port, password))
+    assert status == expected
+
+def test_probe_redis_bad_password(fake_redis_server):
+    server = fake_redis_server(password="s3cret")
+    status, detail = _run(health.probe_redis("127.0.0.1", server.port, "wrong"))
+    assert status == ServiceStatus.FAILED
+    assert "WRONGPASS" in detail
+
+def test_probe_redis_refused():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert _run(health.probe_redis("127.0.0.1", port))[0] == ServiceStatus.STOPPED
+
+# =================== gather_status Tests ===================
+def _sleepy(delay, status=ServiceStatus.RUNNING):
+    async def probe():
+        await asyncio.sleep(delay)
+        return status, "ok"
+    return probe
+
+def test_gather_status_runs_concurrently():
+    probes = {name: (f"{name}:1", _sleepy(0.2)) for name in ("postgres", "redis", "otel")}
+    started = time.perf_counter()
+    results = _run(health.gather_status(probes, deadline=2))
+    elapsed = time.perf_counter() - started
+    assert [r.service for r in results] == ["postgres", "redis", "otel"]
+    assert all(r.status == ServiceStatus.RUNNING for r in results)
+    # Bounded by the slowest probe, not the sum (0.6s).
+    assert elapsed < 0.5
+
+def test_gather_status_deadline_marks_timeout():
+    probes = {"fast": ("f:1", _sleepy(0)), "slow": ("s:1", _sleepy(5))}
+    results = _run(health.gather_status(probes, deadline=0.1))
+    by_name = {r.service: r for r in results}
+    assert by_name["fast"].status == ServiceStatus.RUNNING
+    assert by_name["slow"].status == ServiceStatus.TIMEOUT
+    assert by_name["slow"].latency is None
+
+def test_gather_status_probe_exception():
+    async def broken():
+        raise RuntimeError("bad")
+    results = _run(health.gather_status({"redis": ("r:1", broken)}))
+    assert results[0].status == ServiceStatus.UNKNOWN
+    assert "bad" in results[0].detail
+
+def test_gather_status_empty():
+    assert _run(health.gather_status({})) == []
+
+# =================== probe_postgres Tests ===================
+def test_probe_postgres_ready(fake_postgres_server):
+    server = fake_postgres_server()
+    assert _run(health.probe_postgres("127.0.0.1", server.port)) == (ServiceStatus.RUNNING, "accepting connections")
+
+def test_probe_postgres_recovering(fake_postgres_server):
+    server = fake_postgres_server(error=("57P03", "the database system is in recovery mode"))
+    status, detail = _run(health.probe_postgres("127.0.0.1", server.port))
+    assert status == ServiceStatus.RECOVERING
+    assert detail == "the database system is in recovery mode"
+
+def test_probe_postgres_unix_socket(fake_postgres_server):
+    import shutil, tempfile
+    from termux_dev_setup.utils.pgwire import socket_path
+    socket_dir = tempfile.mkdtemp(prefix="pg", dir="/tmp")
+    try:
+        fake_postgres_server(error=("57P03", "the database system is shutting down"), unix_path=socket_path(socket_dir, 5998))
+        assert _run(health.probe_postgres("127.0.0.1", 5998, socket_dir))[0] == ServiceStatus.STOPPING
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+def test_probe_postgres_stopped_and_no_reply(fake_postgres_server):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert _run(health.probe_postgres("127.0.0.1", port))[0] == ServiceStatus.STOPPED
+    server = fake_postgres_server(reply=b"")
+    assert _run(health.probe_postgres("127.0.0.1", server.port))[0] == ServiceStatus.UNKNOWN
+
+# =================== build_probes / status_all Tests ===================
+def test_build_probes_uses_configs(monkeypatch, tmp_path):
+    monkeypatch.setenv("REDIS_PORT", "6380")
+    monkeypatch.setenv("BASE_DIR", str(tmp_path))
+    probes = health.build_probes()
+    assert set(probes) == {"postgres", "redis", "otel"}
+    assert probes["redis"][0] == "127.0.0.1:6380"
+    assert probes["otel"][0] == "127.0.0.1:8888"
+    assert set(health.build_probes(["redis"])) == {"redis"}
+
+def test_build_probes_factories_call_probes():
+    async def fake(host, port):
+        return ServiceStatus.STOPPED, f"{host}:{port}"
+    async def fake_postgres(host, port, socket_dir, user):
+        return ServiceStatus.STOPPED, f"pg {host}:{port} {socket_dir}"
+    async def fake_redis(host, port, password):
+        return ServiceStatus.STOPPED, f"redis {host}:{port}"
+    with patch.object(health, "probe_tcp", side_effect=fake), \
+         patch.object(health, "probe_postgres", side_effect=fake_postgres), \
+         patch.object(health, "probe_redis", side_effect=fake_redis):
+        results = health.check_services(deadline=1)
+    details = {r.service: r.detail for r in results}
+    assert details["postgres"] == "pg 127.0.0.1:5432 /var/run/postgresql"
+    assert details["redis"] == "redis 127.0.0.1:6379"
+    assert details["otel"] == "127.0.0.1:8888"
+
+def test_status_all_prints_table():
+    results = [
+        ProbeResult("postgres", "127.0.0.1:5432", ServiceStatus.RUNNING, 0.001, "port open"),
+        ProbeResult("redis", "127.0.0.1:6379", ServiceStatus.TIMEOUT, None, "no answer"),
+        ProbeResult("otel", "127.0.0.1:8888", ServiceStatus.UNKNOWN, 0.002, "probe failed"),
+    ]
+    with patch.object(health, "check_services", return_value=results) as mock_check, \
+         patch("termux_dev_setup.views.console.print") as mock_print:
+        assert health.status_all(["postgres"], deadline=1.5) == results
+        mock_check.assert_called_once_with(["postgres"], 1.5)
+        assert mock_print.call_count == 3  # step header, table, summary
@@ -34,8 +34,8 @@ def test_cli_interactive_mode(mock_prompt, mock_confirm):
     # We need to mock sys.argv or call the main function with appropriate args
 
     # Let's mock the interactive module functions
-    with patch("termux_dev_setup.cli.interactive.run_wizard", return_value="postgres") as mock_wizard:
-        with patch("termux_dev_setup.cli.interactive.run_service_setup") as mock_run_setup:
+    with patch("termux_dev_setup.interactive.run_wizard", return_value="postgres") as mock_wizard:
+        with patch("termux_dev_setup.interactive.run_service_setup") as mock_run_setup:
 
             # Simulate invoking the CLI with --interactive
             with patch("sys.argv", ["tds", "--interactive"]):
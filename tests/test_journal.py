@@ -0,0 +1,60 @@
+import pytest
+
+from termux_dev_setup.utils.journal import Journal, remove_if_new, snapshot_file
+
+
+def test_journal_round_trip(isolated_state):
+    journal = Journal("postgres").load()
+    assert journal.completed() == []
+    journal.record("install", "done")
+    journal.record("binaries", "unchanged")
+    assert journal.path == isolated_state / "journal" / "postgres.json"
+
+    reloaded = Journal("postgres").load()
+    assert reloaded.completed() == ["install", "binaries"]
+    assert reloaded.steps["binaries"]["status"] == "unchanged"
+
+    reloaded.forget("binaries")
+    reloaded.forget("missing")
+    assert Journal("postgres").load().completed() == ["install"]
+
+    reloaded.clear()
+    reloaded.clear()
+    assert not journal.path.exists()
+
+@pytest.mark.parametrize("content", ["{oops", '{"steps": [1]}', "[]"])
+def test_journal_ignores_bad_files(tmp_path, content):
+    path = tmp_path / "redis.json"
+    path.write_text(content)
+    assert Journal("redis", path).load().completed() == []
+
+def test_snapshot_file_restores_content(tmp_path):
+    conf = tmp_path / "redis.conf"
+    conf.write_text("port 6379\n")
+    undo = snapshot_file(conf)
+    conf.write_text("port 6380\n")
+    undo()
+    assert conf.read_text() == "port 6379\n"
+
+def test_snapshot_file_removes_new_file(tmp_path):
+    conf = tmp_path / "redis.conf"
+    undo = snapshot_file(conf)
+    conf.write_text("port 6379\n")
+    undo()
+    undo()
+    assert not conf.exists()
+
+def test_remove_if_new(tmp_path):
+    data = tmp_path / "data"
+    binary = tmp_path / "otelcol-contrib"
+    undo_data, undo_binary = remove_if_new(data), remove_if_new(binary)
+    (data / "appendonlydir").mkdir(parents=True)
+    binary.write_bytes(b"elf")
+    undo_data()
+    undo_binary()
+    assert not data.exists() and not binary.exists()
+
+def test_remove_if_new_keeps_existing(tmp_path):
+    undo = remove_if_new(tmp_path)
+    undo()
+    assert tmp_path.exists()
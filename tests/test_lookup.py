@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from termux_dev_setup.utils import lookup
+from termux_dev_setup.utils.lookup import PathIndex
+
+
+def make_exe(path):
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    return path
+
+
+@pytest.fixture
+def path_dirs(tmp_path, monkeypatch):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    monkeypatch.setenv("PATH", os.pathsep.join([str(first), str(second), str(tmp_path / "missing")]))
+    return first, second
+
+
+def test_which_finds_first_executable(path_dirs):
+    first, second = path_dirs
+    (first / "tool").write_text("not executable")
+    make_exe(second / "tool")
+    assert PathIndex().which("tool") == str(second / "tool")
+    assert PathIndex().which("absent") is None
+
+def test_which_scans_each_directory_once(path_dirs, monkeypatch):
+    make_exe(path_dirs[0] / "tool")
+    index = PathIndex()
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(lookup.os, "scandir", lambda d: scans.append(d) or real_scandir(d))
+    for _ in range(5):
+        assert index.which("tool")
+    assert len(scans) == 3
+
+def test_which_rebuilds_when_path_changes(path_dirs, tmp_path, monkeypatch):
+    index = PathIndex()
+    assert index.which("tool") is None
+    other = tmp_path / "other"
+    other.mkdir()
+    make_exe(other / "tool")
+    monkeypatch.setenv("PATH", str(other))
+    assert index.which("tool") == str(other / "tool")
+
+def test_miss_picks_up_newly_installed_binary(path_dirs):
+    index = PathIndex()
+    assert index.which("redis-server") is None
+    make_exe(path_dirs[1] / "redis-server")
+    assert index.which("redis-server") == str(path_dirs[1] / "redis-server")
+
+def test_removed_binary_is_not_reported(path_dirs):
+    tool = make_exe(path_dirs[0] / "tool")
+    index = PathIndex()
+    assert index.which("tool")
+    tool.unlink()
+    # A cached hit is re-verified, so a removed binary is not reported either way.
+    assert index.which("tool") is None
+    index.invalidate()
+    assert index.which("tool") is None
+
+def test_which_with_path_separator(tmp_path):
+    tool = make_exe(tmp_path / "tool")
+    assert PathIndex().which(str(tool)) == str(tool)
+    assert PathIndex().which(str(tmp_path / "nope")) is None
+
+def test_module_level_which(path_dirs):
+    make_exe(path_dirs[0] / "tool")
+    lookup.invalidate_path_index()
+    assert lookup.which("tool") == str(path_dirs[0] / "tool")
+
+
+@pytest.fixture
+def accounts(tmp_path, monkeypatch):
+    passwd, group = tmp_path / "passwd", tmp_path / "group"
+    passwd.write_text("root:x:0:0:root:/root:/bin/bash\n# comment\nredis:x:101:103::/var/lib/redis:/usr/sbin/nologin\n")
+    group.write_text("root:x:0:\nredis:x:103:\n")
+    monkeypatch.setattr(lookup, "PASSWD", str(passwd))
+    monkeypatch.setattr(lookup, "GROUP", str(group))
+    return passwd, group
+
+
+def test_user_and_group_exists(accounts):
+    assert lookup.user_exists("redis")
+    assert not lookup.user_exists("postgres")
+    assert not lookup.user_exists("# comment")
+    assert lookup.group_exists("redis")
+    assert not lookup.group_exists("postgres")
+
+def test_user_exists_sees_new_accounts(accounts):
+    passwd, _ = accounts
+    assert not lookup.user_exists("postgres")
+    with open(passwd, "a") as f:
+        f.write("postgres:x:102:104::/var/lib/postgresql:/bin/bash\n")
+    assert lookup.user_exists("postgres")
+
+def test_missing_account_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(lookup, "PASSWD", str(tmp_path / "missing"))
+    assert not lookup.user_exists("root")
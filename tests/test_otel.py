@@ -2,10 +2,14 @@ import pytest
 from unittest.mock import patch, MagicMock, mock_open
 from termux_dev_setup import otel
 from termux_dev_setup.otel import OtelService, manage_otel
+from termux_dev_setup.errors import ChecksumError, DownloadError
 import os
 import shutil
 from pathlib import Path
 
+# Readiness waits run on a virtual clock.
+pytestmark = pytest.mark.usefixtures("fake_clock")
+
 @pytest.fixture
 def mock_env(monkeypatch, tmp_path):
     base_dir = tmp_path
@@ -16,34 +20,98 @@ def mock_env(monkeypatch, tmp_path):
     return base_dir
 
 @pytest.fixture(autouse=True)
-def mock_external_libs(monkeypatch):
+def mock_external_libs(monkeypatch, tmp_path):
     # Mocking these on the module so that the code uses our mocks
-    monkeypatch.setattr(otel, 'urllib', MagicMock())
-    monkeypatch.setattr(otel, 'tarfile', MagicMock())
-    monkeypatch.setattr(otel, 'shutil', MagicMock())
-    monkeypatch.setattr(otel.os, 'walk', MagicMock(return_value=[("/tmp", [], ["otelcol-contrib"])]))
+    monkeypatch.setattr(otel, 'download_segmented', MagicMock(return_value="correct_sha256"))
+    cache = MagicMock()
+    cache.return_value.lookup.return_value = None
+    cache.return_value.download_path.side_effect = lambda name: tmp_path / "partial" / name
+    monkeypatch.setattr(otel, 'ArtifactCache', cache)
+    monkeypatch.setattr(otel, 'extract_member', MagicMock(return_value=True))
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
 @patch("termux_dev_setup.otel.run_command")
 @patch("builtins.open", new_callable=mock_open)
-@patch("termux_dev_setup.otel.hashlib.sha256")
 @patch("pathlib.Path.chmod")
-def test_setup_otel_success_flow(mock_chmod, mock_sha, mock_open_obj, mock_run, mock_check, mock_env, monkeypatch):
-    mock_sha.return_value.hexdigest.return_value = "correct_sha256"
-    monkeypatch.setattr(otel.shutil, "move", MagicMock())
-
+def test_setup_otel_success_flow(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env, monkeypatch):
     otel.setup_otel()
 
-    mock_run.assert_any_call("apt install -y wget curl tar ca-certificates coreutils")
-    otel.urllib.request.urlretrieve.assert_called()
-    otel.tarfile.open.assert_called()
+    mock_run.assert_any_call(["apt", "install", "-y", "wget", "curl", "tar", "ca-certificates", "coreutils"])
+    url, dest = otel.download_segmented.call_args[0]
+    assert "/download/v2.0.1/otelcol-contrib_2.0.1_linux_" in url
+    assert dest.name == url.rsplit("/", 1)[1]
+    assert otel.download_segmented.call_args[1] == {"expected_sha256": "correct_sha256"}
+    archive, member, target = otel.extract_member.call_args[0]
+    assert (member, target) == ("otelcol-contrib", mock_env / "otelcol-contrib")
 
     otel_bin = str(mock_env / "otelcol-contrib")
     otel_conf = str(mock_env / "otel-config.yaml")
-    mock_run.assert_any_call(f"'{otel_bin}' --config '{otel_conf}' validate")
+    mock_run.assert_any_call([otel_bin, "--config", otel_conf, "validate"])
 
     assert (mock_env / ".bootstrap_done_otel_only").exists()
 
+@patch("termux_dev_setup.otel.check_command", return_value=True)
+@patch("termux_dev_setup.otel.run_command")
+@patch("builtins.open", new_callable=mock_open)
+@patch("pathlib.Path.chmod")
+def test_setup_otel_stores_download_in_cache(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env):
+    otel.setup_otel()
+
+    cache = otel.ArtifactCache.return_value
+    name, version, arch, src, digest = cache.store.call_args[0]
+    assert (name, version, digest) == ("otelcol-contrib", "2.0.1", "correct_sha256")
+    assert src == otel.download_segmented.call_args[0][1]
+    assert otel.extract_member.call_args[0][0] == cache.store.return_value
+
+@patch("termux_dev_setup.otel.check_command", return_value=True)
+@patch("termux_dev_setup.otel.run_command")
+@patch("builtins.open", new_callable=mock_open)
+@patch("pathlib.Path.chmod")
+def test_setup_otel_downloads_to_tempdir_when_cache_unwritable(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env):
+    otel.ArtifactCache.return_value.download_path.side_effect = OSError("read-only")
+
+    otel.setup_otel()
+
+    dest = otel.download_segmented.call_args[0][1]
+    assert dest.parent.name.startswith("tmp") and dest.name.startswith("otelcol-contrib_2.0.1_")
+
+@patch("termux_dev_setup.otel.check_command", return_value=True)
+@patch("termux_dev_setup.otel.run_command")
+@patch("builtins.open", new_callable=mock_open)
+@patch("pathlib.Path.chmod")
+def test_setup_otel_uses_cached_archive(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env):
+    cache = otel.ArtifactCache.return_value
+    cache.lookup.return_value = Path("/cache/abc-otelcol.tar.gz")
+
+    otel.setup_otel()
+
+    assert cache.lookup.call_args[0][3] == "correct_sha256"
+    otel.download_segmented.assert_not_called()
+    cache.store.assert_not_called()
+    assert otel.extract_member.call_args[0][0] == Path("/cache/abc-otelcol.tar.gz")
+
+@patch("termux_dev_setup.otel.check_command", return_value=True)
+@patch("termux_dev_setup.otel.run_command")
+@patch("builtins.open", new_callable=mock_open)
+@patch("pathlib.Path.chmod")
+def test_setup_otel_cache_store_failure_is_not_fatal(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env):
+    otel.ArtifactCache.return_value.store.side_effect = OSError("read-only")
+
+    with patch("termux_dev_setup.otel.warning") as mock_warning:
+        otel.setup_otel()
+
+    assert "read-only" in mock_warning.call_args[0][0]
+    assert (mock_env / ".bootstrap_done_otel_only").exists()
+
+@patch("termux_dev_setup.otel.check_command", return_value=True)
+@patch("termux_dev_setup.otel.run_command")
+@patch("builtins.open", new_callable=mock_open)
+@patch("pathlib.Path.chmod")
+def test_setup_otel_packages_preinstalled(mock_chmod, mock_open_obj, mock_run, mock_check, mock_env):
+    otel.setup_otel(packages_installed=True)
+    assert not any(c.args[0][:2] == ["apt", "install"] for c in mock_run.call_args_list)
+    assert (mock_env / ".bootstrap_done_otel_only").exists()
+
 def test_setup_otel_already_done(mock_env):
     (mock_env / ".bootstrap_done_otel_only").touch()
     with patch("termux_dev_setup.otel.success") as mock_success:
@@ -56,13 +124,9 @@ def test_setup_otel_force_update(mock_run, mock_env, monkeypatch):
     (mock_env / ".bootstrap_done_otel_only").touch()
 
     with patch("termux_dev_setup.otel.check_command", return_value=True), \
-         patch("termux_dev_setup.otel.hashlib.sha256") as mock_sha, \
          patch("builtins.open", mock_open(read_data=b'')), \
          patch("pathlib.Path.chmod"):
 
-        mock_sha.return_value.hexdigest.return_value = "correct_sha256"
-        monkeypatch.setattr(otel.shutil, "move", MagicMock())
-
         otel.setup_otel()
         assert mock_run.call_count > 0
 
@@ -73,11 +137,13 @@ def test_setup_otel_no_apt(mock_check, mock_env):
         mock_error.assert_called_with("apt not found. Ensure you are inside an Ubuntu/Debian proot-distro.")
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
-@patch("termux_dev_setup.otel.run_command", side_effect=[None, Exception("Install failed")])
+@patch("termux_dev_setup.otel.run_command", side_effect=[Exception("Install failed")])
 def test_setup_otel_dep_install_fails(mock_run, mock_check, mock_env):
     with patch("termux_dev_setup.otel.error") as mock_error:
         otel.setup_otel()
         mock_error.assert_called_with("Failed to install dependencies.")
+    # The HTTPS download waits for ca-certificates.
+    otel.download_segmented.assert_not_called()
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
 @patch("platform.machine", return_value="unknown_arch")
@@ -86,18 +152,14 @@ def test_setup_otel_unknown_arch_warning(mock_machine, mock_check, mock_env, mon
     with patch("termux_dev_setup.otel.warning") as mock_warning, \
          patch("termux_dev_setup.otel.run_command"), \
          patch("builtins.open", mock_open(read_data=b'')), \
-         patch("termux_dev_setup.otel.hashlib.sha256") as mock_sha, \
          patch("pathlib.Path.chmod"):
-
-        mock_sha.return_value.hexdigest.return_value = "correct_sha256"
-        monkeypatch.setattr(otel.shutil, "move", MagicMock())
         otel.setup_otel()
         mock_warning.assert_called_with("Unknown arch 'unknown_arch' - defaulting to linux_amd64")
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
 def test_setup_otel_download_fails(mock_check, mock_env):
     # Patch the mock that is on the module
-    otel.urllib.request.urlretrieve.side_effect = Exception("Download error")
+    otel.download_segmented.side_effect = DownloadError("Download error")
 
     with patch("termux_dev_setup.otel.error") as mock_error, \
          patch("termux_dev_setup.otel.run_command"):
@@ -105,13 +167,8 @@ def test_setup_otel_download_fails(mock_check, mock_env):
         mock_error.assert_called_with("Download failed: Download error", exit_code=4)
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
-@patch("builtins.open", new_callable=mock_open, read_data=b"file content")
-@patch("termux_dev_setup.otel.hashlib.sha256")
-def test_setup_otel_checksum_mismatch(mock_sha, mock_open, mock_check, mock_env):
-    mock_sha.return_value.hexdigest.return_value = "wrong_sha256"
-
-    # We need to make sure urlretrieve doesn't fail (it's mocked by fixture)
-    otel.urllib.request.urlretrieve.side_effect = None
+def test_setup_otel_checksum_mismatch(mock_check, mock_env):
+    otel.download_segmented.side_effect = ChecksumError("correct_sha256", "wrong_sha256")
 
     with patch("termux_dev_setup.otel.error") as mock_error, \
          patch("termux_dev_setup.otel.run_command"):
@@ -120,47 +177,33 @@ def test_setup_otel_checksum_mismatch(mock_sha, mock_open, mock_check, mock_env)
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
 def test_setup_otel_extraction_fails(mock_check, mock_env, monkeypatch):
-    otel.tarfile.open.side_effect = Exception("Tar error")
+    otel.extract_member.side_effect = Exception("Tar error")
 
     with patch("termux_dev_setup.otel.error") as mock_error, \
          patch("termux_dev_setup.otel.run_command"), \
-         patch("builtins.open", mock_open(read_data=b'')), \
-         patch("termux_dev_setup.otel.hashlib.sha256") as mock_sha:
+         patch("builtins.open", mock_open(read_data=b'')):
 
-        mock_sha.return_value.hexdigest.return_value = "correct_sha256"
         otel.setup_otel()
         mock_error.assert_called_with("Extraction failed: Tar error", exit_code=5)
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
 def test_setup_otel_binary_not_found(mock_check, mock_env, monkeypatch):
-    # Reset side effects from other tests
-    otel.tarfile.open.side_effect = None
-    # Configure os.walk mock
-    otel.os.walk.return_value = [("/tmp", [], ["not_the_binary"])]
+    otel.extract_member.return_value = False
 
     with patch("termux_dev_setup.otel.error") as mock_error, \
          patch("termux_dev_setup.otel.run_command"), \
-         patch("builtins.open", mock_open(read_data=b'')), \
-         patch("termux_dev_setup.otel.hashlib.sha256") as mock_sha:
+         patch("builtins.open", mock_open(read_data=b'')):
 
-        mock_sha.return_value.hexdigest.return_value = "correct_sha256"
         otel.setup_otel()
         mock_error.assert_called_with("Could not locate otelcol-contrib inside archive.")
 
 @patch("termux_dev_setup.otel.check_command", return_value=True)
-@patch("termux_dev_setup.otel.run_command", side_effect=[None, None, Exception("Validation failed")])
+@patch("termux_dev_setup.otel.run_command", side_effect=[None, Exception("Validation failed")])
 @patch("pathlib.Path.chmod")
 def test_setup_otel_validation_fails(mock_chmod, mock_run, mock_check, mock_env, monkeypatch):
-    # mocks: apt update, apt install, validate
+    # mocks: apt install, validate
     with patch("termux_dev_setup.otel.error") as mock_error, \
-         patch("builtins.open", mock_open(read_data=b'')), \
-         patch("termux_dev_setup.otel.hashlib.sha256") as mock_sha:
-
-        monkeypatch.setattr(otel.shutil, "move", MagicMock())
-        mock_sha.return_value.hexdigest.return_value = "correct_sha256"
-        otel.tarfile.open.side_effect = None
-        # Ensure os.walk finds the binary (reset from previous test)
-        otel.os.walk.return_value = [("/tmp", [], ["otelcol-contrib"])]
+         patch("builtins.open", mock_open(read_data=b'')):
 
         otel.setup_otel()
         mock_error.assert_called_with("Config validation failed", exit_code=6)
@@ -209,19 +252,22 @@ def test_otel_service_start_missing_config(mock_exists, mock_config_class):
 
 @patch("termux_dev_setup.otel.OtelConfig")
 @patch("pathlib.Path.exists", return_value=True)
-@patch("termux_dev_setup.otel.run_command")
-def test_otel_service_start_success(mock_run, mock_exists, mock_config_class):
-    with patch.object(OtelService, 'is_running', side_effect=[False, True]), \
+@patch("termux_dev_setup.otel.process.spawn_detached", return_value=4321)
+def test_otel_service_start_success(mock_spawn, mock_exists, mock_config_class):
+    config = mock_config_class.return_value
+    config.otel_bin, config.config_path = "/home/otelcol-contrib", "/home/otel-config.yaml"
+    with patch.object(OtelService, 'is_running', side_effect=[False, True, True]), \
          patch("termux_dev_setup.otel.success") as mock_success:
         service = OtelService()
         service.start()
-        mock_success.assert_called_with("OpenTelemetry Collector started successfully.")
+        mock_success.assert_called_with("OpenTelemetry Collector started successfully (pid 4321).")
+    mock_spawn.assert_called_once_with(["/home/otelcol-contrib", "--config", "/home/otel-config.yaml"], config.log_file, config.pid_file)
 
 @patch("termux_dev_setup.otel.OtelConfig")
 @patch("pathlib.Path.exists", return_value=True)
-@patch("termux_dev_setup.otel.run_command")
-@patch("time.sleep")
-def test_otel_service_start_timeout(mock_sleep, mock_run, mock_exists, mock_config_class):
+@patch("termux_dev_setup.otel.process.spawn_detached", return_value=4321)
+@patch("termux_dev_setup.otel.process.is_alive", return_value=True)
+def test_otel_service_start_timeout(mock_alive, mock_spawn, mock_exists, mock_config_class):
     with patch.object(OtelService, 'is_running', return_value=False), \
          patch("termux_dev_setup.otel.error") as mock_error:
         service = OtelService()
@@ -230,8 +276,23 @@ def test_otel_service_start_timeout(mock_sleep, mock_run, mock_exists, mock_conf
 
 @patch("termux_dev_setup.otel.OtelConfig")
 @patch("pathlib.Path.exists", return_value=True)
-@patch("termux_dev_setup.otel.run_command", side_effect=Exception("Start failed"))
-def test_otel_service_start_exception(mock_run, mock_exists, mock_config_class):
+@patch("termux_dev_setup.otel.process.spawn_detached", return_value=4321)
+@patch("termux_dev_setup.otel.process.is_alive", return_value=False)
+@patch("termux_dev_setup.otel.process.remove_pid")
+def test_otel_service_start_exits_early(mock_remove, mock_alive, mock_spawn, mock_exists, mock_config_class, fake_clock):
+    mock_config_class.return_value.log_file = "/home/otel.log"
+    with patch.object(OtelService, 'is_running', return_value=False), \
+         patch("termux_dev_setup.otel.error") as mock_error:
+        OtelService().start()
+        mock_error.assert_called_with("OpenTelemetry Collector exited during startup. Check /home/otel.log.")
+    # A dead collector ends the wait at once instead of running into the timeout.
+    assert fake_clock.sleeps == []
+    mock_remove.assert_called_once()
+
+@patch("termux_dev_setup.otel.OtelConfig")
+@patch("pathlib.Path.exists", return_value=True)
+@patch("termux_dev_setup.otel.process.spawn_detached", side_effect=OSError("Start failed"))
+def test_otel_service_start_exception(mock_spawn, mock_exists, mock_config_class):
     with patch.object(OtelService, 'is_running', return_value=False), \
          patch("termux_dev_setup.otel.error") as mock_error:
         service = OtelService()
@@ -240,48 +301,65 @@ def test_otel_service_start_exception(mock_run, mock_exists, mock_config_class):
 
 @patch("termux_dev_setup.otel.OtelConfig")
 def test_otel_service_stop_not_running(mock_config_class):
-    with patch.object(OtelService, 'is_running', return_value=False), \
+    with patch.object(OtelService, 'pid', return_value=None), \
+         patch.object(OtelService, 'is_running', return_value=False), \
          patch("termux_dev_setup.otel.success") as mock_success:
         service = OtelService()
         service.stop()
         mock_success.assert_called_with("OpenTelemetry Collector stopped.")
 
 @patch("termux_dev_setup.otel.OtelConfig")
-@patch("termux_dev_setup.otel.run_command")
-@patch("time.sleep")
-def test_otel_service_stop_success(mock_sleep, mock_run, mock_config_class):
-    with patch.object(OtelService, 'is_running', side_effect=[True, False]), \
+@patch("termux_dev_setup.otel.process.send_signal")
+def test_otel_service_stop_unmanaged(mock_signal, mock_config_class):
+    """A collector without a live PID file is left alone instead of pkill-ing by name."""
+    with patch.object(OtelService, 'pid', return_value=None), \
+         patch.object(OtelService, 'is_running', return_value=True), \
+         patch("termux_dev_setup.otel.warning") as mock_warn:
+        OtelService().stop()
+        assert "was not started by tds" in mock_warn.call_args[0][0]
+    mock_signal.assert_not_called()
+
+@patch("termux_dev_setup.otel.OtelConfig")
+@patch("termux_dev_setup.otel.process.send_signal")
+@patch("termux_dev_setup.otel.process.is_alive", side_effect=[True, False])
+@patch("termux_dev_setup.otel.process.remove_pid")
+def test_otel_service_stop_success(mock_remove, mock_alive, mock_signal, mock_config_class):
+    with patch.object(OtelService, 'pid', return_value=4321), \
          patch("termux_dev_setup.otel.success") as mock_success:
         service = OtelService()
         service.stop()
         mock_success.assert_called_with("OpenTelemetry Collector stopped.")
+    mock_signal.assert_called_once_with(4321, otel.signal.SIGTERM)
+    mock_remove.assert_called_once_with(mock_config_class.return_value.pid_file)
 
 @patch("termux_dev_setup.otel.OtelConfig")
-@patch("termux_dev_setup.otel.run_command")
-@patch("time.sleep")
-def test_otel_service_stop_force_kill(mock_sleep, mock_run, mock_config_class):
-    # is_running returns True for 10 loops, then True again (after force kill attempt), then False
-    side_effect = [True] * 11 + [False]
-    with patch.object(OtelService, 'is_running', side_effect=side_effect), \
+@patch("termux_dev_setup.otel.process.send_signal")
+@patch("termux_dev_setup.otel.process.remove_pid")
+def test_otel_service_stop_force_kill(mock_remove, mock_signal, mock_config_class):
+    # The collector ignores SIGTERM and only goes away after SIGKILL
+    def is_alive(pid):
+        return not any(c.args[1] == otel.signal.SIGKILL for c in mock_signal.call_args_list)
+    with patch.object(OtelService, 'pid', return_value=4321), \
+         patch("termux_dev_setup.otel.process.is_alive", side_effect=is_alive), \
          patch("termux_dev_setup.otel.success") as mock_success:
         service = OtelService()
         service.stop()
         mock_success.assert_called_with("OpenTelemetry Collector stopped (force kill).")
 
 @patch("termux_dev_setup.otel.OtelConfig")
-@patch("termux_dev_setup.otel.run_command")
-@patch("time.sleep")
-def test_otel_service_stop_force_kill_fail(mock_sleep, mock_run, mock_config_class):
-    with patch.object(OtelService, 'is_running', return_value=True), \
+@patch("termux_dev_setup.otel.process.send_signal")
+@patch("termux_dev_setup.otel.process.is_alive", return_value=True)
+def test_otel_service_stop_force_kill_fail(mock_alive, mock_signal, mock_config_class):
+    with patch.object(OtelService, 'pid', return_value=4321), \
          patch("termux_dev_setup.otel.warning") as mock_warn:
         service = OtelService()
         service.stop()
         mock_warn.assert_called_with("Failed to stop OpenTelemetry Collector.")
 
 @patch("termux_dev_setup.otel.OtelConfig")
-@patch("termux_dev_setup.otel.run_command", side_effect=Exception("Stop failed"))
-def test_otel_service_stop_exception(mock_run, mock_config_class):
-    with patch.object(OtelService, 'is_running', return_value=True), \
+@patch("termux_dev_setup.otel.process.send_signal", side_effect=PermissionError("Stop failed"))
+def test_otel_service_stop_exception(mock_signal, mock_config_class):
+    with patch.object(OtelService, 'pid', return_value=4321), \
          patch("termux_dev_setup.otel.error") as mock_error:
         service = OtelService()
         service.stop()
@@ -312,8 +390,7 @@ def test_is_port_open(mock_create_conn):
 
 def test_otel_service_restart():
     with patch.object(OtelService, 'stop') as mock_stop, \
-         patch.object(OtelService, 'start') as mock_start, \
-         patch("time.sleep"):
+         patch.object(OtelService, 'start') as mock_start:
         service = OtelService()
         service.restart()
         mock_stop.assert_called_once()
@@ -0,0 +1,80 @@
+import shutil
+import socket
+import struct
+import tempfile
+import pytest
+from termux_dev_setup.utils import pgwire
+from termux_dev_setup.service_status import ServiceStatus
+
+@pytest.fixture
+def socket_dir():
+    # tmp_path can exceed the ~108 byte AF_UNIX path limit.
+    path = tempfile.mkdtemp(prefix="pg", dir="/tmp")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# =================== Encoding / Classification Tests ===================
+def test_startup_message():
+    msg = pgwire.startup_message("alice")
+    length, version = struct.unpack("!ii", msg[:8])
+    assert length == len(msg)
+    assert version == 196608
+    assert msg[8:] == b"user\0alice\0database\0postgres\0\0"
+
+def test_parse_error_fields():
+    assert pgwire.parse_error_fields(b"SFATAL\0C57P03\0Mstarting\0\0") == {"S": "FATAL", "C": "57P03", "M": "starting"}
+
+@pytest.mark.parametrize("message, expected", [
+    ("the database system is starting up", ServiceStatus.STARTING),
+    ("the database system is shutting down", ServiceStatus.STOPPING),
+    ("the database system is in recovery mode", ServiceStatus.RECOVERING),
+    ("the database system is not yet accepting connections", ServiceStatus.RECOVERING),
+    ("something new", ServiceStatus.STARTING),
+])
+def test_classify_cannot_connect_now(message, expected):
+    payload = f"SFATAL\0C57P03\0M{message}\0\0".encode()
+    assert pgwire.classify_reply(b"E", payload) == (expected, message)
+
+def test_classify_other_replies():
+    assert pgwire.classify_reply(b"R", b"\0\0\0\x03")[0] == ServiceStatus.RUNNING
+    # An auth/pg_hba rejection still means the server accepts connections.
+    hba = b"SFATAL\0C28000\0Mno pg_hba.conf entry\0\0"
+    assert pgwire.classify_reply(b"E", hba)[0] == ServiceStatus.RUNNING
+    assert pgwire.classify_reply(b"N", b"")[0] == ServiceStatus.UNKNOWN
+
+# =================== probe Tests ===================
+def test_probe_tcp_ready(fake_postgres_server):
+    server = fake_postgres_server()
+    assert pgwire.probe("127.0.0.1", server.port, user="bob") == (ServiceStatus.RUNNING, "accepting connections")
+    assert b"user\0bob\0" in server.startups[0]
+
+def test_probe_tcp_starting(fake_postgres_server):
+    server = fake_postgres_server(error=("57P03", "the database system is starting up"))
+    assert pgwire.probe("127.0.0.1", server.port) == (ServiceStatus.STARTING, "the database system is starting up")
+
+def test_probe_stopped():
+    assert pgwire.probe("127.0.0.1", _free_port())[0] == ServiceStatus.STOPPED
+
+def test_probe_prefers_unix_socket(fake_postgres_server, socket_dir):
+    server = fake_postgres_server(error=("57P03", "the database system is in recovery mode"), unix_path=pgwire.socket_path(socket_dir, 5999))
+    status, _ = pgwire.probe("127.0.0.1", 5999, socket_dir=socket_dir)
+    assert status == ServiceStatus.RECOVERING
+    assert len(server.startups) == 1
+
+def test_probe_stale_unix_socket_falls_back_to_tcp(fake_postgres_server, socket_dir):
+    tcp = fake_postgres_server()
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(pgwire.socket_path(socket_dir, tcp.port))
+    stale.close()
+    assert pgwire.probe("127.0.0.1", tcp.port, socket_dir=socket_dir)[0] == ServiceStatus.RUNNING
+
+def test_probe_connection_closed(fake_postgres_server):
+    server = fake_postgres_server(reply=b"")
+    status, detail = pgwire.probe("127.0.0.1", server.port)
+    assert status == ServiceStatus.UNKNOWN
+    assert "closed" in detail
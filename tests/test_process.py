@@ -0,0 +1,90 @@
+import os
+import signal
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+from termux_dev_setup.utils import process
+from termux_dev_setup.utils.wait import wait_until
+
+@pytest.fixture
+def sleeper():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    yield proc
+    proc.kill()
+    proc.wait()
+
+# =================== PID file Tests ===================
+def test_pid_file_roundtrip(tmp_path):
+    pid_file = tmp_path / "run" / "svc.pid"
+    assert process.read_pid(pid_file) is None
+    process.write_pid(pid_file, 1234)
+    assert pid_file.read_text() == "1234\n"
+    assert process.read_pid(pid_file) == 1234
+    process.remove_pid(pid_file)
+    assert not pid_file.exists()
+    process.remove_pid(pid_file)  # already gone: no error
+
+@pytest.mark.parametrize("content", ["", "abc\n", "-5\n", "0"])
+def test_read_pid_malformed(tmp_path, content):
+    pid_file = tmp_path / "svc.pid"
+    pid_file.write_text(content)
+    assert process.read_pid(pid_file) is None
+
+# =================== Liveness Tests ===================
+def test_is_alive(sleeper):
+    assert process.is_alive(os.getpid())
+    assert process.is_alive(sleeper.pid)
+    assert not process.is_alive(0)
+    sleeper.kill()
+    sleeper.wait()
+    assert not process.is_alive(sleeper.pid)
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_is_alive_ignores_zombies(sleeper):
+    sleeper.kill()
+    os.waitid(os.P_PID, sleeper.pid, os.WEXITED | os.WNOWAIT)  # exited, not yet reaped
+    assert not process.is_alive(sleeper.pid)
+
+def test_is_alive_without_proc(monkeypatch, tmp_path):
+    monkeypatch.setattr(process, "PROC", tmp_path / "no-proc")
+    assert process.is_alive(os.getpid())
+    with patch("os.kill", side_effect=ProcessLookupError):
+        assert not process.is_alive(99999)
+    with patch("os.kill", side_effect=PermissionError):
+        assert process.is_alive(1)
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_running_pid_checks_command_line(tmp_path, sleeper):
+    pid_file = tmp_path / "svc.pid"
+    process.write_pid(pid_file, sleeper.pid)
+    # Some kernels publish the new command line a moment after exec.
+    assert wait_until(lambda: process.cmdline(sleeper.pid), timeout=5)
+    assert process.cmdline(sleeper.pid)[0] == sys.executable
+    assert process.running_pid(pid_file) == sleeper.pid
+    assert process.running_pid(pid_file, "time.sleep") == sleeper.pid
+    # A recycled PID now running something else is not ours.
+    assert process.running_pid(pid_file, "redis-server") is None
+
+def test_running_pid_stale(tmp_path, sleeper):
+    pid_file = tmp_path / "svc.pid"
+    sleeper.kill()
+    sleeper.wait()
+    process.write_pid(pid_file, sleeper.pid)
+    assert process.running_pid(pid_file) is None
+    assert process.cmdline(sleeper.pid) is None
+
+def test_send_signal(sleeper):
+    assert process.send_signal(sleeper.pid, signal.SIGTERM)
+    sleeper.wait()
+    assert not process.send_signal(sleeper.pid, signal.SIGTERM)
+
+# =================== spawn_detached Tests ===================
+def test_spawn_detached(tmp_path):
+    log_file = tmp_path / "svc.log"
+    log_file.write_text("old run\n")
+    pid_file = tmp_path / "svc.pid"
+    pid = process.spawn_detached([sys.executable, "-c", "print('hello')"], log_file, pid_file)
+    assert process.read_pid(pid_file) == pid
+    os.waitpid(pid, 0)
+    assert log_file.read_text() == "hello\n"
@@ -0,0 +1,84 @@
+import socket
+import pytest
+from termux_dev_setup.utils import resp
+
+@pytest.fixture
+def fake_redis(fake_redis_server):
+    return fake_redis_server()
+
+@pytest.fixture
+def fake_redis_auth(fake_redis_server):
+    return fake_redis_server(password="s3cret")
+
+# =================== Encoding / Parsing Tests ===================
+def test_encode_command():
+    assert resp.encode_command("AUTH", "pä") == b"*2\r\n$4\r\nAUTH\r\n$3\r\np\xc3\xa4\r\n"
+    assert resp.encode_command("INCRBY", b"k", 5) == b"*3\r\n$6\r\nINCRBY\r\n$1\r\nk\r\n$1\r\n5\r\n"
+
+def test_parse_info():
+    assert resp.parse_info("# Server\r\nredis_version:7.2.4\r\n\r\nrole:master\r\nbad line\r\n") == {
+        "redis_version": "7.2.4",
+        "role": "master",
+    }
+
+class _Reader:
+    def __init__(self, data):
+        import io
+        self._file = io.BytesIO(data)
+
+@pytest.mark.parametrize("data, expected", [
+    (b":12\r\n", 12),
+    (b"$-1\r\n", None),
+    (b"*-1\r\n", None),
+    (b"*2\r\n+a\r\n$1\r\nb\r\n", ["a", "b"]),
+])
+def test_read_reply_types(data, expected):
+    client = resp.RespClient()
+    client._file = _Reader(data)._file
+    assert client.read_reply() == expected
+
+@pytest.mark.parametrize("data, exc", [
+    (b"", ConnectionError),
+    (b"$5\r\nab", ConnectionError),
+    (b"!oops\r\n", resp.RespError),
+])
+def test_read_reply_errors(data, exc):
+    client = resp.RespClient()
+    client._file = _Reader(data)._file
+    with pytest.raises(exc):
+        client.read_reply()
+
+# =================== Round-trip Tests ===================
+def test_ping(fake_redis):
+    assert resp.ping("127.0.0.1", fake_redis.port) is True
+
+def test_ping_with_password(fake_redis_auth):
+    assert resp.ping("127.0.0.1", fake_redis_auth.port, "s3cret") is True
+    assert fake_redis_auth.commands[0] == ["AUTH", "s3cret"]
+
+def test_ping_wrong_password(fake_redis_auth):
+    assert resp.ping("127.0.0.1", fake_redis_auth.port, "nope") is False
+
+def test_ping_missing_password(fake_redis_auth):
+    assert resp.ping("127.0.0.1", fake_redis_auth.port) is False
+
+def test_ping_refused():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert resp.ping("127.0.0.1", port) is False
+
+def test_info(fake_redis):
+    details = resp.info("127.0.0.1", fake_redis.port, section="server")
+    assert details["redis_version"] == "7.2.4"
+    assert fake_redis.commands[-1] == ["INFO", "server"]
+    resp.info("127.0.0.1", fake_redis.port)
+    assert fake_redis.commands[-1] == ["INFO"]
+
+def test_shutdown(fake_redis):
+    resp.shutdown("127.0.0.1", fake_redis.port)
+    assert fake_redis.commands[-1] == ["SHUTDOWN"]
+
+def test_shutdown_error_reply(fake_redis_auth):
+    with pytest.raises(resp.RespError):
+        resp.shutdown("127.0.0.1", fake_redis_auth.port, "nope")
@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from termux_dev_setup import stack
+from termux_dev_setup.errors import TDSError
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """Stand-in service modules, recording the order of apt and setup calls."""
+    calls = []
+    modules = {}
+
+    def make(name, packages):
+        module = MagicMock()
+        module.apt_packages.return_value = packages
+        getattr(module, f"setup_{name}").side_effect = lambda **kw: calls.append((name, kw))
+        modules[f"termux_dev_setup.{name}"] = module
+        return module
+
+    make("postgres", ["postgresql", "postgresql-contrib", "util-linux"])
+    make("redis", ["redis-server"])
+    make("otel", ["wget", "curl", "tar", "ca-certificates", "coreutils"])
+    make("gcloud", ["apt-transport-https", "ca-certificates", "gnupg", "curl", "gnupg2", "lsb-release"])
+    monkeypatch.setattr(stack.importlib, "import_module", modules.__getitem__)
+    monkeypatch.setattr(stack, "check_command", lambda cmd: True)
+    return calls
+
+
+def test_setup_services_batches_one_apt_transaction(services, fake_apt):
+    stack.setup_services(["postgres", "redis", "otel", "redis"])
+
+    assert fake_apt.call_args_list[0].args == (["apt", "update"],)
+    fake_apt.assert_called_with(
+        ["apt", "install", "-y", "postgresql", "postgresql-contrib", "util-linux", "redis-server",
+         "wget", "curl", "tar", "ca-certificates", "coreutils"],
+        stream=True,
+    )
+    assert fake_apt.call_count == 2
+    assert services == [(name, {"packages_installed": True}) for name in ("postgres", "redis", "otel")]
+
+def test_setup_services_dedupes_shared_packages(services, fake_apt):
+    stack.setup_services(["otel", "gcloud"])
+    installed = fake_apt.call_args.args[0][3:]
+    assert installed.count("curl") == 1 and installed.count("ca-certificates") == 1
+
+def test_setup_services_nothing_to_install(services, fake_apt):
+    stack.importlib.import_module("termux_dev_setup.redis").apt_packages.return_value = []
+    stack.setup_services(["redis"])
+    fake_apt.assert_not_called()
+    assert services == [("redis", {"packages_installed": True})]
+
+def test_setup_services_continues_after_failure(services, fake_apt):
+    module = stack.importlib.import_module("termux_dev_setup.postgres")
+    module.setup_postgres.side_effect = TDSError("initdb failed", exit_code=1)
+
+    with pytest.raises(TDSError) as excinfo:
+        stack.setup_services(["postgres", "redis"])
+
+    assert "postgres" in str(excinfo.value)
+    assert services == [("redis", {"packages_installed": True})]
+
+def test_setup_services_install_failure_stops(services, fake_apt):
+    fake_apt.side_effect = [MagicMock(), TDSError("apt install failed", exit_code=100)]
+    with pytest.raises(TDSError):
+        stack.setup_services(["postgres", "redis"])
+    assert services == []
+
+def test_setup_services_requires_apt(services, fake_apt, monkeypatch):
+    monkeypatch.setattr(stack, "check_command", lambda cmd: False)
+    mock_error = MagicMock()
+    monkeypatch.setattr(stack, "error", mock_error)
+    stack.setup_services(["postgres", "redis"])
+    mock_error.assert_called_once_with("apt not found. Ensure you are inside an Ubuntu/Debian proot-distro.")
+    assert services == [] and not fake_apt.called
+
+# =================== Per-service package lists ===================
+def test_service_apt_packages():
+    from termux_dev_setup import postgres, redis, otel, gcloud
+
+    assert postgres.apt_packages() == ["postgresql", "postgresql-contrib", "util-linux"]
+    assert postgres.apt_packages("15") == ["postgresql-15", "util-linux"]
+    with patch("termux_dev_setup.redis.check_command", return_value=False):
+        assert redis.apt_packages() == ["redis-server"]
+    with patch("termux_dev_setup.redis.check_command", return_value=True):
+        assert redis.apt_packages() == []
+    assert otel.apt_packages() == ["wget", "curl", "tar", "ca-certificates", "coreutils"]
+    assert gcloud.apt_packages() == gcloud.PREREQUISITES
@@ -0,0 +1,320 @@
+import threading
+import time
+
+import pytest
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import tasks
+from termux_dev_setup.utils.journal import Journal
+from termux_dev_setup.utils.tasks import DONE, FAILED, SKIPPED, TaskGraph
+
+
+class Tracker:
+    """Records start order and the peak number of tasks running at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.order = []
+        self.running = 0
+        self.peak = 0
+
+    def task(self, name, hold=0.02, outcome=None):
+        def run():
+            with self.lock:
+                self.order.append(name)
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(hold)
+            with self.lock:
+                self.running -= 1
+            return outcome
+        return run
+
+
+def test_dependencies_run_first():
+    tracker = Tracker()
+    graph = TaskGraph("t")
+    graph.add("a", tracker.task("a"))
+    graph.add("b", tracker.task("b"), deps=("a",))
+    graph.add("c", tracker.task("c"), deps=("b",))
+
+    results = graph.run(progress=False)
+
+    assert tracker.order == ["a", "b", "c"]
+    assert [r.status for r in results.values()] == [DONE, DONE, DONE]
+    assert graph.ok
+
+def test_independent_tasks_overlap():
+    both_started = threading.Barrier(2, timeout=2)
+    graph = TaskGraph("t")
+    graph.add("download", both_started.wait, resources=("network",))
+    graph.add("apt", both_started.wait, resources=("apt",))
+
+    graph.run(progress=False)
+
+    assert graph.ok
+
+def test_apt_is_serialised():
+    tracker = Tracker()
+    graph = TaskGraph("t")
+    for name in ("one", "two", "three"):
+        graph.add(name, tracker.task(name), resources=("apt",))
+
+    graph.run(progress=False)
+
+    assert tracker.peak == 1
+    assert graph.ok
+
+def test_resource_limits_override():
+    tracker = Tracker()
+    graph = TaskGraph("t", resource_limits={"network": 1})
+    graph.add("a", tracker.task("a"), resources=("network",))
+    graph.add("b", tracker.task("b"), resources=("network",))
+    graph.run(progress=False)
+    assert tracker.peak == 1
+
+def test_failure_skips_dependents_and_stops_new_work():
+    tracker = Tracker()
+    graph = TaskGraph("t", max_workers=1)
+    graph.add("install", tracker.task("install", outcome=False))
+    graph.add("config", tracker.task("config"), deps=("install",))
+    graph.add("other", tracker.task("other"))
+
+    results = graph.run(progress=False)
+
+    assert tracker.order == ["install"]
+    assert results["install"].status == FAILED
+    assert results["config"].status == SKIPPED
+    assert results["config"].detail == "'install' failed"
+    assert results["other"].status == SKIPPED
+    assert not graph.ok
+
+def test_tds_error_reraised_after_running_tasks_finish():
+    finished = threading.Event()
+    def slow():
+        time.sleep(0.05)
+        finished.set()
+    def fail():
+        raise TDSError("Download failed", exit_code=4)
+
+    graph = TaskGraph("t")
+    graph.add("slow", slow)
+    graph.add("download", fail)
+    graph.add("extract", lambda: None, deps=("download",))
+
+    with pytest.raises(TDSError) as excinfo:
+        graph.run(progress=False)
+
+    assert excinfo.value.exit_code == 4
+    assert finished.is_set()
+    assert graph.results["download"].detail == "Download failed"
+    assert graph.results["extract"].status == SKIPPED
+
+def test_other_exceptions_fail_the_run(capsys):
+    def boom():
+        raise OSError("disk full")
+    graph = TaskGraph("t")
+    graph.add("write", boom, title="Write config")
+    graph.add("start", lambda: None, deps=("write",))
+    with pytest.raises(TDSError) as excinfo:
+        graph.run(progress=False)
+    assert excinfo.value.exit_code == 1
+    assert graph.results["write"].status == FAILED
+    assert isinstance(graph.results["write"].exception, OSError)
+    assert graph.results["start"].status == SKIPPED
+    graph.report()
+    out = capsys.readouterr().out
+    assert "Step 'Write config' failed: disk full" in out
+    assert "Write config (disk full)" in out
+
+def test_cli_exits_non_zero_when_a_step_raises_os_error(monkeypatch):
+    from unittest.mock import patch
+    from termux_dev_setup import cli
+
+    def setup_redis(**kwargs):
+        graph = TaskGraph("redis")
+        graph.add("config", lambda: open("/nonexistent-dir/redis.conf", "w"))
+        graph.run(progress=False)
+
+    monkeypatch.setenv("TDS_NO_DAEMON", "1")
+    monkeypatch.setattr("termux_dev_setup.utils.banner.print_logo", lambda: None)
+    monkeypatch.setattr("termux_dev_setup.redis.setup_redis", setup_redis)
+    with patch("sys.argv", ["tds", "setup", "redis"]), pytest.raises(SystemExit) as excinfo:
+        cli.main()
+    assert excinfo.value.code == 1
+
+def test_add_validates_dependencies():
+    graph = TaskGraph("t")
+    graph.add("a", lambda: None)
+    with pytest.raises(ValueError, match="unknown task"):
+        graph.add("b", lambda: None, deps=("a", "missing"))
+    with pytest.raises(ValueError, match="Duplicate"):
+        graph.add("a", lambda: None)
+
+def test_live_view_and_report(capsys):
+    graph = TaskGraph("t")
+    graph.add("a", lambda: False, title="Install packages")
+    graph.add("b", lambda: None, deps=("a",), title="Start")
+
+    graph.run()
+    graph.report()
+
+    out = capsys.readouterr().out
+    assert "Install packages" in out
+    assert "'a' failed" in out
+    assert "2 steps in" in out
+    assert graph.shown
+
+def test_nested_graph_runs_without_live_view(capsys):
+    inner = TaskGraph("inner")
+    inner.add("step", lambda: None, title="Inner step")
+    outer = TaskGraph("outer")
+    outer.add("nested", inner.run)
+
+    outer.run()
+    inner.report()
+
+    assert outer.shown and not inner.shown
+    assert not tasks.display_active()
+    assert "Inner step" in capsys.readouterr().out
+
+
+class Step:
+    """A fingerprinted step whose input can be changed between runs."""
+
+    def __init__(self, value="v1"):
+        self.value = value
+        self.outcome = None
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        return self.outcome
+
+    def fingerprint(self):
+        return {"value": self.value}
+
+
+def build(config, start, force=None):
+    graph = TaskGraph("svc", force=force)
+    graph.add("user", lambda: None)
+    graph.add("config", config, deps=("user",), fingerprint=config.fingerprint)
+    graph.add("start", start, deps=("config",), fingerprint=start.fingerprint)
+    return graph
+
+def test_unchanged_steps_are_skipped_on_rerun(isolated_state):
+    config, start = Step(), Step()
+    build(config, start).run(progress=False)
+    results = build(config, start).run(progress=False)
+
+    assert (config.runs, start.runs) == (1, 1)
+    assert results["config"].status == tasks.UNCHANGED
+    assert results["start"].ok
+    assert (isolated_state / "steps" / "svc.json").exists()
+
+def test_changed_input_reruns_step_and_dependents():
+    config, start = Step(), Step()
+    build(config, start).run(progress=False)
+    config.value = "v2"
+    graph = build(config, start)
+    graph.run(progress=False)
+
+    assert (config.runs, start.runs) == (2, 2)
+    assert "(0 unchanged)" not in graph.summary()
+
+def test_force_reruns_everything():
+    config, start = Step(), Step()
+    build(config, start).run(progress=False)
+    build(config, start, force=True).run(progress=False)
+    assert (config.runs, start.runs) == (2, 2)
+
+def test_failed_step_is_forgotten(capsys):
+    config, start = Step(), Step()
+    build(config, start).run(progress=False)
+    start.value, start.outcome = "v2", False
+    build(config, start).run(progress=False)
+
+    # Back to the inputs of the last success: the failure in between must not count as one.
+    start.value, start.outcome = "v1", None
+    rerun = build(config, start)
+    rerun.run(progress=False)
+    rerun.report()
+
+    assert start.runs == 3
+    assert rerun.results["config"].status == tasks.UNCHANGED
+    assert "(unchanged)" in capsys.readouterr().out
+
+def test_unwritable_state_warns(tmp_path, capsys):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    graph = TaskGraph("svc", state=tasks.StepState("svc", blocker / "svc.json"))
+    graph.add("config", lambda: None, fingerprint=lambda: 1)
+    graph.run(progress=False)
+    assert "Could not record setup state" in capsys.readouterr().out
+
+
+def journaled(steps, journal):
+    """A chain of recording steps; `steps` maps name -> outcome."""
+    ran, undone = [], []
+    graph = TaskGraph("svc", journal=journal)
+    previous = ()
+    for name, outcome in steps.items():
+        def run(name=name, outcome=outcome):
+            ran.append(name)
+            return outcome
+        graph.add(name, run, deps=previous, undo=lambda name=name: undone.append(name))
+        previous = (name,)
+    return graph, ran, undone
+
+def test_resume_skips_journaled_steps(tmp_path, capsys):
+    journal = Journal("svc", tmp_path / "svc.json")
+    graph, ran, _ = journaled({"install": None, "initdb": False, "start": None}, journal)
+    graph.run(progress=False)
+    assert ran == ["install", "initdb"]
+    assert Journal("svc", journal.path).load().completed() == ["install"]
+    assert "tds setup svc --resume" in capsys.readouterr().out
+
+    graph, ran, _ = journaled({"install": None, "initdb": None, "start": None}, journal)
+    results = graph.run(progress=False, resume=True)
+    graph.report()
+    assert ran == ["initdb", "start"]
+    assert results["install"].status == tasks.RESUMED
+    assert "done in a previous run" in capsys.readouterr().out
+    # A completed run leaves nothing to resume.
+    assert not journal.path.exists()
+
+def test_run_without_resume_starts_over(tmp_path):
+    journal = Journal("svc", tmp_path / "svc.json")
+    journaled({"install": None, "initdb": False}, journal)[0].run(progress=False)
+    graph, ran, _ = journaled({"install": None, "initdb": None}, journal)
+    graph.run(progress=False)
+    assert ran == ["install", "initdb"]
+
+def test_rollback_undoes_applied_steps_in_reverse(tmp_path, isolated_state):
+    journal = Journal("svc", tmp_path / "svc.json")
+    graph, ran, undone = journaled({"install": None, "config": None, "start": False}, journal)
+    graph.tasks["install"].undo = None
+    graph.tasks["config"].fingerprint = lambda: 1
+
+    results = graph.run(progress=False, rollback=True)
+
+    assert undone == ["config"]
+    assert results["config"].detail == "rolled back"
+    assert Journal("svc", journal.path).load().completed() == ["install"]
+    assert "config" not in tasks.StepState("svc").load().fingerprints
+
+def test_rollback_failure_warns(tmp_path, capsys):
+    def broken_undo():
+        raise OSError("busy")
+    graph, _, _ = journaled({"config": None, "start": False}, Journal("svc", tmp_path / "svc.json"))
+    graph.tasks["config"].undo = broken_undo
+    graph.run(progress=False, rollback=True)
+    assert "Could not roll back 'config': busy" in capsys.readouterr().out
+
+def test_unwritable_journal_warns_once(tmp_path, capsys):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    graph, ran, _ = journaled({"a": None, "b": None}, Journal("svc", blocker / "svc.json"))
+    graph.run(progress=False)
+    assert ran == ["a", "b"]
+    assert capsys.readouterr().out.count("Could not write setup journal") == 1
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import timing
+from termux_dev_setup.utils.capture import step_output
+from termux_dev_setup.utils.command import run_pipeline
+from termux_dev_setup.utils.shell import run_command, run_command_async
+from termux_dev_setup.utils.tasks import TaskGraph
+from termux_dev_setup.utils.wait import wait_until
+
+PY = sys.executable
+
+
+@pytest.fixture(autouse=True)
+def recording():
+    timing.reset()
+    timing.enable()
+    yield
+    timing.reset()
+
+def by_name(name):
+    return next(s for s in timing.spans() if s.name == name)
+
+
+def test_spans_nest_and_keep_attributes():
+    with timing.span("outer", kind=timing.FLOW) as outer:
+        with timing.span("inner", size=1):
+            timing.annotate(exit_code=0)
+    inner = by_name("inner")
+    assert inner.parent == outer.id and outer.parent is None
+    assert inner.attrs == {"size": 1, "exit_code": 0}
+    assert outer.duration >= inner.duration >= 0
+
+def test_span_notes_the_exception():
+    with pytest.raises(ValueError), timing.span("boom"):
+        raise ValueError("x")
+    assert by_name("boom").attrs["error"] == "ValueError"
+
+def test_disabled_recording_is_a_no_op():
+    timing.reset()
+    with timing.span("ignored") as current:
+        timing.annotate(x=1)
+    timing.record("ignored", timing.COMMAND, 0.0, 1.0)
+    assert current is None and timing.spans() == []
+
+def test_env_switch(monkeypatch):
+    monkeypatch.setenv("TDS_TIMINGS", "1")
+    assert timing.env_enabled()
+    monkeypatch.setenv("TDS_TIMINGS", "0")
+    assert not timing.env_enabled()
+
+
+def test_run_command_span_has_exit_code_and_output_size():
+    run_command([PY, "-c", "print('hello')"], capture_output=True)
+    run_command([PY, "-c", "import sys; sys.exit(2)"], check=False, capture_output=True)
+    with pytest.raises(TDSError):
+        run_command(["tds-no-such-program"])
+    ok, failed, missing = timing.spans()
+    assert (ok.kind, ok.attrs) == (timing.COMMAND, {"exit_code": 0, "output_bytes": 6})
+    assert failed.attrs["exit_code"] == 2
+    assert missing.attrs == {"exit_code": 127, "error": "TDSError"}
+
+def test_streamed_command_counts_lines(isolated_state):
+    with step_output("svc-install"):
+        run_command([PY, "-c", "print('a'); print('b')"])
+    assert timing.spans()[0].attrs == {"exit_code": 0, "output_bytes": 4, "output_lines": 2}
+
+def test_pipeline_and_async_commands_are_recorded():
+    run_pipeline([[PY, "-c", "print('x')"], ["cat"]], capture_output=True)
+    asyncio.run(run_command_async(f"{PY} -c pass"))
+    pipeline, background = timing.spans()
+    assert pipeline.attrs == {"stages": 2, "exit_code": 0, "output_bytes": 2}
+    assert background.kind == timing.COMMAND and background.attrs["exit_code"] == 0
+
+def test_wait_span(fake_clock):
+    wait_until(lambda: False, timeout=1, label="svc ready")
+    span = by_name("svc ready")
+    assert span.kind == timing.WAIT
+    assert span.attrs["ready"] is False and span.attrs["timeout"] == 1 and span.attrs["attempts"] > 1
+
+
+def test_graph_steps_are_children_of_the_flow(isolated_state):
+    graph = TaskGraph("svc")
+    graph.add("install", lambda: run_command([PY, "-c", "pass"]))
+    graph.add("config", lambda: False, deps=["install"])
+    graph.run(progress=False)
+    flow, install, config = by_name("setup svc"), by_name("svc/install"), by_name("svc/config")
+    assert flow.kind == timing.FLOW
+    assert install.parent == config.parent == flow.id
+    assert (install.attrs["status"], config.attrs["status"]) == ("done", "failed")
+    # Commands nest under the step that ran them, on its pool thread.
+    assert next(s for s in timing.spans() if s.kind == timing.COMMAND).parent == install.id
+
+
+def test_report_prints_summary_and_appends_jsonl(tmp_path, capsys):
+    for _ in range(2):
+        with timing.span("[signed-by] cmd", kind=timing.COMMAND):
+            timing.annotate(output_bytes=10)
+    path = tmp_path / "timings.jsonl"
+    timing.report(path)
+    timing.report(path)
+
+    out = capsys.readouterr().out
+    assert "[signed-by] cmd" in out and "2 commands" in out and "20 bytes of output" in out
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 4 and records[0]["kind"] == "command" and records[0]["run"]
+
+def test_report_survives_an_unwritable_path(tmp_path, capsys):
+    with timing.span("cmd", kind=timing.COMMAND):
+        pass
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    timing.report(blocker / "timings.jsonl")
+    assert "Could not write timings" in capsys.readouterr().out
+
+def test_summary_orders_by_kind_then_total():
+    timing.record("fast", timing.COMMAND, 0.0, 0.1)
+    timing.record("slow", timing.COMMAND, 0.0, 0.5)
+    timing.record("setup svc", timing.FLOW, 0.0, 1.0)
+    assert [row[1] for row in timing.summary_rows()] == ["setup svc", "slow", "fast"]
+
+
+def test_cli_timings_flag(isolated_state, monkeypatch):
+    from termux_dev_setup import cli
+
+    timing.reset()
+    monkeypatch.setattr("termux_dev_setup.utils.banner.print_logo", lambda: None)
+    monkeypatch.setattr("termux_dev_setup.redis.manage_redis",
+                        lambda action: run_command([PY, "-c", "pass"]))
+    with patch("sys.argv", ["tds", "--timings", "manage", "redis", "status"]):
+        cli.main()
+    records = [json.loads(line) for line in (isolated_state / "timings.jsonl").read_text().splitlines()]
+    assert [r["kind"] for r in records] == ["command"]
+
+def test_env_timings_are_not_delegated_to_the_daemon(monkeypatch):
+    from termux_dev_setup import cli
+
+    monkeypatch.setenv("TDS_TIMINGS", "1")
+    with patch("termux_dev_setup.daemon.try_manage") as try_manage:
+        assert cli.delegate_to_daemon(["manage", "redis", "status"]) is None
+    try_manage.assert_not_called()
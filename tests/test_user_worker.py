@@ -0,0 +1,123 @@
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from termux_dev_setup.errors import TDSError
+from termux_dev_setup.utils import postgres_utils, user_worker
+from termux_dev_setup.utils.command import current_user
+from termux_dev_setup.utils.user_worker import UserWorker, WorkerSession, WorkerUnavailable
+
+PY = sys.executable
+
+
+@pytest.fixture
+def worker():
+    """A worker running as the current user (as_user leaves the argv unwrapped)."""
+    w = UserWorker(current_user())
+    assert w.start()
+    yield w
+    w.close()
+
+@pytest.fixture
+def other_user(monkeypatch):
+    """Sessions only start workers for a different user; pretend we are someone else, without runuser."""
+    monkeypatch.setattr(user_worker, "current_user", lambda: "tds-test-caller")
+    monkeypatch.setattr(user_worker, "as_user", lambda user, argv: list(argv))
+
+
+def test_worker_runs_commands(worker):
+    first = worker.run([PY, "-c", "import sys; print(sys.argv[1])", "a b; c"], capture_output=True)
+    second = worker.run([PY, "-c", "import sys; sys.stderr.write('oops'); sys.exit(3)"], check=False, capture_output=True)
+    assert (first.returncode, first.stdout) == (0, "a b; c\n")
+    assert (second.returncode, second.stderr) == (3, "oops")
+    # Both ran in the same worker process.
+    assert worker.alive and worker.pid == worker.proc.pid
+
+def test_worker_output_not_captured_stays_off_the_protocol(capfd):
+    worker = UserWorker(current_user())
+    assert worker.start()
+    result = worker.run([PY, "-c", "print('to the terminal')"])
+    worker.close()
+    assert result.stdout is None
+    assert "to the terminal" in capfd.readouterr().err
+
+def test_worker_errors_match_run_command(worker, capsys):
+    with pytest.raises(TDSError) as failed:
+        worker.run([PY, "-c", "import sys; sys.stderr.write('bad'); sys.exit(4)"], capture_output=True)
+    with pytest.raises(TDSError) as missing:
+        worker.run(["tds-no-such-program"])
+    with pytest.raises(TDSError) as unusable:
+        worker.run(["/"])
+    assert (failed.value.exit_code, missing.value.exit_code, unusable.value.exit_code) == (4, 127, 1)
+    out = capsys.readouterr().out
+    assert "bad" in out and "Command not found: tds-no-such-program" in out
+
+def test_worker_dying_mid_command_is_an_error(worker):
+    with pytest.raises(TDSError, match="worker exited while running"):
+        worker.run([PY, "-c", "import os, signal; os.kill(os.getppid(), signal.SIGKILL)"])
+    assert not worker.alive
+
+def test_closed_worker_is_unavailable(worker):
+    worker.close()
+    with pytest.raises(WorkerUnavailable):
+        worker.run(["true"])
+    worker.close()
+
+@pytest.mark.parametrize("argv", [["false"], ["tds-no-such-program"]])
+def test_worker_that_never_greets_fails_to_start(argv):
+    with patch.object(user_worker, "as_user", return_value=argv):
+        w = UserWorker("postgres", start_timeout=2)
+        assert not w.start()
+    assert w.proc is None
+
+
+def test_session_shares_one_worker_until_the_outermost_exit(other_user):
+    session = WorkerSession("postgres")
+    assert session.worker() is None
+    with session:
+        first = session.worker()
+        with session:
+            assert session.worker() is first
+        assert first.alive
+    assert not first.alive
+    assert session.worker() is None
+
+def test_session_restarts_a_dead_worker(other_user):
+    with WorkerSession("postgres") as session:
+        first = session.worker()
+        first.close()
+        assert session.worker() is not first
+
+def test_session_does_not_retry_a_failed_start(other_user, monkeypatch):
+    start = MagicMock(return_value=False)
+    monkeypatch.setattr(UserWorker, "start", start)
+    with WorkerSession("postgres") as session:
+        assert session.worker() is None
+        assert session.worker() is None
+    start.assert_called_once()
+
+def test_session_disabled_by_env_or_same_user(monkeypatch):
+    monkeypatch.setenv("TDS_NO_PG_WORKER", "1")
+    with WorkerSession("postgres", disable_env="TDS_NO_PG_WORKER") as session:
+        assert session.worker() is None
+    with WorkerSession(current_user()) as session:
+        assert session.worker() is None
+
+
+def test_run_as_postgres_uses_the_session_worker(monkeypatch):
+    fake = MagicMock()
+    monkeypatch.setattr(postgres_utils._session, "worker", lambda: fake)
+    with patch.object(postgres_utils, "run_command") as mock_run:
+        postgres_utils.run_as_postgres(["createdb", "app"], check=False)
+    fake.run.assert_called_once_with(["createdb", "app"], check=False, capture_output=False)
+    mock_run.assert_not_called()
+
+@patch("termux_dev_setup.utils.command.check_command", return_value=True)
+def test_run_as_postgres_falls_back_when_worker_is_gone(mock_check, monkeypatch):
+    fake = MagicMock()
+    fake.run.side_effect = WorkerUnavailable("gone")
+    monkeypatch.setattr(postgres_utils._session, "worker", lambda: fake)
+    with patch.object(postgres_utils, "run_command") as mock_run:
+        postgres_utils.run_as_postgres(["initdb", "-D", "/data"])
+    mock_run.assert_called_once_with(["runuser", "-u", "postgres", "--", "initdb", "-D", "/data"], check=True, capture_output=False)
@@ -1,37 +1,101 @@
 import pytest
 import subprocess
-from unittest.mock import patch, call
+from unittest.mock import patch, call, MagicMock
+from termux_dev_setup.utils import banner
 from termux_dev_setup.utils.banner import print_logo
 from termux_dev_setup.utils.lock import process_lock
-from termux_dev_setup.utils.shell import run_command, check_command
+import asyncio
+import time
+from termux_dev_setup.utils.shell import run_command, check_command, run_command_async, gather_commands, run_commands
 from termux_dev_setup.utils.status import info, success, error, warning, step
 from termux_dev_setup.errors import TDSError
 
 # =================== banner.py Tests ===================
-@patch('rich.console.Console.print')
-def test_print_logo_renders(mock_print):
-    """Test that print_logo calls the console print method multiple times."""
-    print_logo()
-    # 13 lines in logo string - 4 blank lines = 9 lines + 1 subtitle
-    assert mock_print.call_count == 10
-
-@patch('rich.console.Console.print')
-def test_print_logo_with_fixed_palette_env(mock_print, monkeypatch):
-    """Test that setting CREATE_DUMP_PALETTE uses a fixed palette."""
+@pytest.fixture
+def banner_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("TDS_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("TDS_NO_BANNER", raising=False)
+    monkeypatch.delenv("CREATE_DUMP_PALETTE", raising=False)
+    return tmp_path / "banner"
+
+def test_print_logo_skipped_when_not_tty(banner_cache, capsys):
+    """Scripted (non-TTY) invocations do not paint the logo."""
+    with patch('sys.stdout.isatty', return_value=False):
+        print_logo()
+    assert capsys.readouterr().out == ""
+
+def test_print_logo_env_switch(banner_cache, monkeypatch, capsys):
+    monkeypatch.setenv("TDS_NO_BANNER", "1")
+    print_logo(force=True)
+    assert capsys.readouterr().out == ""
+
+def test_print_logo_renders(banner_cache, capsys):
+    """Forced rendering writes every logo line plus the subtitle."""
+    print_logo(force=True)
+    out = capsys.readouterr().out
+    assert out.count("\n") == len(banner.LOGO) + 2
+    assert banner.SUBTITLE in out
+
+def test_default_procedural_logo_is_cached_per_seed(banner_cache, monkeypatch):
+    """Without CREATE_DUMP_PALETTE a seeded procedural palette is rendered once, then read from the cache."""
+    monkeypatch.setattr(banner.random.SystemRandom, "randrange", lambda self, n: 7)
+    first = banner.get_logo(37, "truecolor")
+    assert [p.name for p in banner_cache.iterdir()] == [f"logo-v{banner.CACHE_VERSION}-s7-w37-truecolor.ansi"]
+
+    with patch.object(banner, "render_logo") as mock_render:
+        assert banner.get_logo(37, "truecolor") == first
+        mock_render.assert_not_called()
+    # The same seed always gives the same palette.
+    assert banner.generate_palette(banner.random.Random(7)) == banner.generate_palette(banner.random.Random(7))
+
+def test_print_logo_with_fixed_palette_env_is_cached(banner_cache, monkeypatch, capsys):
+    """Setting CREATE_DUMP_PALETTE uses a fixed palette rendered once into the disk cache."""
     monkeypatch.setenv("CREATE_DUMP_PALETTE", "1")
-    print_logo()
-    assert mock_print.call_count == 10
-
-@patch('rich.console.Console.print')
-def test_print_logo_with_invalid_palette_env(mock_print, monkeypatch):
-    """Test that an invalid palette index falls back to procedural generation."""
-    monkeypatch.setenv("CREATE_DUMP_PALETTE", "9999")
-    print_logo()
-    assert mock_print.call_count == 10
-
-    monkeypatch.setenv("CREATE_DUMP_PALETTE", "not-a-number")
-    print_logo()
-    assert mock_print.call_count == 10 * 2
+    print_logo(force=True)
+    first = capsys.readouterr().out
+    assert len(list(banner_cache.iterdir())) == 1
+
+    with patch.object(banner, "render_logo") as mock_render:
+        print_logo(force=True)
+        mock_render.assert_not_called()
+    assert capsys.readouterr().out == first
+
+def test_get_logo_cache_keyed_by_width_and_color_system(banner_cache, monkeypatch):
+    monkeypatch.setenv("CREATE_DUMP_PALETTE", "0")
+    truecolor = banner.get_logo(37, "truecolor")
+    standard = banner.get_logo(37, "standard")
+    narrow = banner.get_logo(10, "truecolor")
+    assert "\x1b[38;2;" in truecolor
+    assert "\x1b[38;2;" not in standard
+    assert max(len(line) for line in banner.get_logo(10, None).splitlines()) <= len(banner.SUBTITLE)
+    assert narrow != truecolor
+    assert len(list(banner_cache.iterdir())) == 4
+
+def test_get_logo_unwritable_cache_still_renders(banner_cache, monkeypatch):
+    monkeypatch.setenv("CREATE_DUMP_PALETTE", "2")
+    with patch("pathlib.Path.mkdir", side_effect=OSError("read-only")):
+        assert banner.SUBTITLE in banner.get_logo(37, "256")
+
+def test_render_logo_plain_without_color_system():
+    rendered = banner.render_logo(banner.FIXED_PALETTES[0], None)
+    assert "\x1b[" not in rendered
+    assert rendered.splitlines()[:len(banner.LOGO)] == banner.LOGO
+
+@pytest.mark.parametrize("value", ["9999", "not-a-number"])
+def test_print_logo_with_invalid_palette_env(value, banner_cache, monkeypatch):
+    """An invalid palette index falls back to a procedural palette."""
+    monkeypatch.setenv("CREATE_DUMP_PALETTE", value)
+    monkeypatch.setattr(banner.random.SystemRandom, "randrange", lambda self, n: 3)
+    assert banner.fixed_palette_index() is None
+    banner.get_logo(37, "truecolor")
+    assert [p.name for p in banner_cache.iterdir()] == [f"logo-v{banner.CACHE_VERSION}-s3-w37-truecolor.ansi"]
+
+def test_generate_palette_mood_shift():
+    rand = MagicMock()
+    rand.random.return_value = 0.1  # < 0.25 triggers the V shift branch
+    palette = banner.generate_palette(rand)
+    assert len(palette) == 5
+    assert all(0 <= c <= 255 for color in palette for c in color)
 
 
 # =================== lock.py Tests ===================
@@ -74,14 +138,78 @@ def test_run_command_file_not_found(mock_run):
     with pytest.raises(TDSError):
         run_command('nonexistent_command')
 
-@patch('shutil.which', return_value='/usr/bin/ls')
+@patch('termux_dev_setup.utils.lookup.which', return_value='/usr/bin/ls')
 def test_check_command(mock_which):
     assert check_command('ls')
+    mock_which.assert_called_once_with('ls')
 
-@patch('shutil.which', return_value=None)
+@patch('termux_dev_setup.utils.lookup.which', return_value=None)
 def test_check_command_not_found(mock_which):
     assert not check_command('nonexistent_command')
 
+# =================== shell.py async Tests ===================
+def test_run_command_async_capture():
+    result = asyncio.run(run_command_async("sh -c 'echo out; echo err >&2'", capture_output=True))
+    assert (result.returncode, result.stdout, result.stderr) == (0, "out\n", "err\n")
+
+def test_run_command_async_argv_is_not_split():
+    result = asyncio.run(run_command_async(["printf", "%s|", "a b", "$HOME"], shell=True, capture_output=True))
+    assert (result.args, result.stdout) == (["printf", "%s|", "a b", "$HOME"], "a b|$HOME|")
+    results = run_commands([["echo", "x y"], "echo z"], capture_output=True)
+    assert [r.stdout for r in results] == ["x y\n", "z\n"]
+
+def test_run_command_async_streams_lines():
+    lines = []
+    result = asyncio.run(run_command_async("printf 'a\\nb\\n'; echo c >&2", shell=True,
+                                           on_output=lambda stream, line: lines.append((stream, line))))
+    assert result.stdout is None
+    assert [line for line in lines if line[0] == "stdout"] == [("stdout", "a"), ("stdout", "b")]
+    assert ("stderr", "c") in lines
+
+def test_run_command_async_failure():
+    with pytest.raises(TDSError) as excinfo:
+        asyncio.run(run_command_async("sh -c 'echo broken >&2; exit 3'", capture_output=True))
+    assert excinfo.value.exit_code == 3
+    result = asyncio.run(run_command_async("sh -c 'exit 3'", check=False))
+    assert result.returncode == 3
+
+def test_run_command_async_not_found():
+    with pytest.raises(TDSError) as excinfo:
+        asyncio.run(run_command_async("nonexistent_command_tds"))
+    assert excinfo.value.exit_code == 127
+
+@pytest.mark.parametrize("command, shell", [("sleep 5", False), ("sleep 5 | cat", True)])
+def test_run_command_async_timeout_kills(command, shell):
+    started = time.monotonic()
+    with pytest.raises(TDSError) as excinfo:
+        asyncio.run(run_command_async(command, shell=shell, timeout=0.2))
+    assert excinfo.value.exit_code == 124
+    assert time.monotonic() - started < 3
+
+def test_run_command_async_cancellation_kills():
+    async def scenario():
+        task = asyncio.ensure_future(run_command_async("sleep 5"))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    started = time.monotonic()
+    asyncio.run(scenario())
+    assert time.monotonic() - started < 3
+
+def test_run_commands_bounded_and_ordered():
+    started = time.monotonic()
+    results = run_commands(["sh -c 'sleep 0.1; echo 1'", "echo 2", "sh -c 'sleep 0.1; echo 3'"], limit=1, capture_output=True)
+    assert [r.stdout for r in results] == ["1\n", "2\n", "3\n"]
+    assert time.monotonic() - started >= 0.2
+
+def test_gather_commands_first_failure_cancels_rest():
+    started = time.monotonic()
+    with pytest.raises(TDSError):
+        run_commands(["sleep 5", "false"])
+    assert time.monotonic() - started < 3
+    assert asyncio.run(gather_commands([])) == []
+
 # =================== status.py Tests ===================
 @patch('rich.console.Console.print')
 def test_info(mock_print):
@@ -23,8 +23,8 @@ def test_setup_postgres_with_version():
 
 def test_cli_version_flag():
     """Test that the CLI parser accepts --version."""
-    with patch("termux_dev_setup.cli.setup_postgres") as mock_setup_pg:
+    with patch("termux_dev_setup.postgres.setup_postgres") as mock_setup_pg:
         with patch("sys.argv", ["tds", "setup", "postgres", "--version", "15"]):
             cli.main()
 
-        mock_setup_pg.assert_called_with(version="15")
+        mock_setup_pg.assert_called_with(version="15", resume=False, rollback=False)
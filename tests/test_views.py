@@ -3,6 +3,7 @@ from unittest.mock import Mock, patch
 from termux_dev_setup.views import PostgresView
 from termux_dev_setup.config import PostgresConfig
 from termux_dev_setup.errors import TDSError
+from termux_dev_setup.service_status import ServiceStatus
 
 @pytest.fixture
 def mock_postgres_config():
@@ -30,6 +31,18 @@ def test_print_status_running(mock_console, postgres_view, mock_postgres_config)
     mock_console.print.assert_any_call(f"  Port: {mock_postgres_config.port}")
     mock_console.print.assert_any_call(f"  Connection: postgresql://{mock_postgres_config.pg_user}:<PASS>@{mock_postgres_config.host}:{mock_postgres_config.port}/postgres")
 
+@patch('termux_dev_setup.views.console')
+def test_print_status_with_service_status(mock_console, postgres_view, mock_postgres_config):
+    """A probe status is shown as-is, with the server's reason for not being ready."""
+    postgres_view.print_status(ServiceStatus.RECOVERING, mock_postgres_config, "the database system is in recovery mode")
+    mock_console.print.assert_any_call("  Status: [bold yellow]RECOVERING[/bold yellow] [dim](the database system is in recovery mode)[/dim]")
+    printed = [c.args[0] for c in mock_console.print.call_args_list]
+    assert not any("Connection:" in line for line in printed)
+
+    mock_console.reset_mock()
+    postgres_view.print_status(ServiceStatus.RUNNING, mock_postgres_config, "accepting connections")
+    mock_console.print.assert_any_call("  Status: [bold green]UP[/bold green]")
+
 @patch('termux_dev_setup.views.console')
 def test_print_status_down(mock_console, postgres_view, mock_postgres_config):
     """Test print_status when PostgreSQL is down."""
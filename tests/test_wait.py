@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from termux_dev_setup.utils import wait
+
+# =================== Backoff / Deadline Tests ===================
+def test_wait_until_immediate_success(fake_clock):
+    result = wait.wait_until(lambda: True, timeout=5)
+    assert result
+    assert result.attempts == 1
+    assert fake_clock.sleeps == []
+
+def test_wait_until_backoff_schedule(fake_clock):
+    calls = iter([False] * 5 + [True])
+    result = wait.wait_until(lambda: next(calls), timeout=5, initial=0.01, factor=2, max_interval=0.05)
+    assert result.ok
+    assert result.attempts == 6
+    assert fake_clock.sleeps == pytest.approx([0.01, 0.02, 0.04, 0.05, 0.05])
+    assert result.elapsed == pytest.approx(0.17)
+    assert len(result.timings) == 6
+
+def test_wait_until_timeout(fake_clock):
+    result = wait.wait_until(lambda: False, timeout=1, initial=0.1, factor=2, max_interval=0.3)
+    assert not result
+    assert result.elapsed == pytest.approx(1.0)
+    # The last pause is trimmed to the deadline.
+    assert fake_clock.sleeps == pytest.approx([0.1, 0.2, 0.3, 0.3, 0.1])
+    assert result.attempts == 6
+
+def test_wait_until_zero_timeout_tries_once(fake_clock):
+    calls = []
+    assert not wait.wait_until(lambda: calls.append(1), timeout=0)
+    assert calls == [1]
+
+# =================== Wake-up Tests ===================
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_wait_until_wakes_on_file_write(tmp_path):
+    log = tmp_path / "service.log"
+    fd = wait.watch_file(str(log))
+    if fd is None:
+        pytest.skip("inotify unavailable")
+    os.close(fd)
+    ready = threading.Event()
+
+    def writer():
+        time.sleep(0.05)
+        ready.set()
+        log.write_text("ready to accept connections\n")
+
+    threading.Thread(target=writer, daemon=True).start()
+    started = time.monotonic()
+    # A 2s poll interval would be the wait without the watch.
+    result = wait.wait_until(ready.is_set, timeout=5, initial=2, max_interval=2, watch_path=str(log))
+    assert result.ok
+    assert time.monotonic() - started < 1.5
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_probe_writing_the_watched_log_does_not_spin(tmp_path):
+    log = tmp_path / "service.log"
+    fd = wait.watch_file(str(log))
+    if fd is None:
+        pytest.skip("inotify unavailable")
+    os.close(fd)
+
+    def probe():
+        # Like pgwire against a starting server: every attempt logs a line.
+        with open(log, "a") as f:
+            f.write("FATAL:  the database system is starting up\n")
+        return False
+
+    timeout = 0.5
+    result = wait.wait_until(probe, timeout=timeout, watch_path=str(log))
+    assert not result.ok
+    assert result.attempts <= timeout / wait.MIN_WAKE_INTERVAL + 2
+
+def test_wait_until_wakes_on_pid_exit():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.05)"])
+    fd = wait.watch_pid(proc.pid)
+    if fd is None:
+        proc.wait()
+        pytest.skip("pidfd_open unavailable")
+    os.close(fd)
+    started = time.monotonic()
+    result = wait.wait_until(lambda: proc.poll() is not None, timeout=5, initial=2, max_interval=2, pid=proc.pid)
+    assert result.ok
+    assert time.monotonic() - started < 1.5
+
+def test_watchers_unsupported(monkeypatch, tmp_path):
+    assert wait.watch_file(str(tmp_path / "missing-dir" / "x.log")) is None
+    monkeypatch.delattr(wait.os, "pidfd_open", raising=False)
+    assert wait.watch_pid(1) is None
+    monkeypatch.setattr(wait.sys, "platform", "darwin")
+    assert wait.watch_file(str(tmp_path / "x.log")) is None